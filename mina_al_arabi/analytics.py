@@ -0,0 +1,231 @@
+"""
+Sales analytics: hour-by-weekday heatmap, month-over-month trend, per-employee
+ticket averages and daily moving averages.
+
+load_columns() reads the sales of a date range in one query and turns them into
+columns (day offset, hour, weekday, month, employee, sale type, amount); every
+statistic is then a NumPy bincount / cumulative sum over those arrays. The
+heatmap and the monthly trend are also split by sale type (services /
+products). Dates are converted with NumPy's datetime64 rather than SQLite date
+functions, which cost more than the query itself on a year of sales.
+
+Amounts are what the customer paid: total after the visible discount. Purchases
+recorded for employees (buyer_type 'employee') are not revenue and are skipped.
+
+AnalyticsCache keeps the result per (date_from, date_to) and drops it when a
+sale in that range is created or sales are deleted.
+"""
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from mina_al_arabi.db import Database
+from mina_al_arabi.archive import historical
+from mina_al_arabi.reporting import make_report
+
+
+WEEKDAYS = ["الأحد", "الاثنين", "الثلاثاء", "الأربعاء", "الخميس", "الجمعة", "السبت"]  # strftime('%w') order
+MOVING_WINDOWS = (7, 30)
+NO_EMPLOYEE = -1
+SALE_TYPES = {"service": "الخدمات", "product": "المنتجات"}  # sales.type -> label
+
+
+class SalesColumns:
+    """NumPy column arrays of the sales in [date_from, date_to)."""
+
+    def __init__(self, date_from: str, date_to: str, rows: List[tuple]):
+        """rows: (YYYY-MM-DD, hour, employee_id, is_service, amount)."""
+        self.date_from = date_from
+        self.date_to = date_to
+        first = date.fromisoformat(date_from)
+        self.days = (date.fromisoformat(date_to) - first).days
+        cols = list(zip(*rows)) or [()] * 5
+        days = np.array(cols[0], dtype="datetime64[D]")
+        epoch_days = days.astype(np.int64)
+        self.day = epoch_days - np.datetime64(first, "D").astype(np.int64)
+        self.weekday = (epoch_days + 4) % 7  # 1970-01-01 was a Thursday; Sunday = 0
+        self.month = days.astype("datetime64[M]").astype(np.int64) + 1970 * 12
+        self.hour = np.array(cols[1], dtype=np.int64)
+        self.employee = np.array(cols[2], dtype=np.int64)
+        self.service = np.array(cols[3], dtype=bool)
+        self.amount = np.array(cols[4], dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.amount)
+
+    def total(self) -> float:
+        return float(self.amount.sum())
+
+
+def load_columns(db: Database, date_from: str, date_to: str) -> SalesColumns:
+    """Sales with date_from <= date < date_to (YYYY-MM-DD)."""
+    with db.connect() as conn:
+        c = conn.cursor()
+        c.execute("""
+        SELECT substr(date, 1, 10), CAST(substr(date, 12, 2) AS INTEGER),
+               COALESCE(employee_id, ?), type = 'service', total * (1 - discount_percent / 100.0)
+        FROM sales
+        WHERE date >= ? AND date < ? AND buyer_type != 'employee'
+        """, (NO_EMPLOYEE, date_from, date_to))
+        rows = c.fetchall()
+    return SalesColumns(date_from, date_to, rows)
+
+
+# Array helpers
+def _bincount(index, weights=None, size: int = 0) -> List[float]:
+    return np.bincount(index, weights=weights, minlength=size)[:size].tolist()
+
+
+def _of_type(cols: SalesColumns, sale_type: Optional[str]):
+    """(amount weights, invoice weights) counting only sales of sale_type; (amount, None) for all sales."""
+    if sale_type is None:
+        return cols.amount, None
+    match = cols.service == (sale_type == "service")
+    return cols.amount * match, match.astype(np.float64)
+
+
+def _moving_average(values: List[float], window: int) -> List[float]:
+    """Trailing mean over `window` days (fewer at the start of the range)."""
+    arr = np.asarray(values, dtype=np.float64)
+    csum = np.concatenate(([0.0], np.cumsum(arr)))
+    idx = np.arange(1, len(arr) + 1)
+    start = np.maximum(idx - window, 0)
+    return ((csum[idx] - csum[start]) / (idx - start)).tolist()
+
+
+# Statistics
+def hour_weekday_heatmap(cols: SalesColumns, sale_type: Optional[str] = None) -> List[List[float]]:
+    """7 x 24 revenue matrix: rows are weekdays (Sunday first), columns hours; sale_type limits it to one type."""
+    amount, _n = _of_type(cols, sale_type)
+    cells = _bincount(cols.weekday * 24 + cols.hour, amount, 7 * 24)
+    return [cells[d * 24:(d + 1) * 24] for d in range(7)]
+
+
+def monthly_trend(cols: SalesColumns, sale_type: Optional[str] = None) -> List[Tuple[str, float, int, Optional[float]]]:
+    """(YYYY-MM, revenue, invoices, % change from the previous month) for each month of the range."""
+    first = date.fromisoformat(cols.date_from)
+    last = date.fromisoformat(cols.date_to) - timedelta(days=1)
+    base = first.year * 12 + first.month - 1
+    size = last.year * 12 + last.month - base
+    if size <= 0:
+        return []
+    offset = cols.month - base
+    amount, counted = _of_type(cols, sale_type)
+    revenue = _bincount(offset, amount, size)
+    invoices = _bincount(offset, counted, size)
+    out = []
+    for i in range(size):
+        prev = revenue[i - 1] if i else 0.0
+        change = (revenue[i] - prev) / prev * 100.0 if i and prev else None
+        m = base + i
+        out.append((f"{m // 12:04d}-{m % 12 + 1:02d}", revenue[i], int(invoices[i]), change))
+    return out
+
+
+def employee_ticket_averages(cols: SalesColumns) -> List[Tuple[int, int, float, float]]:
+    """(employee_id, invoices, revenue, average ticket), highest revenue first."""
+    if not len(cols):
+        return []
+    ids, inverse = np.unique(cols.employee, return_inverse=True)
+    ids = ids.tolist()
+    revenue = _bincount(inverse, cols.amount, len(ids))
+    invoices = _bincount(inverse, None, len(ids))
+    out = [(eid, int(n), rev, rev / n) for eid, n, rev in zip(ids, invoices, revenue) if n]
+    return sorted(out, key=lambda r: r[2], reverse=True)
+
+
+def daily_revenue(cols: SalesColumns) -> List[Tuple[str, float, List[float]]]:
+    """(YYYY-MM-DD, revenue, [moving average per MOVING_WINDOWS]) for each day of the range."""
+    if cols.days <= 0:
+        return []
+    revenue = _bincount(cols.day, cols.amount, cols.days)
+    averages = [_moving_average(revenue, w) for w in MOVING_WINDOWS]
+    first = date.fromisoformat(cols.date_from)
+    return [((first + timedelta(days=i)).isoformat(), revenue[i], [a[i] for a in averages])
+            for i in range(cols.days)]
+
+
+def analyze(db: Database, date_from: str, date_to: str) -> Dict[str, Any]:
+    """All statistics for [date_from, date_to), including archived months."""
+    cols = load_columns(historical(db), date_from, date_to)
+    names = dict(db.list_employees())
+    return {
+        "date_from": date_from,
+        "date_to": date_to,
+        "invoices": len(cols),
+        "revenue": cols.total(),
+        "heatmap": hour_weekday_heatmap(cols),
+        "monthly": monthly_trend(cols),
+        # The same two statistics per sales.type, keyed like SALE_TYPES
+        "heatmap_by_type": {t: hour_weekday_heatmap(cols, t) for t in SALE_TYPES},
+        "monthly_by_type": {t: monthly_trend(cols, t) for t in SALE_TYPES},
+        "employees": [(names.get(eid, "بدون موظف"), n, rev, avg) for eid, n, rev, avg in employee_ticket_averages(cols)],
+        "daily": daily_revenue(cols),
+    }
+
+
+def analytics_report(result: Dict[str, Any], view: str = "monthly", sale_type: Optional[str] = None) -> Dict[str, Any]:
+    """One view of an analyze() result as a report dict (see reporting.py).
+
+    sale_type ('service' or 'product') limits the heatmap and monthly views to
+    that type; without it the monthly view has a revenue column per type.
+    """
+    period = f"{result['date_from']} - {result['date_to']}"
+    totals = {"invoices": result["invoices"], "revenue": result["revenue"]}
+    if sale_type is not None:
+        period = f"{SALE_TYPES[sale_type]} {period}"
+        trend = result["monthly_by_type"][sale_type]
+        totals = {"invoices": sum(r[2] for r in trend), "revenue": sum(r[1] for r in trend)}
+    if view == "heatmap":
+        heatmap = result["heatmap"] if sale_type is None else result["heatmap_by_type"][sale_type]
+        rows = [[WEEKDAYS[d]] + [round(v, 2) for v in hours] for d, hours in enumerate(heatmap)]
+        return make_report(f"الإيرادات حسب اليوم والساعة {period}", ["اليوم"] + [f"{h:02d}" for h in range(24)], rows, totals)
+    if view == "employees":
+        rows = [[name, n, round(rev, 2), round(avg, 2)] for name, n, rev, avg in result["employees"]]
+        return make_report(f"متوسط الفاتورة لكل موظف {period}", ["الموظف", "عدد الفواتير", "الإيرادات", "متوسط الفاتورة"],
+                       rows, totals)
+    if view == "daily":
+        rows = [[day, round(rev, 2)] + [round(a, 2) for a in avgs] for day, rev, avgs in result["daily"]]
+        columns = ["اليوم", "الإيرادات"] + [f"متوسط {w} يوم" for w in MOVING_WINDOWS]
+        return make_report(f"الإيرادات اليومية {period}", columns, rows, totals)
+    columns = ["الشهر", "الإيرادات", "عدد الفواتير", "التغير %"]
+    if sale_type is not None:
+        rows = [[month, round(rev, 2), n, None if change is None else round(change, 1)]
+                for month, rev, n, change in result["monthly_by_type"][sale_type]]
+        return make_report(f"اتجاه الإيرادات الشهري {period}", columns, rows, totals)
+    by_type = [result["monthly_by_type"][t] for t in SALE_TYPES]
+    rows = [[month, round(rev, 2), n, None if change is None else round(change, 1)]
+            + [round(trend[i][1], 2) for trend in by_type]
+            for i, (month, rev, n, change) in enumerate(result["monthly"])]
+    return make_report(f"اتجاه الإيرادات الشهري {period}", columns + list(SALE_TYPES.values()), rows, totals)
+
+
+class AnalyticsCache:
+    """analyze() results per (date_from, date_to), dropped when a sale in the range changes."""
+
+    def __init__(self, db: Database):
+        self.db = db
+        self._ranges: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        db.subscribe(self.on_db_event)
+
+    def get(self, date_from: str, date_to: str) -> Dict[str, Any]:
+        key = (date_from, date_to)
+        if key not in self._ranges:
+            self._ranges[key] = analyze(self.db, date_from, date_to)
+        return self._ranges[key]
+
+    def invalidate(self) -> None:
+        self._ranges.clear()
+
+    def close(self) -> None:
+        """Stop listening to the database (the owning dashboard is gone)."""
+        self.db.unsubscribe(self.on_db_event)
+
+    def on_db_event(self, event: str, payload: Dict[str, Any]) -> None:
+        if event == "sale_created":
+            day = (payload.get("date") or "")[:10]
+            for key in [k for k in self._ranges if k[0] <= day < k[1]]:
+                del self._ranges[key]
+        elif event in ("sales_deleted", "employees_changed"):
+            self.invalidate()
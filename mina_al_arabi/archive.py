@@ -0,0 +1,196 @@
+"""
+Archiving of closed months into per-year databases (archive_YYYY.db next to mina.db).
+
+archive_old_months() moves the sales (with their items), expenses and attendance
+of every month older than the horizon out of the live database in one
+transaction per month, and records it in the archive_log table. The live file
+then only holds recent data and stays small.
+
+For historical reports, historical(db) returns a Database whose connections
+ATTACH the archives and create TEMP views named sales / sale_items / expenses /
+attendance as a UNION ALL of the live and archived tables. Temp objects are
+resolved before main, so the existing queries in db.py, reporting.py and
+export.py run unchanged over the full history. That database is read-only:
+writes must go through the normal Database.
+"""
+import glob
+import os
+import re
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+from mina_al_arabi.db import Database, month_range
+
+
+ARCHIVED_TABLES = ("sales", "sale_items", "expenses", "attendance")
+HORIZON_MONTHS = 12  # keep this many recent months in the live database
+MAX_ATTACHED = 9  # SQLite allows 10 attached databases by default; newest years are attached first
+
+
+def archive_path(db: Database, year: int) -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(db.path)), f"archive_{year:04d}.db")
+
+
+def list_archives(db: Database) -> List[Tuple[int, str]]:
+    """(year, path) of the existing archive files, oldest first."""
+    out = []
+    for path in glob.glob(os.path.join(os.path.dirname(os.path.abspath(db.path)), "archive_*.db")):
+        m = re.search(r"archive_(\d{4})\.db$", path)
+        if m:
+            out.append((int(m.group(1)), path))
+    return sorted(out)
+
+
+def cutoff_month(horizon_months: int = HORIZON_MONTHS, today: Optional[date] = None) -> str:
+    """First day (YYYY-MM-DD) of the oldest month that stays live."""
+    today = today or date.today()
+    index = today.year * 12 + (today.month - 1) - horizon_months
+    return f"{index // 12:04d}-{index % 12 + 1:02d}-01"
+
+
+def archivable_months(db: Database, horizon_months: int = HORIZON_MONTHS) -> List[str]:
+    """YYYY-MM months before the horizon that still have live rows and no open shift."""
+    cutoff = cutoff_month(horizon_months)
+    with db.connect() as conn:
+        c = conn.cursor()
+        months = set()
+        for table in ("sales", "expenses", "attendance"):
+            c.execute(f"SELECT DISTINCT substr(date, 1, 7) FROM {table} WHERE date < ?", (cutoff,))
+            months.update(row[0] for row in c.fetchall())
+        # A month is closed once no active shift started in it or before it
+        c.execute("SELECT MIN(opened_at) FROM shifts WHERE active = 1")
+        open_since = c.fetchone()[0]
+    if open_since:
+        months = {m for m in months if m < open_since[:7]}
+    return sorted(months)
+
+
+def _ensure_archive_tables(c, schema: str):
+    """Create the archive tables (no foreign keys) or add columns the live tables gained since."""
+    for table in ARCHIVED_TABLES:
+        c.execute(f"PRAGMA main.table_info({table})")
+        cols = c.fetchall()  # cid, name, type, notnull, dflt_value, pk
+        c.execute(f"PRAGMA {schema}.table_info({table})")
+        existing = {row[1] for row in c.fetchall()}
+        if not existing:
+            defs = [f"{name} INTEGER PRIMARY KEY" if pk else f"{name} {ctype}"
+                    for _, name, ctype, _notnull, _dflt, pk in cols]
+            c.execute(f"CREATE TABLE {schema}.{table} ({', '.join(defs)})")
+        else:
+            for _, name, ctype, _notnull, _dflt, _pk in cols:
+                if name not in existing:
+                    c.execute(f"ALTER TABLE {schema}.{table} ADD COLUMN {name} {ctype}")
+    c.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_sales_date ON sales(date)")
+    c.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_sales_employee ON sales(employee_id, date)")
+    c.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_sale_items_sale ON sale_items(sale_id)")
+    c.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_expenses_date ON expenses(date)")
+    c.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_attendance_date ON attendance(date)")
+
+
+def _columns(c, table: str) -> str:
+    c.execute(f"PRAGMA main.table_info({table})")
+    return ", ".join(row[1] for row in c.fetchall())
+
+
+def archive_month(db: Database, month: str) -> Dict[str, int]:
+    """Move one YYYY-MM month into archive_YYYY.db; returns the moved row counts."""
+    year, mon = int(month[:4]), int(month[5:7])
+    start, end = month_range(year, mon)
+    path = archive_path(db, year)
+    counts = {}
+    with db.connect() as conn:
+        c = conn.cursor()
+        c.execute("ATTACH DATABASE ? AS arc", (path,))
+        try:
+            _ensure_archive_tables(c, "arc")
+            conn.commit()
+            sales_cols = _columns(c, "sales")
+            items_cols = _columns(c, "sale_items")
+            c.execute(f"""
+            INSERT INTO arc.sale_items({items_cols})
+            SELECT {items_cols} FROM main.sale_items
+            WHERE sale_id IN (SELECT id FROM main.sales WHERE date >= ? AND date < ?)
+            """, (start, end))
+            counts["sale_items"] = c.rowcount
+            c.execute(f"""
+            INSERT INTO arc.sales({sales_cols})
+            SELECT {sales_cols} FROM main.sales WHERE date >= ? AND date < ?
+            """, (start, end))
+            counts["sales"] = c.rowcount
+            for table in ("expenses", "attendance"):
+                cols = _columns(c, table)
+                c.execute(f"""
+                INSERT INTO arc.{table}({cols})
+                SELECT {cols} FROM main.{table} WHERE date >= ? AND date < ?
+                """, (start, end))
+                counts[table] = c.rowcount
+            # sale_items follow their sales (ON DELETE CASCADE); shift totals of closed shifts are not touched
+            c.execute("DELETE FROM main.sales WHERE date >= ? AND date < ?", (start, end))
+            c.execute("DELETE FROM main.expenses WHERE date >= ? AND date < ?", (start, end))
+            c.execute("DELETE FROM main.attendance WHERE date >= ? AND date < ?", (start, end))
+            c.execute("""
+            INSERT INTO main.archive_log(month, archive_file, sales, sale_items, expenses, attendance, archived_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (month, os.path.basename(path), counts["sales"], counts["sale_items"], counts["expenses"],
+                  counts["attendance"], datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            c.execute("DETACH DATABASE arc")
+    db.notify("sales_deleted", {"month": month, "archived": True})
+    db.notify("expenses_deleted", {"month": month, "archived": True})
+    return counts
+
+
+def archive_old_months(db: Database, horizon_months: int = HORIZON_MONTHS) -> Dict[str, Dict[str, int]]:
+    """Archive every closed month older than the horizon; returns {month: counts}."""
+    return {month: archive_month(db, month) for month in archivable_months(db, horizon_months)}
+
+
+class ArchiveDatabase(Database):
+    """Read-only view over the live database plus its archives (see module docstring)."""
+
+    def __init__(self, db: Database):
+        super().__init__(db.path)
+
+    def connect(self):
+        conn = super().connect()
+        archives = list_archives(self)[-MAX_ATTACHED:]
+        if not archives:
+            return conn
+        c = conn.cursor()
+        schemas = []
+        for year, path in archives:
+            schema = f"arc_{year}"
+            c.execute("ATTACH DATABASE ? AS " + schema, (path,))
+            schemas.append(schema)
+        for table in ARCHIVED_TABLES:
+            c.execute(f"PRAGMA main.table_info({table})")
+            cols = [row[1] for row in c.fetchall()]
+            parts = [f"SELECT {', '.join(cols)} FROM main.{table}"]
+            for schema in schemas:
+                c.execute(f"PRAGMA {schema}.table_info({table})")
+                have = {row[1] for row in c.fetchall()}
+                if not have:
+                    continue
+                select = ", ".join(col if col in have else f"NULL AS {col}" for col in cols)
+                parts.append(f"SELECT {select} FROM {schema}.{table}")
+            c.execute(f"CREATE TEMP VIEW {table} AS {' UNION ALL '.join(parts)}")
+        return conn
+
+    def ensure_schema(self):
+        # The live database owns the schema
+        pass
+
+
+def historical(db: Database) -> Database:
+    """A Database for reports spanning archived months; db itself when nothing is archived."""
+    view = getattr(db, "historical_view", None)
+    if view is not None:
+        # RemoteDatabase (server.py): the archives are next to the server's database
+        return view()
+    if isinstance(db, ArchiveDatabase) or not list_archives(db):
+        return db
+    return ArchiveDatabase(db)
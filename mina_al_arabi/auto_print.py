@@ -1,7 +1,9 @@
 import os
 import time
 import json
-from typing import Optional
+import queue
+import multiprocessing as mp
+from typing import Optional, List, Tuple, Dict
 from mina_al_arabi.db import RECEIPTS_DIR, DATA_DIR
 
 try:
@@ -12,6 +14,26 @@ except Exception:
 
 STATE_PATH = os.path.join(DATA_DIR, "auto_print_state.json")
 PRINTER_CFG_PATH = os.path.join(DATA_DIR, "printer.txt")
+# Optional routing table: {"service": "XP-58 A", "product": "XP-58 B", "employee": "...", "shift": "...", "default": "..."}
+ROUTES_CFG_PATH = os.path.join(DATA_DIR, "printer_routes.json")
+STATS_PATH = os.path.join(DATA_DIR, "auto_print_stats.json")
+
+# Receipt type is encoded in the file name prefix
+RECEIPT_TYPES = [
+    ("receipt_service_", "service"),
+    ("receipt_product_", "product"),
+    ("receipt_employee_", "employee"),
+    ("shift_report_", "shift"),
+]
+STATS_INTERVAL = 60  # seconds between per-printer stats reports
+MAX_ATTEMPTS = 2  # a receipt whose worker died this many times while holding it is counted as failed
+
+# Backlog mode: when several receipts are pending (e.g. the printer was offline),
+# send them as one RAW job with a paper cut between receipts. The batch size is
+# capped so a failed job only affects a few receipts, which are then retried one by one.
+BATCH_SIZE = 10
+# Feed a few lines then partial cut (ESC/POS: GS V 66 n)
+CUT_COMMAND = b"\n\n\n\x1dV\x42\x00"
 
 
 def load_selected_printer() -> Optional[str]:
@@ -25,12 +47,37 @@ def load_selected_printer() -> Optional[str]:
     return None
 
 
+def receipt_type(fname: str) -> str:
+    for prefix, kind in RECEIPT_TYPES:
+        if fname.startswith(prefix):
+            return kind
+    return "default"
+
+
+def load_routes() -> Dict[str, Optional[str]]:
+    """Map receipt type -> printer name. Types missing from printer_routes.json use its
+    "default" entry, then the printer in printer.txt, then the system default (None)."""
+    routes = {}
+    try:
+        if os.path.exists(ROUTES_CFG_PATH):
+            with open(ROUTES_CFG_PATH, "r", encoding="utf-8") as f:
+                routes = {k: (v or "").strip() or None for k, v in json.load(f).items()}
+    except Exception as e:
+        print(f"[AutoPrint] Invalid routing table {ROUTES_CFG_PATH}: {e}")
+        routes = {}
+    default = routes.get("default") or load_selected_printer()
+    table = {"default": default}
+    for _, kind in RECEIPT_TYPES:
+        table[kind] = routes.get(kind) or default
+    return table
+
+
 def is_virtual_printer(name: str) -> bool:
     low = name.lower()
     return (not name.strip()) or any(b in low for b in ["pdf", "xps", "virtual"])
 
 
-def raw_print_text(text: str, printer_name: Optional[str]) -> None:
+def _resolve_printer(printer_name: Optional[str]) -> str:
     if win32print is None:
         raise RuntimeError("win32print غير متاح. رجاءً ثبّت pywin32: pip install pywin32")
     # Resolve printer
@@ -44,19 +91,75 @@ def raw_print_text(text: str, printer_name: Optional[str]) -> None:
         raise RuntimeError("لا يوجد طابعة محددة أو افتراضية للطباعة.")
     if is_virtual_printer(printer_name):
         raise RuntimeError(f"تم اختيار طابعة غير مناسبة للطباعة الحرارية: {printer_name}")
+    return printer_name
 
-    data = text.encode("cp1256", errors="replace")
+
+def _write_raw_job(printer_name: str, doc_name: str, chunks: List[bytes]) -> None:
+    """Send all chunks in a single OpenPrinter/StartDocPrinter round trip."""
     hPrinter = win32print.OpenPrinter(printer_name)
     try:
-        job = win32print.StartDocPrinter(hPrinter, 1, ("AutoPrintReceipt", None, "RAW"))
+        job = win32print.StartDocPrinter(hPrinter, 1, (doc_name, None, "RAW"))
         win32print.StartPagePrinter(hPrinter)
-        win32print.WritePrinter(hPrinter, data)
+        for data in chunks:
+            win32print.WritePrinter(hPrinter, data)
         win32print.EndPagePrinter(hPrinter)
         win32print.EndDocPrinter(hPrinter)
     finally:
         win32print.ClosePrinter(hPrinter)
 
 
+def raw_print_text(text: str, printer_name: Optional[str]) -> None:
+    printer_name = _resolve_printer(printer_name)
+    data = text.encode("cp1256", errors="replace")
+    _write_raw_job(printer_name, "AutoPrintReceipt", [data])
+
+
+def raw_print_batch(texts: List[str], printer_name: Optional[str]) -> None:
+    """Print several receipts as one RAW job, cutting the paper after each receipt."""
+    printer_name = _resolve_printer(printer_name)
+    chunks = []
+    for text in texts:
+        chunks.append(text.encode("cp1256", errors="replace"))
+        chunks.append(CUT_COMMAND)
+    _write_raw_job(printer_name, f"AutoPrintBacklog ({len(texts)})", chunks)
+
+
+def read_receipt(path: str) -> str:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    except UnicodeDecodeError:
+        # Try cp1256 if utf-8 fails
+        with open(path, "r", encoding="cp1256") as f:
+            return f.read()
+
+
+def print_backlog(pending: List[Tuple[str, str]], printer_name: Optional[str]) -> List[str]:
+    """Print pending (fname, text) receipts in batches of BATCH_SIZE.
+
+    If a batch job fails, its receipts are retried individually so one bad
+    receipt cannot lose the rest of the batch. Returns the printed file names.
+    """
+    printed = []
+    for start in range(0, len(pending), BATCH_SIZE):
+        batch = pending[start:start + BATCH_SIZE]
+        try:
+            raw_print_batch([text for _, text in batch], printer_name)
+            printed.extend(fname for fname, _ in batch)
+            print(f"[AutoPrint] Printed batch of {len(batch)}: {batch[0][0]} .. {batch[-1][0]}")
+            continue
+        except Exception as e:
+            print(f"[AutoPrint] Batch failed ({len(batch)} receipts), retrying one by one: {e}")
+        for fname, text in batch:
+            try:
+                raw_print_text(text, printer_name)
+                printed.append(fname)
+                print(f"[AutoPrint] Printed: {fname}")
+            except Exception as e:
+                print(f"[AutoPrint] Failed to print {fname}: {e}")
+    return printed
+
+
 def load_state() -> dict:
     if os.path.exists(STATE_PATH):
         try:
@@ -68,60 +171,244 @@ def load_state() -> dict:
 
 
 def save_state(state: dict) -> None:
+    save_state_file(STATE_PATH, state)
+
+
+def save_state_file(path: str, data: dict) -> None:
     try:
-        with open(STATE_PATH, "w", encoding="utf-8") as f:
-            json.dump(state, f, ensure_ascii=False, indent=2)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
     except Exception:
         pass
 
 
+def _print_one(fname: str, text: str, printer_name: Optional[str], key: str) -> bool:
+    try:
+        raw_print_text(text, printer_name)
+        print(f"[AutoPrint:{key}] Printed: {fname}")
+        return True
+    except Exception as e:
+        print(f"[AutoPrint:{key}] Failed to print {fname}: {e}")
+        return False
+
+
+def printer_worker(printer_name: Optional[str], jobs, results, current=None) -> None:
+    """Worker process owning one printer: prints its queue, batching any backlog.
+
+    jobs receives (fname, text, enqueued_at, retry); results receives
+    (printer_key, fname, ok, latency_seconds) for every job. Retried jobs (their
+    previous worker died) are printed one at a time with their name in `current`,
+    so if this worker dies too the pool knows which receipt was printing.
+    """
+    key = printer_name or "(default)"
+    while True:
+        job = jobs.get()
+        if job is None:
+            return
+        batch = [job]
+        # Drain whatever else is already waiting for this printer
+        while len(batch) < BATCH_SIZE:
+            try:
+                nxt = jobs.get_nowait()
+            except queue.Empty:
+                break
+            if nxt is None:
+                jobs.put(None)
+                break
+            batch.append(nxt)
+        fresh = [j for j in batch if not j[3]]
+        printed = set()
+        if len(fresh) > 1:
+            printed.update(print_backlog([(fname, text) for fname, text, _, _ in fresh], printer_name))
+        elif fresh:
+            fname, text, _, _ = fresh[0]
+            if _print_one(fname, text, printer_name, key):
+                printed.add(fname)
+        now = time.time()
+        for fname, _, enqueued_at, _ in fresh:
+            results.put((key, fname, fname in printed, now - enqueued_at))
+        for fname, text, enqueued_at, retry in batch:
+            if not retry:
+                continue
+            if current is not None:
+                current.value = fname.encode("utf-8")
+            ok = _print_one(fname, text, printer_name, key)
+            results.put((key, fname, ok, time.time() - enqueued_at))
+            if current is not None:
+                current.value = b""
+
+
+class PrinterPool:
+    """One worker process and queue per distinct printer in the routing table.
+
+    Jobs are remembered until their result arrives, so when a worker dies its
+    unfinished jobs are queued again to the replacement instead of being lost
+    with its queue. An attempt is charged to the receipt that was printing when
+    the worker died (all of them if it died inside a batch); after MAX_ATTEMPTS
+    the receipt is reported as failed.
+    """
+
+    def __init__(self, routes: Dict[str, Optional[str]]):
+        self.routes = routes
+        # SimpleQueue writes synchronously: a result is not lost if the worker dies right after it
+        self.results = mp.SimpleQueue()
+        self.workers: Dict[str, Tuple[mp.Process, object, Optional[str]]] = {}
+        self.current: Dict[str, object] = {}  # key -> shared name of the retried job being printed
+        self.stats: Dict[str, dict] = {}
+        # key -> {fname: [text, enqueued_at, attempts]} for jobs without a result yet
+        self.pending: Dict[str, Dict[str, list]] = {}
+        self.given_up: List[str] = []
+        for printer_name in set(routes.values()):
+            self._start(printer_name)
+
+    def _start(self, printer_name: Optional[str]) -> None:
+        key = printer_name or "(default)"
+        jobs = mp.Queue()
+        current = self.current.setdefault(key, mp.Array("c", 1024))
+        current.value = b""
+        proc = mp.Process(target=printer_worker, args=(printer_name, jobs, self.results, current), daemon=True)
+        proc.start()
+        self.workers[key] = (proc, jobs, printer_name)
+        self.stats.setdefault(key, {"queued": 0, "printed": 0, "failed": 0, "latency_total": 0.0, "latency_max": 0.0})
+        self.pending.setdefault(key, {})
+
+    def _restart(self, key: str) -> None:
+        """Replace a dead worker and hand its unfinished jobs to the new one."""
+        _proc, _jobs, printer_name = self.workers[key]
+        printing = self.current[key].value.decode("utf-8")
+        print(f"[AutoPrint:{key}] Worker stopped, restarting")
+        self._start(printer_name)
+        jobs = self.workers[key][1]
+        pending = self.pending[key]
+        for fname, job in list(pending.items()):
+            if not printing or fname == printing:
+                job[2] += 1
+            if job[2] >= MAX_ATTEMPTS:
+                print(f"[AutoPrint:{key}] Giving up on {fname}")
+                del pending[fname]
+                self.stats[key]["queued"] -= 1
+                self.stats[key]["failed"] += 1
+                self.given_up.append(fname)
+            else:
+                jobs.put((fname, job[0], job[1], True))
+
+    def check_workers(self) -> None:
+        for key, (proc, _jobs, _name) in list(self.workers.items()):
+            if not proc.is_alive():
+                self._restart(key)
+
+    def submit(self, fname: str, text: str) -> str:
+        printer_name = self.routes.get(receipt_type(fname), self.routes["default"])
+        key = printer_name or "(default)"
+        if not self.workers[key][0].is_alive():
+            self._restart(key)
+        enqueued_at = time.time()
+        self.workers[key][1].put((fname, text, enqueued_at, False))
+        self.pending[key][fname] = [text, enqueued_at, 0]
+        self.stats[key]["queued"] += 1
+        return key
+
+    def collect(self) -> List[str]:
+        """Return file names whose jobs finished (printed or failed) since the last call.
+
+        Dead workers are restarted here, so a stopped printer process is noticed on
+        every poll and not only when its next receipt arrives.
+        """
+        done = []
+        while not self.results.empty():
+            key, fname, ok, latency = self.results.get()
+            if self.pending[key].pop(fname, None) is None:
+                continue  # late result of a job already re-queued and finished
+            st = self.stats[key]
+            st["queued"] -= 1
+            st["printed" if ok else "failed"] += 1
+            st["latency_total"] += latency
+            st["latency_max"] = max(st["latency_max"], latency)
+            done.append(fname)
+        self.check_workers()
+        done.extend(self.given_up)
+        self.given_up = []
+        return done
+
+    def report(self) -> Dict[str, dict]:
+        out = {}
+        for key, st in self.stats.items():
+            finished = st["printed"] + st["failed"]
+            out[key] = {
+                "queue_depth": st["queued"],
+                "printed": st["printed"],
+                "failed": st["failed"],
+                "avg_latency_s": round(st["latency_total"] / finished, 3) if finished else 0.0,
+                "max_latency_s": round(st["latency_max"], 3),
+            }
+        return out
+
+    def stop(self) -> None:
+        for proc, jobs, _ in self.workers.values():
+            jobs.put(None)
+        for proc, _, _ in self.workers.values():
+            proc.join(timeout=5)
+
+
 def main():
     os.makedirs(RECEIPTS_DIR, exist_ok=True)
     os.makedirs(DATA_DIR, exist_ok=True)
 
     state = load_state()
     processed = set(state.get("processed_files", []))
-    printer_name = load_selected_printer()
+    routes = load_routes()
+    pool = PrinterPool(routes)
+    in_flight = set()
 
     print(f"[AutoPrint] Watching: {RECEIPTS_DIR}")
-    print(f"[AutoPrint] Printer: {printer_name or '(default)'}")
+    for kind, printer_name in routes.items():
+        print(f"[AutoPrint] {kind}: {printer_name or '(default)'}")
 
-    while True:
-        try:
-            files = [f for f in os.listdir(RECEIPTS_DIR) if f.lower().endswith(".txt")]
-            files.sort()
-            for fname in files:
-                path = os.path.join(RECEIPTS_DIR, fname)
-                if path in processed:
-                    continue
-                # Read content
-                try:
-                    with open(path, "r", encoding="utf-8") as f:
-                        text = f.read()
-                except Exception:
-                    # Try cp1256 if utf-8 fails
+    last_report = time.time()
+    try:
+        while True:
+            try:
+                files = [f for f in os.listdir(RECEIPTS_DIR) if f.lower().endswith(".txt")]
+                files.sort()
+                before = len(processed)
+                for fname in files:
+                    path = os.path.join(RECEIPTS_DIR, fname)
+                    if path in processed or path in in_flight:
+                        continue
+                    # Read content
                     try:
-                        with open(path, "r", encoding="cp1256") as f:
-                            text = f.read()
+                        text = read_receipt(path)
                     except Exception as e:
                         print(f"[AutoPrint] Failed to read {fname}: {e}")
                         processed.add(path)
                         continue
+                    pool.submit(fname, text)
+                    in_flight.add(path)
+
+                # Mark as processed regardless of the print result to avoid loops
+                for fname in pool.collect():
+                    path = os.path.join(RECEIPTS_DIR, fname)
+                    in_flight.discard(path)
+                    processed.add(path)
+                if len(processed) != before:
+                    state["processed_files"] = list(processed)
+                    save_state(state)
 
-                # Print
-                try:
-                    raw_print_text(text, printer_name)
-                    print(f"[AutoPrint] Printed: {fname}")
-                except Exception as e:
-                    print(f"[AutoPrint] Failed to print {fname}: {e}")
-                # Mark as processed regardless to avoid loops
-                processed.add(path)
-                state["processed_files"] = list(processed)
-                save_state(state)
-        except Exception as loop_err:
-            print(f"[AutoPrint] Loop error: {loop_err}")
-        time.sleep(2)
+                if time.time() - last_report >= STATS_INTERVAL:
+                    last_report = time.time()
+                    report = pool.report()
+                    for key, st in report.items():
+                        print(f"[AutoPrint:{key}] queue={st['queue_depth']} printed={st['printed']} "
+                              f"failed={st['failed']} avg={st['avg_latency_s']}s max={st['max_latency_s']}s")
+                    save_state_file(STATS_PATH, report)
+            except Exception as loop_err:
+                print(f"[AutoPrint] Loop error: {loop_err}")
+            time.sleep(2)
+    finally:
+        pool.stop()
 
 
 if __name__ == "__main__":
+    # Needed for the worker processes in the PyInstaller build (spawn start method on Windows)
+    mp.freeze_support()
     main()
\ No newline at end of file
@@ -0,0 +1,268 @@
+"""
+Headless reports: python -m mina_al_arabi.cli <command> [options]
+
+Commands:
+    admin       --year Y --month M        Monthly admin report
+    zreport     [--shift-id N]            Shift Z-report (active or last shift by default)
+    employee    --name X | --id N         Employee statement for a month (or a day with --day)
+    payroll     --year Y --month M        Payroll sheet for all employees; --out PATH also writes it as CSV
+    profit      --year Y [--month M]      Units, revenue, cost and margin per product for a month or a year
+    analytics   [--from D] [--to D]       Revenue trend, per-employee tickets, hour/weekday heatmap, daily averages
+                [--view monthly|employees|heatmap|daily] [--type service|product]
+    forecast    [--refresh] [--weeks N]   Customers per hour by weekday and recommended barbers
+    suppliers                             Supplier balances
+    inventory   [--date D]                Inventory value (at the end of day D from the stock ledger)
+    movements   --name X | --id N         Stock movements of a product with running balance
+                [--from D] [--to D]
+    reorder     [--days N]                Low-stock products with suggested order quantities per supplier
+    export      KIND --out PATH           Raw sales/expenses/attendance as CSV or JSONL
+                [--from D] [--to D] [--as csv|jsonl] [--per-month] [--workers N]
+    import      KIND PATH                 Bulk import products/services/employees/sales
+                [--as csv|jsonl] [--errors PATH] [--batch N]
+    archive     [--months N] [--dry-run]  Move closed months older than N months to archive_YYYY.db
+    maintenance [--budget S] [--check]    Statistics, incremental vacuum and quick_check; --log shows past runs
+                [--vacuum]                --vacuum converts an old database to incremental vacuum (full VACUUM)
+    selfcheck                             Fail if importing the CLI loads PySide6 or is slow
+
+Common options: --format text|csv|json, --db PATH.
+
+Only db.py and the headless modules (reporting, export, importer, archive,
+maintenance, payroll, profitability, analytics, forecast, reorder) are imported: this must keep working on machines where starting
+the Qt GUI is slow, so never import PySide6 or the dashboards from here.
+"""
+import argparse
+import json
+import subprocess
+import sys
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+
+from mina_al_arabi.db import Database, DB_PATH
+from mina_al_arabi import reporting, maintenance, payroll, profitability, reorder
+from mina_al_arabi.export import EXPORTS, FILE_FORMATS, timed_export
+from mina_al_arabi.importer import IMPORT_KINDS, BATCH_SIZE, import_file
+from mina_al_arabi.archive import HORIZON_MONTHS, archivable_months, archive_old_months, historical
+
+
+IMPORT_BUDGET_S = 0.5  # selfcheck fails above this import time
+ANALYTICS_VIEWS = ("monthly", "employees", "heatmap", "daily")  # analytics.analytics_report views
+ANALYTICS_TYPES = ("service", "product")  # analytics.SALE_TYPES
+
+
+def _employee_id(db: Database, args) -> int:
+    if args.id is not None:
+        return args.id
+    for eid, name in db.list_employees():
+        if name == args.name:
+            return eid
+    raise SystemExit(f"الموظف غير موجود: {args.name}")
+
+
+def selfcheck() -> int:
+    """Import the CLI in a fresh interpreter and check what it pulled in and how long it took."""
+    code = (
+        "import sys, time, json\n"
+        "t = time.perf_counter()\n"
+        "import mina_al_arabi.cli\n"
+        "print(json.dumps({'seconds': time.perf_counter() - t,"
+        " 'qt': sorted(m for m in sys.modules if m.split('.')[0] == 'PySide6'"
+        " or m.startswith('mina_al_arabi.dashboards'))}))\n"
+    )
+    proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    if proc.returncode != 0:
+        print(proc.stderr, file=sys.stderr)
+        return 1
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    print(f"import time: {result['seconds'] * 1000:.1f} ms (budget {IMPORT_BUDGET_S * 1000:.0f} ms)")
+    if result["qt"]:
+        print(f"FAIL: GUI modules imported: {', '.join(result['qt'])}")
+        return 1
+    if result["seconds"] > IMPORT_BUDGET_S:
+        print("FAIL: import time over budget")
+        return 1
+    print("OK")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    now = datetime.now()
+    parser = argparse.ArgumentParser(prog="python -m mina_al_arabi.cli", description="تقارير صالون مينا العربي بدون الواجهة")
+    parser.add_argument("--format", choices=reporting.FORMATS, default="text")
+    parser.add_argument("--db", default=DB_PATH, help="مسار قاعدة البيانات")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("admin", help="التقرير الإداري الشهري")
+    p.add_argument("--year", type=int, default=now.year)
+    p.add_argument("--month", type=int, default=now.month)
+
+    p = sub.add_parser("zreport", help="تقرير الشفت")
+    p.add_argument("--shift-id", type=int)
+
+    p = sub.add_parser("employee", help="كشف حساب موظف")
+    who = p.add_mutually_exclusive_group(required=True)
+    who.add_argument("--name")
+    who.add_argument("--id", type=int)
+    p.add_argument("--year", type=int, default=now.year)
+    p.add_argument("--month", type=int, default=now.month)
+    p.add_argument("--day", type=int)
+
+    p = sub.add_parser("payroll", help="كشف الرواتب الشهري")
+    p.add_argument("--year", type=int, default=now.year)
+    p.add_argument("--month", type=int, default=now.month)
+    p.add_argument("--out", help="حفظ الكشف كملف CSV")
+
+    p = sub.add_parser("profit", help="ربحية المنتجات")
+    p.add_argument("--year", type=int, default=now.year)
+    p.add_argument("--month", type=int, help="بدونه: السنة كاملة")
+
+    p = sub.add_parser("analytics", help="تحليلات المبيعات")
+    p.add_argument("--from", dest="date_from", help="YYYY-MM-DD (افتراضياً أول الشهر قبل سنة)")
+    p.add_argument("--to", dest="date_to", help="YYYY-MM-DD (شامل، افتراضياً اليوم)")
+    p.add_argument("--view", choices=ANALYTICS_VIEWS, default="monthly")
+    p.add_argument("--type", dest="sale_type", choices=ANALYTICS_TYPES,
+                   help="الخريطة والاتجاه الشهري لنوع واحد فقط")
+
+    p = sub.add_parser("forecast", help="توقعات التوظيف")
+    p.add_argument("--refresh", action="store_true", help="تحديث البيانات حتى أمس قبل الحساب")
+    p.add_argument("--weeks", type=int, default=8, help="عدد الأسابيع الأخيرة المستخدمة")
+
+    sub.add_parser("suppliers", help="أرصدة الموردين")
+    p = sub.add_parser("inventory", help="قيمة المخزون")
+    p.add_argument("--date", dest="day", help="YYYY-MM-DD: المخزون في نهاية هذا اليوم")
+
+    p = sub.add_parser("movements", help="حركة مخزون منتج")
+    which = p.add_mutually_exclusive_group(required=True)
+    which.add_argument("--name")
+    which.add_argument("--id", type=int)
+    p.add_argument("--from", dest="date_from", help="YYYY-MM-DD")
+    p.add_argument("--to", dest="date_to", help="YYYY-MM-DD (شامل)")
+
+    p = sub.add_parser("reorder", help="اقتراحات إعادة الطلب")
+    p.add_argument("--days", type=int, default=reorder.VELOCITY_DAYS, help="عدد الأيام لحساب معدل البيع")
+
+    p = sub.add_parser("export", help="تصدير البيانات الخام")
+    p.add_argument("kind", choices=sorted(EXPORTS))
+    p.add_argument("--out", required=True, help="ملف الإخراج، أو مجلد مع --per-month")
+    p.add_argument("--from", dest="date_from", help="YYYY-MM-DD")
+    p.add_argument("--to", dest="date_to", help="YYYY-MM-DD (شامل)")
+    p.add_argument("--as", dest="file_format", choices=FILE_FORMATS, default="csv")
+    p.add_argument("--per-month", action="store_true", help="ملف لكل شهر")
+    p.add_argument("--workers", type=int)
+
+    p = sub.add_parser("import", help="استيراد بيانات بالجملة")
+    p.add_argument("kind", choices=IMPORT_KINDS)
+    p.add_argument("path")
+    p.add_argument("--as", dest="file_format", choices=FILE_FORMATS)
+    p.add_argument("--errors", dest="error_path", help="ملف الأخطاء (افتراضياً PATH.errors.jsonl)")
+    p.add_argument("--batch", type=int, default=BATCH_SIZE)
+
+    p = sub.add_parser("archive", help="أرشفة الأشهر القديمة")
+    p.add_argument("--months", type=int, default=HORIZON_MONTHS, help="عدد الأشهر الأخيرة التي تبقى في القاعدة")
+    p.add_argument("--dry-run", action="store_true")
+
+    p = sub.add_parser("maintenance", help="صيانة قاعدة البيانات")
+    p.add_argument("--budget", type=float, default=maintenance.BUDGET_SECONDS, help="الحد الأقصى بالثواني")
+    p.add_argument("--check", action="store_true", help="فحص السلامة حتى لو تم مؤخراً")
+    p.add_argument("--vacuum", action="store_true",
+                   help="تحويل قاعدة بيانات قديمة إلى التحرير التدريجي (VACUUM كامل، قد يطول)")
+    p.add_argument("--log", action="store_true", help="عرض آخر عمليات الصيانة فقط")
+
+    sub.add_parser("selfcheck", help="فحص زمن التشغيل")
+    return parser
+
+
+def run(args, db: Database) -> Optional[dict]:
+    if args.command == "admin":
+        return reporting.admin_monthly_report(historical(db), args.year, args.month)
+    if args.command == "zreport":
+        return reporting.shift_z_report(db, args.shift_id)
+    if args.command == "employee":
+        return reporting.employee_statement(historical(db), _employee_id(db, args), args.year, args.month, args.day)
+    if args.command == "payroll":
+        report = payroll.payroll_report(payroll.payroll_rows(historical(db), args.year, args.month), args.year, args.month)
+        if args.out:
+            payroll.write_payroll_csv(report, args.out)
+        return report
+    if args.command == "profit":
+        return profitability.ProfitabilityCache(db).report(args.year, args.month)
+    if args.command == "analytics":
+        # NumPy is only imported for this command
+        from mina_al_arabi import analytics
+        today = date.today()
+        date_from = args.date_from or date(today.year - 1, today.month, 1).isoformat()
+        date_to = (date.fromisoformat(args.date_to) if args.date_to else today) + timedelta(days=1)
+        return analytics.analytics_report(analytics.analyze(db, date_from, date_to.isoformat()), args.view,
+                                          args.sale_type)
+    if args.command == "forecast":
+        # NumPy is only imported for this command
+        from mina_al_arabi import forecast
+        if args.refresh:
+            forecast.refresh(db)
+        return forecast.forecast_report(forecast.forecast(db, args.weeks))
+    if args.command == "suppliers":
+        return reporting.supplier_balances(db)
+    if args.command == "inventory":
+        return reporting.inventory_value(db, args.day)
+    if args.command == "movements":
+        product_id, name = args.id, args.name or f"#{args.id}"
+        if product_id is None:
+            product = db.get_product_by_name(args.name)
+            if not product:
+                raise SystemExit(f"المنتج غير موجود: {args.name}")
+            product_id = product[0]
+        return reporting.stock_movements(db, product_id, name, args.date_from, args.date_to)
+    if args.command == "reorder":
+        return reorder.reorder_report(reorder.reorder_suggestions(db, args.days))
+    if args.command == "export":
+        result = timed_export(historical(db), args.kind, args.date_from, args.date_to, args.out, args.file_format,
+                              args.per_month, args.workers)
+        rows = [[path, n] for path, n in sorted(result["files"].items())]
+        return reporting.make_report(f"تصدير {args.kind}", ["الملف", "عدد الصفوف"], rows,
+                                 {"rows": result["rows"], "milliseconds": int(result["seconds"] * 1000)})
+    if args.command == "archive":
+        if args.dry_run:
+            rows = [[m, "", "", "", ""] for m in archivable_months(db, args.months)]
+        else:
+            done = archive_old_months(db, args.months)
+            rows = [[m, n["sales"], n["sale_items"], n["expenses"], n["attendance"]] for m, n in done.items()]
+        return reporting.make_report("أرشفة الأشهر القديمة", ["الشهر", "المبيعات", "الأصناف", "المصاريف", "الحضور"], rows,
+                                 {"months": len(rows)})
+    if args.command == "maintenance":
+        columns = ["البدء", "السبب", "المهام", "الصفحات المحررة", "نتيجة الفحص", "المدة (مللي ثانية)"]
+        if args.log:
+            rows = [list(r) for r in maintenance.list_runs(db)]
+            return reporting.make_report("سجل الصيانة", columns, rows, {})
+        r = maintenance.run_maintenance(db, "manual", args.budget, args.check, args.vacuum)
+        row = [r["started_at"], r["trigger"], ",".join(r["tasks"]), r["freed_pages"], r["check_result"], r["duration_ms"]]
+        return reporting.make_report("صيانة قاعدة البيانات", columns, [row], {"milliseconds": r["duration_ms"]})
+    if args.command == "import":
+        result = import_file(db, args.kind, args.path, args.file_format, args.error_path, args.batch)
+        rows = [[result["error_file"], result["errors"]]] if result["error_file"] else []
+        totals = {k: result[k] for k in ("read", "imported", "errors", "rows_per_sec")}
+        totals["milliseconds"] = int(result["seconds"] * 1000)
+        return reporting.make_report(f"استيراد {args.kind}", ["ملف الأخطاء", "عدد الأخطاء"], rows, totals)
+    return None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        # Arabic output on the Windows console
+        sys.stdout.reconfigure(encoding="utf-8")
+    except Exception:
+        pass
+    if args.command == "selfcheck":
+        return selfcheck()
+    db = Database(args.db)
+    db.ensure_schema()
+    try:
+        report = run(args, db)
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return 1
+    print(reporting.format_report(report, args.format))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,10 +2,13 @@ from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QSpinBox, QTableWidget, QTableWidgetItem,
     QPushButton, QMessageBox
 )
-from PySide6.QtGui import QFont
+from PySide6.QtGui import QFont, QColor
 from PySide6.QtCore import Qt
 from datetime import datetime
 from mina_al_arabi.db import Database
+from mina_al_arabi.reporting import admin_monthly_report
+from mina_al_arabi.archive import historical
+from mina_al_arabi.profitability import ProfitabilityCache, PROFIT_COLUMNS
 
 
 def format_amount(amount: float) -> str:
@@ -29,6 +32,8 @@ class AdminReportDashboard(QWidget):
     def __init__(self, db: Database):
         super().__init__()
         self.db = db
+        self.profit_cache = ProfitabilityCache(db)
+        self.destroyed.connect(lambda *_: self.profit_cache.close())
 
         self.header_font = QFont("Cairo", 18, QFont.Bold)
         self.body_font = QFont("Cairo", 14)
@@ -108,86 +113,98 @@ class AdminReportDashboard(QWidget):
         self.fin_totals_label.setFont(self.body_font)
         layout.addWidget(self.fin_totals_label, alignment=Qt.AlignRight)
 
+        # Section 4: Product profitability (negative margins first)
+        self.profit_header = QLabel("القسم 4 – ربحية المنتجات")
+        self.profit_header.setFont(self.header_font)
+        layout.addWidget(self.profit_header)
+
+        self.profit_totals_label = QLabel("الإيرادات: 0 | التكلفة: 0 | الهامش: 0")
+        self.profit_totals_label.setFont(self.body_font)
+        layout.addWidget(self.profit_totals_label, alignment=Qt.AlignRight)
+
+        self.profit_table = QTableWidget(0, len(PROFIT_COLUMNS))
+        self.profit_table.setFont(self.body_font)
+        self.profit_table.setHorizontalHeaderLabels(PROFIT_COLUMNS)
+        self.profit_table.horizontalHeader().setStretchLastSection(True)
+        self.profit_table.verticalHeader().setVisible(False)
+        layout.addWidget(self.profit_table)
+
         self.refresh()
 
     def refresh(self):
         year = int(self.year_input.value())
         month = int(self.month_input.value())
+        # Includes archived months transparently
+        report = admin_monthly_report(historical(self.db), year, month)
+        t = report["totals"]
 
         # Revenue totals (net-after-discount only)
-        net_services = self.db.sum_services_net_in_month(year, month)
-        net_sales = self.db.sum_products_net_in_month(year, month)
-        total_revenue = net_services + net_sales
         self.rev_totals_label.setText(
-            f"إجمالي الخدمات (صافي): {format_amount(net_services)} ج.م | "
-            f"إجمالي المبيعات (صافي): {format_amount(net_sales)} ج.م | "
-            f"إجمالي الإيرادات (الصافي): {format_amount(total_revenue)} ج.م"
+            f"إجمالي الخدمات (صافي): {format_amount(t['net_services'])} ج.م | "
+            f"إجمالي المبيعات (صافي): {format_amount(t['net_sales'])} ج.م | "
+            f"إجمالي الإيرادات (الصافي): {format_amount(t['total_revenue'])} ج.م"
         )
 
         # Per-employee services totals (effective after discounts/material deductions)
         self.emp_table.setRowCount(0)
-        for eid, name in self.db.list_employees():
-            sales = self.db.list_sales_by_employee_in_month(eid, year, month)
-            emp_total = 0.0
-            for s in sales:
-                if s.get("type") == "service" and s.get("buyer_type") == "customer":
-                    disc = int(s.get("discount_percent") or 0)
-                    mat = float(s.get("material_deduction") or 0.0)
-                    eff = float(s["total"]) * (1 - disc/100.0) - mat
-                    if eff < 0:
-                        eff = 0.0
-                    emp_total += eff
-            if emp_total > 0:
-                r = self.emp_table.rowCount()
-                self.emp_table.insertRow(r)
-                self.emp_table.setItem(r, 0, QTableWidgetItem(name))
-                self.emp_table.setItem(r, 1, QTableWidgetItem(format_amount(emp_total)))
+        for name, emp_total in report["rows"]:
+            r = self.emp_table.rowCount()
+            self.emp_table.insertRow(r)
+            self.emp_table.setItem(r, 0, QTableWidgetItem(name))
+            self.emp_table.setItem(r, 1, QTableWidgetItem(format_amount(emp_total)))
         self.emp_table.resizeColumnsToContents()
 
         # Expenses and costs (simplified totals only)
-        shop_exp = self.db.sum_expenses_category_in_month("مشتريات للمحل", year, month)
-        daily_exp = self.db.sum_expenses_category_in_month("يوميات العمالة", year, month)
-        supp_pay = self.db.sum_expenses_category_in_month("دفعات الموردين", year, month)
-        # General = all minus categorized above
-        rows = self.db.list_expenses()
-        from datetime import datetime as dtmod
-        gen_exp = 0.0
-        for rid, date, cat, amount, note in rows:
-            try:
-                d = dtmod.strptime(date, "%Y-%m-%d %H:%M:%S")
-                if d.year != year or d.month != month:
-                    continue
-            except Exception:
-                if not (str(date)[:4] == str(year) and str(date)[5:7] == f"{month:02d}"):
-                    continue
-            if cat not in {"مشتريات للمحل", "يوميات العمالة", "دفعات الموردين"}:
-                gen_exp += amount
-
-        total_expenses = gen_exp + shop_exp + daily_exp + supp_pay
-        total_hidden_material = self.db.sum_material_deductions_in_month(year, month)
         self.exp_totals_label.setText(
-            f"إجمالي المصاريف: {format_amount(total_expenses)} ج.م | "
-            f"مشتريات المحل: {format_amount(shop_exp)} ج.م | "
-            f"يوميات العمالة: {format_amount(daily_exp)} ج.م | "
-            f"دفعات الموردين: {format_amount(supp_pay)} ج.م | "
-            f"إجمالي خصومات المواد (مخفي): {format_amount(total_hidden_material)} ج.م"
+            f"إجمالي المصاريف: {format_amount(t['total_expenses'])} ج.م | "
+            f"مشتريات المحل: {format_amount(t['shop_purchases'])} ج.م | "
+            f"يوميات العمالة: {format_amount(t['daily_wages'])} ج.م | "
+            f"دفعات الموردين: {format_amount(t['supplier_payments'])} ج.م | "
+            f"إجمالي خصومات المواد (مخفي): {format_amount(t['material_deductions'])} ج.م"
         )
 
         # Financial summary (net-only)
-        net_profit = total_revenue - total_expenses
         self.fin_totals_label.setText(
-            f"إجمالي الإيرادات (الصافي): {format_amount(total_revenue)} ج.م | "
-            f"إجمالي المصاريف: {format_amount(total_expenses)} ج.م | "
-            f"صافي الربح: {format_amount(net_profit)} ج.م"
+            f"إجمالي الإيرادات (الصافي): {format_amount(t['total_revenue'])} ج.م | "
+            f"إجمالي المصاريف: {format_amount(t['total_expenses'])} ج.م | "
+            f"صافي الربح: {format_amount(t['net_profit'])} ج.م"
         )
 
         # Top dashboard summary: Net Profit, Inventory Value, Pending Supplier Balances
-        inv_value = self.db.inventory_total_value()
-        supp_pending = self.db.total_supplier_pending_balance()
         self.top_summary_label.setText(
-            f"💰 صافي الربح: {format_amount(net_profit)} ج.م | "
-            f"🏪 قيمة المخزون: {format_amount(inv_value)} ج.م | "
-            f"🧾 أرصدة الموردين المعلقة: {format_amount(supp_pending)} ج.م"
+            f"💰 صافي الربح: {format_amount(t['net_profit'])} ج.م | "
+            f"🏪 قيمة المخزون: {format_amount(t['inventory_value'])} ج.م | "
+            f"🧾 أرصدة الموردين المعلقة: {format_amount(t['supplier_pending'])} ج.م"
+        )
+
+        self._refresh_profitability(year, month)
+
+    def _refresh_profitability(self, year: int, month: int):
+        rows = self.profit_cache.rows(year, month)
+        self.profit_table.setRowCount(0)
+        for row in rows:
+            r = self.profit_table.rowCount()
+            self.profit_table.insertRow(r)
+            unknown = "غير معروف"
+            values = [
+                row["product"],
+                str(row["units"]),
+                format_amount(row["revenue"]),
+                unknown if row["cost"] is None else format_amount(row["cost"]),
+                unknown if row["margin"] is None else format_amount(row["margin"]),
+                "" if row["margin_percent"] is None else f"{row['margin_percent']:.1f}",
+            ]
+            for col, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if row["margin"] is not None and row["margin"] < 0:
+                    item.setBackground(QColor(178, 34, 34, 90))  # losing money on this product
+                self.profit_table.setItem(r, col, item)
+        self.profit_table.resizeColumnsToContents()
+        t = self.profit_cache.report(year, month)["totals"]
+        self.profit_totals_label.setText(
+            f"الإيرادات: {format_amount(t['revenue'])} ج.م | التكلفة: {format_amount(t['cost'])} ج.م | "
+            f"الهامش: {format_amount(t['margin'])} ج.م | منتجات بهامش سالب: {t['loss_products']} | "
+            f"بدون سعر تكلفة: {t['unknown_cost']}"
         )
 
     def _clear_month_data(self):
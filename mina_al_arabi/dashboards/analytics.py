@@ -0,0 +1,199 @@
+from PySide6.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QSpinBox, QTableWidget, QTableWidgetItem, QPushButton, QComboBox
+)
+from PySide6.QtGui import QFont, QColor
+from PySide6.QtCore import Qt
+from datetime import date, datetime
+from mina_al_arabi.db import Database
+from mina_al_arabi.analytics import AnalyticsCache, WEEKDAYS, MOVING_WINDOWS, SALE_TYPES
+from mina_al_arabi import forecast
+
+
+def format_amount(amount: float) -> str:
+    return str(int(round(amount)))
+
+
+class AnalyticsDashboard(QWidget):
+    """تحليلات المبيعات: خريطة الساعات والأيام، الاتجاه الشهري، متوسط الفاتورة والمتوسطات المتحركة."""
+    def __init__(self, db: Database):
+        super().__init__()
+        self.db = db
+        self.cache = AnalyticsCache(db)
+        self.destroyed.connect(lambda *_: self.cache.close())
+
+        self.header_font = QFont("Cairo", 18, QFont.Bold)
+        self.body_font = QFont("Cairo", 14)
+
+        layout = QVBoxLayout(self)
+
+        # Controls: from month/year to month/year (inclusive)
+        controls = QHBoxLayout()
+        title = QLabel("تحليلات المبيعات")
+        title.setFont(self.header_font)
+        controls.addWidget(title)
+        controls.addStretch()
+
+        now = datetime.now()
+        controls.addWidget(QLabel("من"))
+        self.from_month = self._spin(1, 12, now.month)
+        self.from_year = self._spin(2000, 2100, now.year - 1)
+        controls.addWidget(self.from_month)
+        controls.addWidget(self.from_year)
+        controls.addWidget(QLabel("إلى"))
+        self.to_month = self._spin(1, 12, now.month)
+        self.to_year = self._spin(2000, 2100, now.year)
+        controls.addWidget(self.to_month)
+        controls.addWidget(self.to_year)
+
+        refresh_btn = QPushButton("تحديث")
+        refresh_btn.setFont(self.body_font)
+        refresh_btn.clicked.connect(self.refresh)
+        controls.addWidget(refresh_btn)
+        layout.addLayout(controls)
+
+        self.summary_label = QLabel("الإيرادات: 0 | عدد الفواتير: 0")
+        self.summary_label.setFont(self.body_font)
+        layout.addWidget(self.summary_label, alignment=Qt.AlignCenter)
+
+        # Heatmap: weekdays x hours, for all sales or one sale type
+        heat_row = QHBoxLayout()
+        heat_header = QLabel("الإيرادات حسب اليوم والساعة")
+        heat_header.setFont(self.header_font)
+        heat_row.addWidget(heat_header)
+        heat_row.addStretch()
+        self.heat_type_combo = QComboBox()
+        self.heat_type_combo.setFont(self.body_font)
+        self.heat_type_combo.addItem("الكل", None)
+        for sale_type, label in SALE_TYPES.items():
+            self.heat_type_combo.addItem(label, sale_type)
+        self.heat_type_combo.currentIndexChanged.connect(lambda *_: self.refresh())
+        heat_row.addWidget(self.heat_type_combo)
+        layout.addLayout(heat_row)
+        self.heatmap_table = QTableWidget(7, 24)
+        self.heatmap_table.setHorizontalHeaderLabels([f"{h:02d}" for h in range(24)])
+        self.heatmap_table.setVerticalHeaderLabels(WEEKDAYS)
+        self.heatmap_table.setMinimumHeight(260)
+        layout.addWidget(self.heatmap_table)
+
+        tables = QHBoxLayout()
+        self.monthly_table = self._table(["الشهر", "الإيرادات", "الفواتير", "التغير %"] + list(SALE_TYPES.values()))
+        self.employees_table = self._table(["الموظف", "الفواتير", "الإيرادات", "متوسط الفاتورة"])
+        self.daily_table = self._table(["اليوم", "الإيرادات"] + [f"متوسط {w} يوم" for w in MOVING_WINDOWS])
+        for header, table in (("الاتجاه الشهري", self.monthly_table), ("متوسط الفاتورة لكل موظف", self.employees_table),
+                              ("الإيرادات اليومية", self.daily_table)):
+            col = QVBoxLayout()
+            lbl = QLabel(header)
+            lbl.setFont(self.body_font)
+            col.addWidget(lbl)
+            col.addWidget(table)
+            tables.addLayout(col)
+        layout.addLayout(tables)
+
+        # Staffing forecast: recommended barbers per weekday and hour
+        staff_row = QHBoxLayout()
+        staff_header = QLabel("الحلاقون المقترحون لكل ساعة")
+        staff_header.setFont(self.header_font)
+        staff_row.addWidget(staff_header)
+        staff_row.addStretch()
+        self.staff_summary_label = QLabel("")
+        self.staff_summary_label.setFont(self.body_font)
+        staff_row.addWidget(self.staff_summary_label)
+        forecast_btn = QPushButton("تحديث التوقعات")
+        forecast_btn.setFont(self.body_font)
+        forecast_btn.clicked.connect(self._refresh_forecast)
+        staff_row.addWidget(forecast_btn)
+        layout.addLayout(staff_row)
+        self.staff_table = QTableWidget(7, 24)
+        self.staff_table.setHorizontalHeaderLabels([f"{h:02d}" for h in range(24)])
+        self.staff_table.setVerticalHeaderLabels(WEEKDAYS)
+        self.staff_table.setMinimumHeight(260)
+        layout.addWidget(self.staff_table)
+
+    def showEvent(self, event):
+        # Computed when the tab is first shown rather than at startup; later shows hit the cache
+        super().showEvent(event)
+        self.refresh()
+
+    def _spin(self, low: int, high: int, value: int) -> QSpinBox:
+        spin = QSpinBox()
+        spin.setRange(low, high)
+        spin.setValue(value)
+        spin.setFont(self.body_font)
+        return spin
+
+    def _table(self, headers) -> QTableWidget:
+        table = QTableWidget(0, len(headers))
+        table.setFont(self.body_font)
+        table.setHorizontalHeaderLabels(headers)
+        table.verticalHeader().setVisible(False)
+        return table
+
+    def _fill(self, table: QTableWidget, rows):
+        table.setRowCount(0)
+        for row in rows:
+            i = table.rowCount()
+            table.insertRow(i)
+            for col, value in enumerate(row):
+                table.setItem(i, col, QTableWidgetItem(value))
+        table.resizeColumnsToContents()
+
+    def refresh(self):
+        start = date(self.from_year.value(), self.from_month.value(), 1)
+        to_index = self.to_year.value() * 12 + self.to_month.value()  # first day of the month after "to"
+        end = date(to_index // 12, to_index % 12 + 1, 1)
+        if end <= start:
+            return
+        result = self.cache.get(start.isoformat(), end.isoformat())
+
+        self.summary_label.setText(
+            f"الإيرادات: {format_amount(result['revenue'])} | عدد الفواتير: {result['invoices']}"
+        )
+
+        sale_type = self.heat_type_combo.currentData()
+        heatmap = result["heatmap"] if sale_type is None else result["heatmap_by_type"][sale_type]
+        peak = max((v for hours in heatmap for v in hours), default=0.0) or 1.0
+        for d, hours in enumerate(heatmap):
+            for h, value in enumerate(hours):
+                item = QTableWidgetItem(format_amount(value) if value else "")
+                # More opaque gold for busier hours
+                item.setBackground(QColor(212, 175, 55, int(255 * value / peak)))
+                self.heatmap_table.setItem(d, h, item)
+        self.heatmap_table.resizeColumnsToContents()
+
+        by_type = [result["monthly_by_type"][t] for t in SALE_TYPES]
+        self._fill(self.monthly_table, [
+            [month, format_amount(rev), str(n), "" if change is None else f"{change:+.1f}"]
+            + [format_amount(trend[i][1]) for trend in by_type]
+            for i, (month, rev, n, change) in enumerate(result["monthly"])
+        ])
+        self._fill(self.employees_table, [
+            [name, str(n), format_amount(rev), format_amount(avg)] for name, n, rev, avg in result["employees"]
+        ])
+        # Newest day first
+        self._fill(self.daily_table, [
+            [day, format_amount(rev)] + [format_amount(a) for a in avgs] for day, rev, avgs in reversed(result["daily"])
+        ])
+        self._render_forecast()
+
+    def _refresh_forecast(self):
+        forecast.refresh(self.db)
+        self._render_forecast()
+
+    def _render_forecast(self):
+        slots = forecast.forecast(self.db)
+        self.staff_table.clearContents()
+        for s in slots:
+            item = QTableWidgetItem(str(s["recommended"]) if s["recommended"] else "")
+            item.setToolTip(
+                f"متوسط العملاء: {s['customers']:.1f} | الذروة: {s['peak']:.1f} | الحلاقون الحاليون: {s['staffed']:.1f}"
+            )
+            if s["difference"] >= 1:
+                item.setBackground(QColor(120, 120, 120))  # more barbers than needed
+            elif s["difference"] <= -1:
+                item.setBackground(QColor(178, 34, 34))  # short-staffed
+            self.staff_table.setItem(s["weekday"], s["hour"], item)
+        self.staff_table.resizeColumnsToContents()
+        totals = forecast.forecast_report(slots)["totals"]
+        self.staff_summary_label.setText(
+            f"ساعات زائدة أسبوعياً: {totals['idle_barber_hours']} | ساعات نقص: {totals['short_barber_hours']}"
+        )
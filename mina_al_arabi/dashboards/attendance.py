@@ -21,25 +21,6 @@ def format_time_12h_ar(time_str: str) -> str:
     except Exception:
         return time_str
 
-def compute_hours(date_str: str, check_in: str, check_out: str) -> str:
-    """Return total working hours HH:MM considering overnight wrap (checkout after midnight)."""
-    if not check_in or not check_out:
-        return ""
-    try:
-        base_date = datetime.strptime(date_str, "%Y-%m-%d")
-        ci = datetime.strptime(check_in, "%H:%M:%S")
-        co = datetime.strptime(check_out, "%H:%M:%S")
-        ci_dt = base_date.replace(hour=ci.hour, minute=ci.minute, second=ci.second)
-        co_dt = base_date.replace(hour=co.hour, minute=co.minute, second=co.second)
-        if co_dt < ci_dt:
-            co_dt += timedelta(days=1)
-        delta = co_dt - ci_dt
-        hours = delta.seconds // 3600
-        minutes = (delta.seconds % 3600) // 60
-        return f"{hours:02d}:{minutes:02d}"
-    except Exception:
-        return ""
-
 class AttendanceDashboard(QWidget):
     def __init__(self, db: Database):
         super().__init__()
@@ -282,26 +263,22 @@ class AttendanceDashboard(QWidget):
         from PySide6.QtWidgets import QInputDialog
         confirm = QMessageBox.question(self, "تأكيد", "هل تريد حذف السجل المحدد؟")
         if confirm == QMessageBox.Yes:
-            # Soft delete: set times to None and mark manual; optionally we could hard delete
-            with self.db.connect() as conn:
-                c = conn.cursor()
-                c.execute("DELETE FROM attendance WHERE id = ?", (rec_id,))
-                conn.commit()
+            self.db.delete_attendance(rec_id)
             QMessageBox.information(self, "تم", "تم حذف السجل.")
             self.load_report()
 
     def load_report(self):
         year = datetime.now().year
         month = int(self.month_input.value())
-        rows = self.db.list_attendance_for_month(year, month)
         day = int(self.day_input.value())
         self.report_table.setRowCount(0)
+        try:
+            start = datetime(year, month, day)
+        except ValueError:
+            # e.g. day 31 in a 30-day month: nothing to show
+            return
+        rows = self.db.list_attendance(start.strftime("%Y-%m-%d"), (start + timedelta(days=1)).strftime("%Y-%m-%d"))
         for r in rows:
-            try:
-                if int(r["date"].split("-")[2]) != day:
-                    continue
-            except Exception:
-                pass
             i = self.report_table.rowCount()
             self.report_table.insertRow(i)
             # id
@@ -310,10 +287,9 @@ class AttendanceDashboard(QWidget):
             self.report_table.setItem(i, 2, QTableWidgetItem(r["employee"]))
             self.report_table.setItem(i, 3, QTableWidgetItem(format_time_12h_ar(r["check_in"]) if r["check_in"] else ""))
             self.report_table.setItem(i, 4, QTableWidgetItem(format_time_12h_ar(r["check_out"]) if r["check_out"] else ""))
-            hours = compute_hours(r["date"], r["check_in"], r["check_out"])
             status = "يدوي" if r.get("manual") else "طبيعي"
             if r.get("manual"):
                 status += " (أضيف يدوياً بواسطة المدير)"
-            self.report_table.setItem(i, 5, QTableWidgetItem(hours))
+            self.report_table.setItem(i, 5, QTableWidgetItem(r["hours"]))
             self.report_table.setItem(i, 6, QTableWidgetItem(status))
-        self.report_table.resizeColumnsToContents()
\ No newline at end of file
+        self.report_table.resizeColumnsToContents()
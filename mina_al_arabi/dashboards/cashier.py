@@ -5,10 +5,14 @@ from PySide6.QtWidgets import (
 from PySide6.QtCore import Qt
 from PySide6.QtGui import QFont
 from datetime import datetime
+from typing import Optional
 import os
 
 from mina_al_arabi.db import Database
+from mina_al_arabi.session import SessionContext
 from mina_al_arabi.printing import print_receipt
+from mina_al_arabi.receipt import get_template, amount_value
+from mina_al_arabi.dashboards.shift import LiveShiftPanel
 
 
 def format_amount(amount: float) -> str:
@@ -23,14 +27,19 @@ def receipts_dir() -> str:
 
 
 class CashierDashboard(QWidget):
-    def __init__(self, db: Database):
+    def __init__(self, db: Database, session: Optional[SessionContext] = None):
         super().__init__()
         self.db = db
+        self.session = session or SessionContext(db)
 
         self.header_font = QFont("Cairo", 18, QFont.Bold)
         self.body_font = QFont("Cairo", 14)
 
-        root = QHBoxLayout(self)
+        outer = QVBoxLayout(self)
+        self.live_panel = LiveShiftPanel(db)
+        outer.addWidget(self.live_panel)
+        root = QHBoxLayout()
+        outer.addLayout(root)
 
         # Left: Services
         left = QVBoxLayout()
@@ -151,16 +160,16 @@ class CashierDashboard(QWidget):
             btn = QPushButton(f"{name}\n{format_amount(price)} ج.م")
             btn.setMinimumSize(160, 120)
             btn.setStyleSheet("QPushButton { background-color: #D4AF37; color: black; border-radius: 8px; font-size: 16px; } QPushButton:hover { background-color: #B8962D; }")
-            btn.clicked.connect(lambda _, n=name, p=price: self.add_service_to_invoice(n, p))
+            btn.clicked.connect(lambda _, n=name, p=price, i=sid: self.add_service_to_invoice(n, p, i))
             self.services_grid.addWidget(btn, row, col)
             col += 1
             if col >= 3:
                 col = 0
                 row += 1
 
-    def add_service_to_invoice(self, name: str, price: float):
+    def add_service_to_invoice(self, name: str, price: float, service_id: Optional[int] = None):
         inv_item = QListWidgetItem(f"{name} - {format_amount(price)} ج.م")
-        inv_item.setData(Qt.UserRole, (name, price, 1))
+        inv_item.setData(Qt.UserRole, (name, price, 1, service_id))
         # Newest added first (top)
         self.invoice_list.insertItem(0, inv_item)
         self._update_total()
@@ -174,7 +183,7 @@ class CashierDashboard(QWidget):
     def _update_total(self):
         total = 0.0
         for i in range(self.invoice_list.count()):
-            name, price, qty = self.invoice_list.item(i).data(Qt.UserRole)
+            name, price, qty, _ = self.invoice_list.item(i).data(Qt.UserRole)
             total += price * qty
         discount_text = self.discount_combo.currentText()
         discount_percent = 0
@@ -202,18 +211,19 @@ class CashierDashboard(QWidget):
 
         total = 0.0
         items = []
+        service_ids = []
         for i in range(self.invoice_list.count()):
-            name, price, qty = self.invoice_list.item(i).data(Qt.UserRole)
+            name, price, qty, service_id = self.invoice_list.item(i).data(Qt.UserRole)
             total += price * qty
             items.append((name, price, qty))
+            service_ids.append(service_id)
         total_after = total * (1 - discount_percent/100.0)
 
         # Persist sale (service) and link to active shift if present
         try:
-            sh = self.db.get_active_shift()
-            shift_id = sh[0] if sh else None
+            shift_args = self.session.shift_args()
         except Exception:
-            shift_id = None
+            shift_args = {"shift_id": None}
 
         try:
             sale_id = self.db.create_sale(
@@ -226,35 +236,35 @@ class CashierDashboard(QWidget):
                 sale_type="service",
                 buyer_type="customer",
                 material_deduction=material_deduction,
-                shift_id=shift_id,
+                **shift_args,
             )
-            for name, price, qty in items:
-                self.db.add_sale_item(sale_id, name, price, qty)
+            for (name, price, qty), service_id in zip(items, service_ids):
+                self.db.add_sale_item(sale_id, name, price, qty, service_id=service_id)
         except Exception:
             pass
 
         # Build customer-facing receipt (hide material deduction)
         ts = datetime.now()
-        lines = []
-        lines.append("صالون مينا العربي")
-        lines.append(f"التاريخ: {ts.strftime('%Y-%m-%d %I:%M %p')}")
-        lines.append(f"المشتري: {customer_name}")
-        lines.append(f"الموظف: {employee_name}")
-        lines.append("-" * 30)
-        for name, price, qty in items:
-            lines.append(f"{name} x{qty} - {format_amount(price)} ج.م")
-        lines.append("-" * 30)
-        lines.append(f"الإجمالي قبل الخصم: {format_amount(total)} ج.م")
-        lines.append(f"الخصم: {discount_percent}%")
-        lines.append(f"الإجمالي بعد الخصم: {format_amount(total_after)} ج.م")
-        text = "\n".join(lines)
+        template = get_template()
+        fields = [
+            ("التاريخ", ts.strftime('%Y-%m-%d %I:%M %p')),
+            ("المشتري", customer_name),
+            ("الموظف", employee_name),
+        ]
+        totals = [
+            ("الإجمالي قبل الخصم", amount_value(total)),
+            ("الخصم", f"{discount_percent}%"),
+            ("الإجمالي بعد الخصم", amount_value(total_after)),
+        ]
+        text = template.render_text(fields, items, totals)
+        data = template.render(fields, items, totals)
 
         path = os.path.join(receipts_dir(), f"receipt_service_{ts.strftime('%Y%m%d_%H%M%S')}.txt")
         with open(path, "w", encoding="utf-8") as f:
             f.write(text)
 
         try:
-            print_receipt(text)
+            print_receipt(data)
             QMessageBox.information(self, "تم", f"تم حفظ وطباعة الإيصال.\n{path}")
         except Exception as e:
             QMessageBox.warning(self, "تنبيه", f"تم حفظ الإيصال لكن فشلت الطباعة:\n{e}\n{path}")
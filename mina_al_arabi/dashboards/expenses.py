@@ -5,7 +5,9 @@ from PySide6.QtWidgets import (
 from PySide6.QtGui import QFont
 from PySide6.QtCore import Qt
 from datetime import datetime
+from typing import Optional
 from mina_al_arabi.db import Database
+from mina_al_arabi.session import SessionContext
 
 
 CATEGORIES = ["إيجار", "كهرباء", "مياه", "إنترنت", "مشتريات للمحل", "مصاريف مينا", "يوميات العمالة"]
@@ -24,9 +26,10 @@ def format_time_ar(dt: datetime) -> str:
 
 
 class ExpensesDashboard(QWidget):
-    def __init__(self, db: Database):
+    def __init__(self, db: Database, session: Optional[SessionContext] = None):
         super().__init__()
         self.db = db
+        self.session = session or SessionContext(db)
 
         self.header_font = QFont("Cairo", 18, QFont.Bold)
         self.body_font = QFont("Cairo", 14)
@@ -122,15 +125,15 @@ class ExpensesDashboard(QWidget):
             return
         # Link to active shift and normalize date to shift start day
         try:
-            sh = self.db.get_active_shift()
-            shift_id = sh[0] if sh else None
+            sh = self.session.active_shift()
+            shift_args = self.session.shift_args()
             if sh:
                 self.shift_hint.setText(f"مصروف مرتبط بالشفت رقم {sh[1]} - تاريخ الشفت: {sh[3][:10]}")
             else:
                 self.shift_hint.setText("لا يوجد شفت نشط")
         except Exception:
-            shift_id = None
-        self.db.add_expense(cat, amount, note, shift_id=shift_id)
+            shift_args = {"shift_id": None}
+        self.db.add_expense(cat, amount, note, **shift_args)
         self.amount_input.setValue(0)
         self.note_input.clear()
         self.load_expenses()
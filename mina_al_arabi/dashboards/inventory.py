@@ -2,9 +2,11 @@ from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QSpinBox, QPushButton, QTableWidget,
     QTableWidgetItem, QInputDialog, QMessageBox, QAbstractItemView
 )
-from PySide6.QtGui import QFont
+from PySide6.QtGui import QFont, QColor
 from PySide6.QtCore import Qt, Signal
-from mina_al_arabi.db import Database
+from datetime import datetime, timedelta
+from mina_al_arabi.db import Database, STOCK_REASONS
+from mina_al_arabi import reorder
 
 
 class InventoryDashboard(QWidget):
@@ -19,6 +21,19 @@ class InventoryDashboard(QWidget):
 
         layout = QVBoxLayout(self)
 
+        # Low-stock alerts, read from the low_stock set (kept by database triggers)
+        alert_row = QHBoxLayout()
+        self.alert_label = QLabel("")
+        self.alert_label.setFont(self.body_font)
+        self.alert_label.setStyleSheet("color: #B22222;")
+        alert_row.addWidget(self.alert_label)
+        alert_row.addStretch()
+        reorder_btn = QPushButton("اقتراحات إعادة الطلب")
+        reorder_btn.setFont(self.body_font)
+        reorder_btn.clicked.connect(self.show_reorder_suggestions)
+        alert_row.addWidget(reorder_btn)
+        layout.addLayout(alert_row)
+
         form = QHBoxLayout()
         lbl_name = QLabel("اسم المنتج")
         lbl_name.setFont(self.body_font)
@@ -46,6 +61,14 @@ class InventoryDashboard(QWidget):
         self.price_input.setMinimumWidth(120)
         form.addWidget(self.price_input)
 
+        lbl_barcode = QLabel("الباركود")
+        lbl_barcode.setFont(self.body_font)
+        form.addWidget(lbl_barcode)
+        self.barcode_input = QLineEdit()
+        self.barcode_input.setFont(self.body_font)
+        self.barcode_input.setPlaceholderText("اختياري")
+        form.addWidget(self.barcode_input)
+
         add_btn = QPushButton("إضافة للمخزن")
         add_btn.setFont(self.body_font)
         add_btn.clicked.connect(self.add_product)
@@ -53,9 +76,9 @@ class InventoryDashboard(QWidget):
 
         layout.addLayout(form)
 
-        self.table = QTableWidget(0, 4)
+        self.table = QTableWidget(0, 6)
         self.table.setFont(self.body_font)
-        self.table.setHorizontalHeaderLabels(["المعرف", "الاسم", "السعر", "الكمية"])
+        self.table.setHorizontalHeaderLabels(["المعرف", "الاسم", "السعر", "الكمية", "الباركود", "حد الطلب"])
         self.table.setStyleSheet("QTableWidget { gridline-color: #D4AF37; }")
         # Select whole rows for clearer editing of a single product
         try:
@@ -87,18 +110,65 @@ class InventoryDashboard(QWidget):
         edit_price_btn.clicked.connect(self.edit_selected_product_price)
         action_row.addWidget(edit_price_btn)
 
+        edit_barcode_btn = QPushButton("تعديل الباركود")
+        edit_barcode_btn.setFont(self.body_font)
+        edit_barcode_btn.clicked.connect(self.edit_selected_product_barcode)
+        action_row.addWidget(edit_barcode_btn)
+
+        reorder_level_btn = QPushButton("حد إعادة الطلب")
+        reorder_level_btn.setFont(self.body_font)
+        reorder_level_btn.clicked.connect(self.edit_selected_product_reorder_level)
+        action_row.addWidget(reorder_level_btn)
+
+        receive_btn = QPushButton("استلام من مورد")
+        receive_btn.setFont(self.body_font)
+        receive_btn.clicked.connect(self.receive_selected_product)
+        action_row.addWidget(receive_btn)
+
+        movements_btn = QPushButton("حركة المنتج")
+        movements_btn.setFont(self.body_font)
+        movements_btn.clicked.connect(self.show_selected_product_movements)
+        action_row.addWidget(movements_btn)
+
+        value_btn = QPushButton("قيمة المخزون في تاريخ")
+        value_btn.setFont(self.body_font)
+        value_btn.clicked.connect(self.show_inventory_value_at)
+        action_row.addWidget(value_btn)
+
         layout.addLayout(action_row)
 
+        # Sales from the other tabs move products in and out of the low-stock set
+        db.subscribe(self._on_db_event)
+        self.destroyed.connect(lambda *_: db.unsubscribe(self._on_db_event))
+
         self.load_products()
 
+    def _on_db_event(self, event, payload):
+        if event in ("stock_changed", "reorder_level_changed"):
+            self.load_alerts()
+
+    def load_alerts(self, low=None):
+        if low is None:
+            low = self.db.list_low_stock()
+        if not low:
+            self.alert_label.setText("")
+            return
+        names = "، ".join(f"{p['name']} ({p['quantity']})" for p in low[:5])
+        more = f" و{len(low) - 5} غيرها" if len(low) > 5 else ""
+        self.alert_label.setText(f"تنبيه: {len(low)} منتج عند حد الطلب أو أقل: {names}{more}")
+
     def add_product(self):
         name = self.name_input.text().strip()
         qty = int(self.qty_input.value())
         price = float(self.price_input.value())
+        barcode = self.barcode_input.text().strip() or None
         if not name:
             return
-        self.db.add_product(name, price, qty)
+        if not self.db.add_product(name, price, qty, barcode=barcode):
+            QMessageBox.warning(self, "تنبيه", "المنتج أو الباركود موجود بالفعل.")
+            return
         self.name_input.clear()
+        self.barcode_input.clear()
         self.qty_input.setValue(0)
         self.price_input.setValue(0)
         self.load_products()
@@ -170,6 +240,8 @@ class InventoryDashboard(QWidget):
 
     def load_products(self):
         products = self.db.list_products()
+        low = self.db.list_low_stock()
+        low_ids = {p["product_id"] for p in low}
         self.table.setRowCount(0)
         for row in products:
             # row may be (id, name, price, qty, purchase_price)
@@ -183,8 +255,15 @@ class InventoryDashboard(QWidget):
             self.table.setItem(r, 1, QTableWidgetItem(name))
             self.table.setItem(r, 2, QTableWidgetItem(str(int(round(price)))))
             self.table.setItem(r, 3, QTableWidgetItem(str(qty)))
+            self.table.setItem(r, 4, QTableWidgetItem((row[5] or "") if len(row) > 5 else ""))
+            level = row[6] if len(row) > 6 else None
+            self.table.setItem(r, 5, QTableWidgetItem("" if level is None else str(level)))
+            if pid in low_ids:
+                for col in range(self.table.columnCount()):
+                    self.table.item(r, col).setBackground(QColor(178, 34, 34, 90))
         self.table.resizeColumnsToContents()
         self.table.resizeRowsToContents()
+        self.load_alerts(low)
 
     def edit_selected_product_price(self):
         row = self.table.currentRow()
@@ -223,4 +302,147 @@ class InventoryDashboard(QWidget):
             QMessageBox.information(self, "تم", "تم تعديل السعر بنجاح.")
         except Exception as e:
             QMessageBox.critical(self, "خطأ", f"تعذر تعديل السعر:\n{e}")
-            self.load_products()
\ No newline at end of file
+            self.load_products()
+
+    def edit_selected_product_barcode(self):
+        row = self.table.currentRow()
+        if row < 0:
+            QMessageBox.warning(self, "تنبيه", "اختر منتجاً أولاً من الجدول.")
+            return
+        pid_item = self.table.item(row, 0)
+        name_item = self.table.item(row, 1)
+        barcode_item = self.table.item(row, 4)
+        if not pid_item:
+            QMessageBox.warning(self, "تنبيه", "تعذر قراءة المنتج المحدد.")
+            return
+        pid = int(pid_item.text())
+        current = barcode_item.text() if barcode_item else ""
+        barcode, ok = QInputDialog.getText(self, "تعديل الباركود", f"امسح أو أدخل الباركود للمنتج ({name_item.text()}):", text=current)
+        if not ok:
+            return
+        try:
+            self.db.set_product_barcode(pid, barcode.strip() or None)
+            self.load_products()
+            try:
+                self.products_changed.emit()
+            except Exception:
+                pass
+            QMessageBox.information(self, "تم", "تم تعديل الباركود بنجاح.")
+        except Exception as e:
+            QMessageBox.critical(self, "خطأ", f"تعذر تعديل الباركود (ربما مستخدم لمنتج آخر):\n{e}")
+
+    def receive_selected_product(self):
+        row = self.table.currentRow()
+        if row < 0:
+            QMessageBox.warning(self, "تنبيه", "اختر منتجاً أولاً من الجدول.")
+            return
+        pid_item = self.table.item(row, 0)
+        name_item = self.table.item(row, 1)
+        if not pid_item:
+            QMessageBox.warning(self, "تنبيه", "تعذر قراءة المنتج المحدد.")
+            return
+        pid = int(pid_item.text())
+        suppliers = self.db.list_suppliers()
+        if not suppliers:
+            QMessageBox.warning(self, "تنبيه", "أضف مورداً أولاً من تبويب الموردين.")
+            return
+        supplier_name, ok = QInputDialog.getItem(self, "استلام من مورد", "المورد:", [s[1] for s in suppliers], 0, False)
+        if not ok:
+            return
+        sid = next(s[0] for s in suppliers if s[1] == supplier_name)
+        qty, ok = QInputDialog.getInt(self, "استلام من مورد", f"الكمية المستلمة من ({name_item.text()}):", 1, 1, 100000)
+        if not ok:
+            return
+        product = self.db.get_product_by_name(name_item.text())
+        current_cost = (product[4] if product[4] is not None else product[2]) if product else 0.0
+        cost, ok = QInputDialog.getDouble(self, "استلام من مورد", "سعر التكلفة للقطعة (ج.م):", current_cost, 0, 1000000, 2)
+        if not ok:
+            return
+        try:
+            self.db.receive_delivery(sid, [(pid, qty, cost)])
+            self.load_products()
+            try:
+                self.products_changed.emit()
+            except Exception:
+                pass
+            QMessageBox.information(self, "تم", "تم استلام البضاعة وتسجيل فاتورة المورد.")
+        except Exception as e:
+            QMessageBox.critical(self, "خطأ", f"تعذر تسجيل الاستلام:\n{e}")
+
+    def show_selected_product_movements(self):
+        row = self.table.currentRow()
+        if row < 0:
+            QMessageBox.warning(self, "تنبيه", "اختر منتجاً أولاً من الجدول.")
+            return
+        pid_item = self.table.item(row, 0)
+        name_item = self.table.item(row, 1)
+        if not pid_item:
+            QMessageBox.warning(self, "تنبيه", "تعذر قراءة المنتج المحدد.")
+            return
+        # Last 30 days, newest first
+        since = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
+        opening, moves = self.db.product_movements(int(pid_item.text()), since)
+        lines = [f"الرصيد في {since}: {opening}"]
+        for m in reversed(moves):
+            lines.append(f"{m['date']} | {STOCK_REASONS.get(m['reason'], m['reason'])} | {m['delta']:+d} | الرصيد: {m['balance']}")
+        if not moves:
+            lines.append("لا توجد حركات خلال آخر 30 يوماً.")
+        QMessageBox.information(self, f"حركة المنتج: {name_item.text()}", "\n".join(lines))
+
+    def show_inventory_value_at(self):
+        day, ok = QInputDialog.getText(self, "قيمة المخزون في تاريخ", "التاريخ (YYYY-MM-DD):",
+                                       text=datetime.now().strftime("%Y-%m-%d"))
+        if not ok:
+            return
+        try:
+            datetime.strptime(day.strip(), "%Y-%m-%d")
+        except ValueError:
+            QMessageBox.warning(self, "تنبيه", "صيغة التاريخ غير صحيحة.")
+            return
+        stock = self.db.stock_at(day.strip())
+        value = sum(r["value"] for r in stock)
+        quantity = sum(r["quantity"] for r in stock)
+        QMessageBox.information(self, "قيمة المخزون",
+                                f"في نهاية {day.strip()}:\nعدد القطع: {quantity}\nالقيمة: {int(round(value))} ج.م")
+
+    def edit_selected_product_reorder_level(self):
+        row = self.table.currentRow()
+        if row < 0:
+            QMessageBox.warning(self, "تنبيه", "اختر منتجاً أولاً من الجدول.")
+            return
+        pid_item = self.table.item(row, 0)
+        name_item = self.table.item(row, 1)
+        level_item = self.table.item(row, 5)
+        if not pid_item:
+            QMessageBox.warning(self, "تنبيه", "تعذر قراءة المنتج المحدد.")
+            return
+        current = level_item.text() if level_item else ""
+        level_str, ok = QInputDialog.getText(self, "حد إعادة الطلب",
+                                             f"نبّهني عندما تصل كمية ({name_item.text()}) إلى (اتركه فارغاً للإلغاء):",
+                                             text=current)
+        if not ok:
+            return
+        level_str = level_str.strip()
+        try:
+            level = int(level_str) if level_str else None
+            if level is not None and level < 0:
+                raise ValueError
+        except ValueError:
+            QMessageBox.warning(self, "تنبيه", "يرجى إدخال رقم صحيح.")
+            return
+        self.db.set_reorder_level(int(pid_item.text()), level)
+        self.load_products()
+
+    def show_reorder_suggestions(self):
+        rows = reorder.reorder_suggestions(self.db)
+        if not rows:
+            QMessageBox.information(self, "اقتراحات إعادة الطلب", "لا توجد منتجات عند حد الطلب.")
+            return
+        lines = []
+        for supplier, items in reorder.group_by_supplier(rows).items():
+            lines.append(f"{supplier}:")
+            for r in items:
+                left = "" if r["days_left"] is None else f" - يكفي {r['days_left']:.0f} يوم"
+                lines.append(f"  {r['product']}: المتوفر {r['quantity']}{left} - اطلب {r['suggested']}")
+            lines.append(f"  التكلفة التقديرية: {int(round(sum(r['cost'] for r in items)))} ج.م")
+        QMessageBox.information(self, "اقتراحات إعادة الطلب", "\n".join(lines))
@@ -5,6 +5,8 @@ from PySide6.QtGui import QFont
 from PySide6.QtCore import Qt
 from datetime import datetime
 from mina_al_arabi.db import Database
+from mina_al_arabi.archive import historical
+from mina_al_arabi.payroll import PayrollCache, default_payroll_path, write_payroll_csv
 
 
 def format_amount(amount: float) -> str:
@@ -27,6 +29,8 @@ class ReportsDashboard(QWidget):
     def __init__(self, db: Database):
         super().__init__()
         self.db = db
+        self.payroll = PayrollCache(db)
+        self.destroyed.connect(lambda *_: self.payroll.close())
 
         self.header_font = QFont("Cairo", 18, QFont.Bold)
         self.body_font = QFont("Cairo", 14)
@@ -74,6 +78,18 @@ class ReportsDashboard(QWidget):
 
         layout.addLayout(controls)
 
+        payroll_row = QHBoxLayout()
+        payroll_btn = QPushButton("كشف رواتب الشهر")
+        payroll_btn.setFont(self.body_font)
+        payroll_btn.clicked.connect(self.show_payroll)
+        payroll_row.addWidget(payroll_btn)
+        export_payroll_btn = QPushButton("تصدير كشف الرواتب")
+        export_payroll_btn.setFont(self.body_font)
+        export_payroll_btn.clicked.connect(self._export_payroll)
+        payroll_row.addWidget(export_payroll_btn)
+        payroll_row.addStretch(1)
+        layout.addLayout(payroll_row)
+
         self.table = QTableWidget(0, 3)
         self.table.setFont(self.body_font)
         self.table.setHorizontalHeaderLabels(["الوصف", "الوقت", "القيمة (ج.م)"])
@@ -99,15 +115,18 @@ class ReportsDashboard(QWidget):
         day = int(self.day_input.value())
         date_str = f"{year}-{month:02d}-{day:02d}"
 
-        # Choose scope
+        # Choose scope (archived months are read through the archive views)
+        hdb = historical(self.db)
         if self.monthly_radio.isChecked():
-            sales = self.db.list_sales_by_employee_in_month(employee_id, year, month)
-            loans = self.db.list_loans_by_employee_in_month(employee_id, year, month)
+            sales = hdb.list_sales_by_employee_in_month(employee_id, year, month)
+            loans = hdb.list_loans_by_employee_in_month(employee_id, year, month)
         else:
-            sales = self.db.list_sales_by_employee_on_date(employee_id, date_str)
-            loans = self.db.list_loans_by_employee_on_date(employee_id, date_str)
+            sales = hdb.list_sales_by_employee_on_date(employee_id, date_str)
+            loans = hdb.list_loans_by_employee_on_date(employee_id, date_str)
 
         self.table.setRowCount(0)
+        self.table.setColumnCount(3)
+        self.table.setHorizontalHeaderLabels(["الوصف", "الوقت", "القيمة (ج.م)"])
 
         total_services = 0.0
         total_products = 0.0
@@ -157,6 +176,38 @@ class ReportsDashboard(QWidget):
             f"الرصيد: {format_amount(balance)} ج.م"
         )
 
+    def show_payroll(self):
+        """All employees for the selected month: attendance hours, services, sales, loans and net."""
+        year = datetime.now().year
+        month = int(self.month_input.value())
+        report = self.payroll.report(year, month)
+        self.table.setRowCount(0)
+        self.table.setColumnCount(len(report["columns"]))
+        self.table.setHorizontalHeaderLabels(report["columns"])
+        for row in report["rows"]:
+            i = self.table.rowCount()
+            self.table.insertRow(i)
+            for col, value in enumerate(row):
+                text = format_amount(value) if col >= 3 else str(value)
+                self.table.setItem(i, col, QTableWidgetItem(text))
+        self.table.resizeColumnsToContents()
+        t = report["totals"]
+        self.summary_label.setText(
+            f"إجمالي الخدمات: {format_amount(t['services'])} ج.م | "
+            f"إجمالي المبيعات: {format_amount(t['products'])} ج.م | "
+            f"السلف: {format_amount(t['loans'])} ج.م | "
+            f"الصافي: {format_amount(t['net'])} ج.م"
+        )
+
+    def _export_payroll(self):
+        year = datetime.now().year
+        month = int(self.month_input.value())
+        try:
+            path = write_payroll_csv(self.payroll.report(year, month), default_payroll_path(year, month))
+            QMessageBox.information(self, "تم", f"تم حفظ كشف الرواتب:\n{path}")
+        except Exception as e:
+            QMessageBox.critical(self, "خطأ", f"تعذر حفظ كشف الرواتب:\n{e}")
+
     def _clear_employee_account(self):
         if self.employee_combo.count() == 0:
             return
@@ -1,14 +1,17 @@
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton, QListWidget,
-    QListWidgetItem, QMessageBox, QAbstractItemView, QScrollArea, QGridLayout, QComboBox, QSpinBox
+    QListWidgetItem, QMessageBox, QAbstractItemView, QScrollArea, QGridLayout, QComboBox, QSpinBox, QCheckBox
 )
 from PySide6.QtCore import Qt
 from PySide6.QtGui import QFont
 from datetime import datetime
+from typing import Optional
 import os
 
 from mina_al_arabi.db import Database
+from mina_al_arabi.session import SessionContext
 from mina_al_arabi.printing import print_receipt
+from mina_al_arabi.receipt import get_template, amount_value
 
 
 def format_amount(amount: float) -> str:
@@ -23,9 +26,12 @@ def receipts_dir() -> str:
 
 
 class SalesDashboard(QWidget):
-    def __init__(self, db: Database):
+    def __init__(self, db: Database, session: Optional[SessionContext] = None):
         super().__init__()
         self.db = db
+        self.session = session or SessionContext(db)
+        # barcode -> (id, name, price, qty); rebuilt with the product grid
+        self._barcode_map = {}
 
         self.header_font = QFont("Cairo", 18, QFont.Bold)
         self.body_font = QFont("Cairo", 14)
@@ -85,6 +91,18 @@ class SalesDashboard(QWidget):
         buyer_layout.addWidget(self.employee_combo)
         right.addLayout(buyer_layout)
 
+        # Scanner mode: a USB barcode scanner types the code followed by Enter
+        scan_row = QHBoxLayout()
+        self.scanner_mode = QCheckBox("وضع الماسح (باركود)")
+        self.scanner_mode.toggled.connect(self._on_scanner_mode_toggled)
+        scan_row.addWidget(self.scanner_mode)
+        self.barcode_input = QLineEdit()
+        self.barcode_input.setPlaceholderText("امسح الباركود...")
+        self.barcode_input.setEnabled(False)
+        self.barcode_input.returnPressed.connect(self._on_barcode_scanned)
+        scan_row.addWidget(self.barcode_input)
+        right.addLayout(scan_row)
+
         self.invoice_list = QListWidget()
         self.invoice_list.setFont(self.body_font)
         self.invoice_list.setSelectionMode(QAbstractItemView.MultiSelection)
@@ -163,6 +181,18 @@ class SalesDashboard(QWidget):
             products = self.db.list_products()
         except Exception:
             products = []
+        # Indexed prefix search instead of scanning every name on each keystroke
+        matched_ids = None
+        if query:
+            try:
+                matched_ids = {r["id"] for r in self.db.search(query, kinds=("product",), limit=len(products) or 1)}
+            except Exception:
+                matched_ids = None
+        self._barcode_map = {r[5]: (r[0], r[1], r[2], r[3]) for r in products if len(r) > 5 and r[5]}
+        try:
+            low_ids = {p["product_id"] for p in self.db.list_low_stock()}
+        except Exception:
+            low_ids = set()
         products = list(reversed(products))
         row, col = 0, 0
         for row_data in products:
@@ -171,13 +201,19 @@ class SalesDashboard(QWidget):
             name = row_data[1]
             price = row_data[2]
             qty = row_data[3]
-            if query and (query not in name.lower()):
+            if matched_ids is not None:
+                if pid not in matched_ids:
+                    continue
+            elif query and (query not in name.lower()):
                 continue
             label_text = f"{name}\n{format_amount(price)} ج.م\nالمتوفر: {qty}"
+            if pid in low_ids:
+                label_text += " (قارب على النفاد)"
             btn = QPushButton(label_text)
             # Smaller icons than services to fit more items
             btn.setMinimumSize(220, 160)
-            btn.setStyleSheet("QPushButton { background-color: #D4AF37; color: black; border-radius: 8px; font-size: 16px; } QPushButton:hover { background-color: #B8962D; }")
+            color, hover = ("#E9967A", "#CD7F67") if pid in low_ids else ("#D4AF37", "#B8962D")
+            btn.setStyleSheet(f"QPushButton {{ background-color: {color}; color: black; border-radius: 8px; font-size: 16px; }} QPushButton:hover {{ background-color: {hover}; }}")
             btn.clicked.connect(lambda _, p=pid, n=name, pr=price, q=qty: self.add_product_to_invoice(p, n, pr, q))
             self.products_grid.addWidget(btn, row, col)
             col += 1
@@ -185,6 +221,23 @@ class SalesDashboard(QWidget):
                 col = 0
                 row += 1
 
+    def _on_scanner_mode_toggled(self, enabled: bool):
+        self.barcode_input.setEnabled(enabled)
+        if enabled:
+            self.barcode_input.setFocus()
+
+    def _on_barcode_scanned(self):
+        code = self.barcode_input.text().strip()
+        self.barcode_input.clear()
+        if not code:
+            return
+        product = self._barcode_map.get(code)
+        if product is None:
+            QMessageBox.warning(self, "تنبيه", f"لا يوجد منتج بالباركود: {code}")
+        else:
+            self.add_product_to_invoice(*product)
+        self.barcode_input.setFocus()
+
     def add_product_to_invoice(self, pid: int, name: str, price: float, qty_available: int):
         if qty_available <= 0:
             QMessageBox.warning(self, "تنبيه", f"المنتج {name} غير متوفر")
@@ -195,6 +248,19 @@ class SalesDashboard(QWidget):
         self.invoice_list.insertItem(0, inv_item)
         self._update_total()
 
+    def _show_stock_failures(self, result):
+        """Nothing was recorded: list the lines the stock could not cover and refresh the grid."""
+        lines = []
+        for line in result["lines"]:
+            if line["ok"]:
+                continue
+            if line["available"] is None:
+                lines.append(f"{line['name']}: لم يعد موجوداً في المخزن")
+            else:
+                lines.append(f"{line['name']}: المطلوب {line['quantity']}، المتوفر {line['available']}")
+        QMessageBox.warning(self, "تنبيه", "لم يتم تسجيل الفاتورة، الكمية غير كافية:\n" + "\n".join(lines))
+        self.load_products()
+
     def remove_selected_invoice_item(self):
         for item in self.invoice_list.selectedItems():
             row = self.invoice_list.row(item)
@@ -226,10 +292,18 @@ class SalesDashboard(QWidget):
 
         total = 0.0
         items = []
+        merged = {}
         for i in range(self.invoice_list.count()):
             pid, name, price, qty = self.invoice_list.item(i).data(Qt.UserRole)
             total += price * qty
-            items.append((pid, name, price, qty))
+            # Each click adds one piece; the same product at the same price becomes one line
+            key = (pid, name, price)
+            if key in merged:
+                merged[key][3] += qty
+            else:
+                merged[key] = [pid, name, price, qty]
+                items.append(merged[key])
+        items = [tuple(line) for line in items]
 
         discount_text = self.discount_combo.currentText()
         discount_percent = 0
@@ -243,58 +317,50 @@ class SalesDashboard(QWidget):
 
         # Link to active shift if present
         try:
-            sh = self.db.get_active_shift()
-            shift_id = sh[0] if sh else None
+            shift_args = self.session.shift_args()
         except Exception:
-            shift_id = None
+            shift_args = {"shift_id": None}
 
         # Branch behavior by mode
         if mode == "عميل":
             # Normal customer sale -> employee should have no effect
             try:
-                sale_id = self.db.create_sale(
-                    date=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                result = self.db.checkout(
+                    items,
+                    buyer_type="customer",
                     employee_id=None,  # ignore employee
                     customer_name=customer_name,
-                    is_shop=0,
-                    total=total,
                     discount_percent=discount_percent,
-                    sale_type="product",
-                    buyer_type="customer",
                     material_deduction=material_deduction,
-                    shift_id=shift_id,
+                    **shift_args,
                 )
-                for pid, name, price, qty in items:
-                    self.db.add_sale_item(sale_id, name, price, qty)
-                    if pid:
-                        try:
-                            self.db.update_product_qty(pid, -qty)
-                        except Exception:
-                            pass
-            except Exception:
-                pass
+            except Exception as e:
+                QMessageBox.critical(self, "خطأ", f"تعذر تسجيل الفاتورة:\n{e}")
+                return
+            if not result["ok"]:
+                self._show_stock_failures(result)
+                return
 
             ts = datetime.now()
             basename = f"receipt_product_{ts.strftime('%Y%m%d_%H%M%S')}"
             txt_path = os.path.join(receipts_dir(), f"{basename}.txt")
 
-            lines = [
-                "صالون مينا العربي",
-                f"التاريخ: {ts.strftime('%Y-%m-%d %I:%M %p')}",
-                f"المشتري: {customer_name}",
-                "-" * 30
+            template = get_template()
+            fields = [
+                ("التاريخ", ts.strftime('%Y-%m-%d %I:%M %p')),
+                ("المشتري", customer_name),
             ]
-            for _, name, price, qty in items:
-                lines.append(f"{name} x{qty} - {format_amount(price)} ج.م")
+            receipt_items = [(name, price, qty) for _, name, price, qty in items]
             total_after = total * (1 - discount_percent/100.0)
-            lines += ["-" * 30, f"الإجمالي: {format_amount(total_after)} ج.م"]
-            receipt_text = "\n".join(lines)
+            totals = [("الإجمالي", amount_value(total_after))]
+            receipt_text = template.render_text(fields, receipt_items, totals)
+            receipt_data = template.render(fields, receipt_items, totals)
 
             with open(txt_path, "w", encoding="utf-8") as ftxt:
                 ftxt.write(receipt_text)
 
             try:
-                print_receipt(receipt_text)
+                print_receipt(receipt_data)
                 QMessageBox.information(self, "تم", f"تم حفظ وطباعة الإيصال.\n{txt_path}")
             except Exception as e:
                 QMessageBox.information(self, "تنبيه", f"تم حفظ الإيصال لكن فشلت الطباعة:\n{e}\n{txt_path}")
@@ -303,15 +369,11 @@ class SalesDashboard(QWidget):
             # Internal shop usage: record expense under "مشتريات للمحل" and deduct from inventory
             saved_any = False
             try:
-                for pid, name, price, qty in items:
-                    # Expense categorized for shop purchases with item name in note
-                    self.db.add_expense(category="مشتريات للمحل", amount=price * qty, note=name, shift_id=shift_id)
-                    # Deduct from inventory
-                    if pid:
-                        try:
-                            self.db.update_product_qty(pid, -qty)
-                        except Exception:
-                            pass
+                # One expense per item (item name in the note), recorded with the stock deduction
+                result = self.db.checkout(items, buyer_type="shop", **shift_args)
+                if not result["ok"]:
+                    self._show_stock_failures(result)
+                    return
                 saved_any = True
             except Exception:
                 pass
@@ -326,42 +388,33 @@ class SalesDashboard(QWidget):
                 QMessageBox.warning(self, "تنبيه", "اختر الموظف أولاً.")
                 return
             try:
-                sale_id = self.db.create_sale(
-                    date=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                result = self.db.checkout(
+                    items,
+                    buyer_type="employee",  # used by reports to exclude from balance/commission
                     employee_id=employee_id,
                     customer_name=None,
-                    is_shop=0,
-                    total=total,
                     discount_percent=discount_percent,
-                    sale_type="product",
-                    buyer_type="employee",  # used by reports to exclude from balance/commission
                     material_deduction=material_deduction,
-                    shift_id=shift_id,
+                    **shift_args,
                 )
-                for pid, name, price, qty in items:
-                    self.db.add_sale_item(sale_id, name, price, qty)
-                    if pid:
-                        try:
-                            self.db.update_product_qty(pid, -qty)
-                        except Exception:
-                            pass
-            except Exception:
-                pass
+            except Exception as e:
+                QMessageBox.critical(self, "خطأ", f"تعذر تسجيل الفاتورة:\n{e}")
+                return
+            if not result["ok"]:
+                self._show_stock_failures(result)
+                return
             # Optionally save a text receipt (no business impact)
             ts = datetime.now()
             basename = f"receipt_employee_{ts.strftime('%Y%m%d_%H%M%S')}"
             txt_path = os.path.join(receipts_dir(), f"{basename}.txt")
-            lines = [
-                "صالون مينا العربي",
-                f"التاريخ: {ts.strftime('%Y-%m-%d %I:%M %p')}",
-                f"الموظف: {self.employee_combo.currentText()}",
-                "-" * 30
+            template = get_template()
+            fields = [
+                ("التاريخ", ts.strftime('%Y-%m-%d %I:%M %p')),
+                ("الموظف", self.employee_combo.currentText()),
             ]
-            for _, name, price, qty in items:
-                lines.append(f"{name} x{qty} - {format_amount(price)} ج.م")
+            receipt_items = [(name, price, qty) for _, name, price, qty in items]
             total_after = total * (1 - discount_percent/100.0)
-            lines += ["-" * 30, f"الإجمالي: {format_amount(total_after)} ج.م"]
-            receipt_text = "\n".join(lines)
+            receipt_text = template.render_text(fields, receipt_items, [("الإجمالي", amount_value(total_after))])
             try:
                 with open(txt_path, "w", encoding="utf-8") as ftxt:
                     ftxt.write(receipt_text)
@@ -1,13 +1,115 @@
 from PySide6.QtWidgets import QWidget, QVBoxLayout, QLabel, QHBoxLayout, QLineEdit, QPushButton, QMessageBox
 from PySide6.QtGui import QFont
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QTimer
+from datetime import datetime
+from typing import Optional
+import os
 from mina_al_arabi.db import Database
+from mina_al_arabi.session import SessionContext
+
+
+def receipts_dir() -> str:
+    base = os.path.join(os.path.dirname(__file__), "..", "data", "receipts")
+    base = os.path.abspath(base)
+    os.makedirs(base, exist_ok=True)
+    return base
+
+
+RECONCILE_INTERVAL_MS = 60_000  # re-read the shift row to catch writes from other processes
+
+
+class LiveShiftPanel(QWidget):
+    """Running totals of the active shift.
+
+    Updated from the database's write events (no queries per sale); the shift
+    row is re-read on start, on deletes and periodically as a reconciliation.
+    """
+
+    def __init__(self, db: Database, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.shift_id = None
+        self.shift_number = None
+        self.totals = {}
+
+        body_font = QFont("Cairo", 13)
+        row = QHBoxLayout(self)
+        self.shift_label = QLabel("")
+        self.sales_label = QLabel("")
+        self.invoices_label = QLabel("")
+        self.discounts_label = QLabel("")
+        self.expenses_label = QLabel("")
+        for lbl in (self.shift_label, self.sales_label, self.invoices_label, self.discounts_label, self.expenses_label):
+            lbl.setFont(body_font)
+            row.addWidget(lbl)
+
+        self.db.subscribe(self._on_db_event)
+        self.destroyed.connect(lambda *_: db.unsubscribe(self._on_db_event))
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.reconcile)
+        self.timer.start(RECONCILE_INTERVAL_MS)
+        self.reconcile()
+
+    def reconcile(self):
+        try:
+            sh = self.db.get_active_shift()
+            if sh:
+                self.shift_id, self.shift_number = sh[0], sh[1]
+                self.totals = self.db.shift_totals(self.shift_id)
+            else:
+                self.shift_id, self.shift_number, self.totals = None, None, {}
+        except Exception:
+            pass
+        self._render()
+
+    def _on_db_event(self, event: str, payload: dict):
+        if event == "sale_created":
+            if self.shift_id is None or payload.get("shift_id") != self.shift_id:
+                return
+            total = float(payload.get("total") or 0)
+            discount = total * (float(payload.get("discount_percent") or 0) / 100.0)
+            t = self.totals
+            t["total_sales"] = t.get("total_sales", 0.0) + total - discount
+            t["customer_discounts"] = t.get("customer_discounts", 0.0) + discount
+            t["material_deductions"] = t.get("material_deductions", 0.0) + float(payload.get("material_deduction") or 0)
+            t["invoice_count"] = t.get("invoice_count", 0) + 1
+        elif event == "expense_added":
+            if self.shift_id is None or payload.get("shift_id") != self.shift_id:
+                return
+            self.totals["total_expenses"] = self.totals.get("total_expenses", 0.0) + float(payload.get("amount") or 0)
+        elif event == "shift_opened":
+            self.shift_id, self.shift_number = payload["shift_id"], payload.get("shift_number")
+            self.totals = {}
+        elif event == "shift_closed":
+            if payload.get("shift_id") == self.shift_id:
+                self.shift_id, self.shift_number, self.totals = None, None, {}
+        elif event in ("sales_deleted", "expenses_deleted"):
+            self.reconcile()
+            return
+        else:
+            return
+        self._render()
+
+    def _render(self):
+        if self.shift_id is None:
+            self.shift_label.setText("لا يوجد شفت مفتوح")
+            for lbl in (self.sales_label, self.invoices_label, self.discounts_label, self.expenses_label):
+                lbl.setText("")
+            return
+        t = self.totals
+        self.shift_label.setText(f"الشفت الحالي: {self.shift_number}")
+        self.sales_label.setText(f"المبيعات: {int(round(t.get('total_sales', 0)))} ج.م")
+        self.invoices_label.setText(f"الفواتير: {t.get('invoice_count', 0)}")
+        self.discounts_label.setText(f"الخصومات: {int(round(t.get('customer_discounts', 0)))} ج.م")
+        self.expenses_label.setText(f"المصاريف: {int(round(t.get('total_expenses', 0)))} ج.م")
 
 
 class ShiftDashboard(QWidget):
-    def __init__(self, db: Database):
+    def __init__(self, db: Database, session: Optional[SessionContext] = None):
         super().__init__()
         self.db = db
+        self.session = session or SessionContext(db)
 
         self.header_font = QFont("Cairo", 18, QFont.Bold)
         self.body_font = QFont("Cairo", 14)
@@ -24,6 +126,9 @@ class ShiftDashboard(QWidget):
         self.status_label.setAlignment(Qt.AlignCenter)
         layout.addWidget(self.status_label)
 
+        self.live_panel = LiveShiftPanel(db)
+        layout.addWidget(self.live_panel)
+
         form = QHBoxLayout()
         form.addWidget(QLabel("اسم الكاشير"))
         self.cashier_input = QLineEdit()
@@ -49,7 +154,7 @@ class ShiftDashboard(QWidget):
         self.refresh()
 
     def refresh(self):
-        sh = self.db.get_active_shift()
+        sh = self.session.active_shift()
         if sh:
             _, shift_number, cashier_name, opened_at, closed_at, active = sh
             self.status_label.setText(f"شفت مفتوح رقم {shift_number} - {cashier_name} منذ {opened_at}")
@@ -71,7 +176,7 @@ class ShiftDashboard(QWidget):
         self.refresh()
 
     def close_shift(self):
-        sh = self.db.get_active_shift()
+        sh = self.session.active_shift()
         if not sh:
             QMessageBox.warning(self, "تنبيه", "لا يوجد شفت مفتوح للإغلاق")
             return
@@ -92,5 +197,12 @@ class ShiftDashboard(QWidget):
         txt.append(f"إجمالي المصاريف: {int(summary.get('total_expenses',0))} ج.م")
         report_text = "\n".join(txt)
         self.summary_label.setText(report_text)
+        # Save the shift report next to the receipts so auto_print routes it to the shift printer
+        try:
+            path = os.path.join(receipts_dir(), f"shift_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(report_text)
+        except Exception:
+            pass
         QMessageBox.information(self, "تم", "تم إغلاق الشفت وعرض التقرير.")
         self.refresh()
\ No newline at end of file
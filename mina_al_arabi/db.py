@@ -1,8 +1,8 @@
 import os
 import sqlite3
 import shutil
-from datetime import datetime
-from typing import List, Tuple, Optional, Dict, Any
+from datetime import datetime, timedelta
+from typing import List, Tuple, Optional, Dict, Any, Callable
 
 
 APP_DIR = os.path.join(os.getcwd(), "mina_al_arabi")
@@ -11,6 +11,90 @@ DB_PATH = os.path.join(DATA_DIR, "mina.db")
 BACKUPS_DIR = os.path.join(DATA_DIR, "backups")
 RECEIPTS_DIR = os.path.join(DATA_DIR, "receipts")
 
+# Full-text search: one FTS5 row per searchable record, rowid = ref_id * 4 + kind code
+SEARCH_KINDS = {"product": 0, "expense": 1, "receipt": 2}
+# Arabic letter variants folded together so "احمد" finds "أحمد" and "جلسه" finds "جلسة"
+_AR_FOLD = str.maketrans({
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا",
+    "ة": "ه", "ى": "ي", "ؤ": "و", "ئ": "ي",
+    "ـ": None,  # tatweel
+    **{chr(c): None for c in range(0x064B, 0x0660)},  # harakat
+    "\u0670": None,  # superscript alef
+    **{chr(0x0660 + i): str(i) for i in range(10)},  # Arabic-Indic digits
+})
+
+
+# Foreign keys and their ON DELETE actions: child table -> {column: (parent table, action)}
+FOREIGN_KEYS = {
+    "sales": {"employee_id": ("employees", "SET NULL")},
+    "sale_items": {"sale_id": ("sales", "CASCADE"), "product_id": ("products", "SET NULL"),
+                   "service_id": ("services", "SET NULL")},
+    "supplier_invoices": {"supplier_id": ("suppliers", "CASCADE")},
+    "supplier_payments": {"supplier_id": ("suppliers", "CASCADE")},
+    "attendance": {"employee_id": ("employees", "CASCADE")},
+    "loans": {"employee_id": ("employees", "CASCADE")},
+}
+
+# Why stock changed (stock_movements.reason) and what ref_id points to
+STOCK_REASONS = {
+    "opening": "رصيد افتتاحي",  # product added or ledger started; no ref
+    "sale": "بيع",  # sales.id
+    "employee": "شراء موظف",  # sales.id
+    "shop_use": "استخدام المحل",  # expenses.id
+    "adjustment": "تعديل يدوي",  # no ref
+    "delivery": "توريد من مورد",  # supplier_invoices.id
+    "removed": "حذف المنتج",  # no ref
+}
+
+
+def month_range(year: int, month: int) -> Tuple[str, str]:
+    """[start, end) date strings for a month, for index-friendly `date >= ? AND date < ?` filters."""
+    if month == 12:
+        return f"{year:04d}-12-01", f"{year + 1:04d}-01-01"
+    return f"{year:04d}-{month:02d}-01", f"{year:04d}-{month + 1:02d}-01"
+
+
+def normalize_arabic(text: Optional[str]) -> str:
+    """Normalize text for search: fold alef/taa marbuta/yaa variants, drop diacritics, lowercase."""
+    if not text:
+        return ""
+    return str(text).translate(_AR_FOLD).lower()
+
+
+_FOLD_CHUNK = 21  # replace() calls per expression; SQLite parses about 28 nested calls in a trigger
+_FOLD_STEPS = -(-len(_AR_FOLD) // _FOLD_CHUNK)
+
+
+def _sql_fold(expr: str, step: int = 0) -> str:
+    """SQL for one step of normalize_arabic(expr), with built-in functions only.
+
+    The search triggers use it instead of a Python function so the database can
+    still be written by any SQLite client (the sqlite3 shell, DB Browser). The
+    fold is too long for one expression, so step 0 is applied when a row is
+    written and _sql_refold() applies the rest. Non-ASCII case folding is left
+    to the FTS5 tokenizer.
+    """
+    sql = f"COALESCE({expr}, '')" if step == 0 else expr
+    for code, repl in list(_AR_FOLD.items())[step * _FOLD_CHUNK:(step + 1) * _FOLD_CHUNK]:
+        sql = f"replace({sql}, '{chr(code)}', '{repl or ''}')"
+    return f"lower({sql})" if step == 0 else sql
+
+
+def _sql_refold(rowid: str) -> str:
+    """Statements applying the remaining _sql_fold() steps to a search_index row."""
+    return "".join(f"UPDATE search_index SET title = {_sql_fold('title', step)}, body = {_sql_fold('body', step)}"
+                   f" WHERE rowid = {rowid};\n" for step in range(1, _FOLD_STEPS))
+
+
+def _fts_query(query: str) -> str:
+    """Turn user input into an FTS5 prefix query: every word must match as a prefix."""
+    tokens = []
+    for tok in normalize_arabic(query).split():
+        tok = "".join(ch for ch in tok if ch.isalnum())
+        if tok:
+            tokens.append(f'"{tok}"*')
+    return " ".join(tokens)
+
 
 class Database:
     def __init__(self, path: str = DB_PATH):
@@ -18,14 +102,46 @@ class Database:
         os.makedirs(DATA_DIR, exist_ok=True)
         os.makedirs(BACKUPS_DIR, exist_ok=True)
         os.makedirs(RECEIPTS_DIR, exist_ok=True)
+        self._listeners: List[Callable[[str, Dict[str, Any]], None]] = []
+
+    # Write events: listeners are called as callback(event, payload) after each commit,
+    # on the thread that performed the write.
+    def subscribe(self, callback: Callable[[str, Dict[str, Any]], None]) -> None:
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+
+    def unsubscribe(self, callback: Callable[[str, Dict[str, Any]], None]) -> None:
+        try:
+            self._listeners.remove(callback)
+        except ValueError:
+            pass
+
+    def _emit(self, event: str, payload: Dict[str, Any]) -> None:
+        for callback in list(self._listeners):
+            try:
+                callback(event, payload)
+            except Exception:
+                pass
+
+    def notify(self, event: str, payload: Dict[str, Any]) -> None:
+        """Announce a write made with plain SQL outside these methods (archive.py) to the listeners."""
+        self._emit(event, payload)
 
     def connect(self):
-        return sqlite3.connect(self.path)
+        conn = sqlite3.connect(self.path)
+        conn.execute("PRAGMA foreign_keys = ON")
+        return conn
 
     def ensure_schema(self):
         with self.connect() as conn:
             c = conn.cursor()
 
+            # New databases free deleted pages with PRAGMA incremental_vacuum (see maintenance.py);
+            # the mode can only be set before the first table is created.
+            c.execute("SELECT COUNT(*) FROM sqlite_master")
+            if c.fetchone()[0] == 0:
+                c.execute("PRAGMA auto_vacuum = INCREMENTAL")
+
             # Employees
             c.execute("""
             CREATE TABLE IF NOT EXISTS employees (
@@ -50,7 +166,8 @@ class Database:
                 name TEXT NOT NULL UNIQUE,
                 price REAL NOT NULL,
                 quantity INTEGER NOT NULL DEFAULT 0,
-                purchase_price REAL
+                purchase_price REAL,
+                barcode TEXT
             )
             """)
 
@@ -69,7 +186,7 @@ class Database:
                 cleared INTEGER NOT NULL DEFAULT 0,
                 material_deduction REAL NOT NULL DEFAULT 0,
                 shift_id INTEGER,
-                FOREIGN KEY(employee_id) REFERENCES employees(id)
+                FOREIGN KEY(employee_id) REFERENCES employees(id) ON DELETE SET NULL
             )
             """)
 
@@ -80,7 +197,11 @@ class Database:
                 item_name TEXT NOT NULL,
                 unit_price REAL NOT NULL,
                 quantity INTEGER NOT NULL DEFAULT 1,
-                FOREIGN KEY(sale_id) REFERENCES sales(id)
+                product_id INTEGER,
+                service_id INTEGER,
+                FOREIGN KEY(sale_id) REFERENCES sales(id) ON DELETE CASCADE,
+                FOREIGN KEY(product_id) REFERENCES products(id) ON DELETE SET NULL,
+                FOREIGN KEY(service_id) REFERENCES services(id) ON DELETE SET NULL
             )
             """)
 
@@ -112,7 +233,7 @@ class Database:
                 date TEXT NOT NULL,
                 total_amount REAL NOT NULL,
                 paid_amount REAL NOT NULL DEFAULT 0,
-                FOREIGN KEY(supplier_id) REFERENCES suppliers(id)
+                FOREIGN KEY(supplier_id) REFERENCES suppliers(id) ON DELETE CASCADE
             )
             """)
             c.execute("""
@@ -122,7 +243,7 @@ class Database:
                 date TEXT NOT NULL,
                 amount REAL NOT NULL,
                 note TEXT,
-                FOREIGN KEY(supplier_id) REFERENCES suppliers(id)
+                FOREIGN KEY(supplier_id) REFERENCES suppliers(id) ON DELETE CASCADE
             )
             """)
 
@@ -136,7 +257,8 @@ class Database:
                 check_out TEXT,
                 manual INTEGER NOT NULL DEFAULT 0,
                 note TEXT,
-                FOREIGN KEY(employee_id) REFERENCES employees(id)
+                shift_id INTEGER,
+                FOREIGN KEY(employee_id) REFERENCES employees(id) ON DELETE CASCADE
             )
             """)
 
@@ -149,7 +271,7 @@ class Database:
                 amount REAL NOT NULL,
                 note TEXT,
                 cleared INTEGER NOT NULL DEFAULT 0,
-                FOREIGN KEY(employee_id) REFERENCES employees(id)
+                FOREIGN KEY(employee_id) REFERENCES employees(id) ON DELETE CASCADE
             )
             """)
 
@@ -161,7 +283,105 @@ class Database:
                 cashier_name TEXT NOT NULL,
                 opened_at TEXT NOT NULL,
                 closed_at TEXT,
-                active INTEGER NOT NULL DEFAULT 1
+                active INTEGER NOT NULL DEFAULT 1,
+                -- Running totals, maintained by triggers on sales/expenses
+                sales_total REAL NOT NULL DEFAULT 0,
+                discount_total REAL NOT NULL DEFAULT 0,
+                material_total REAL NOT NULL DEFAULT 0,
+                invoice_count INTEGER NOT NULL DEFAULT 0,
+                expense_total REAL NOT NULL DEFAULT 0
+            )
+            """)
+
+            # Months moved to archive_YYYY.db files (see archive.py)
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS archive_log (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                month TEXT NOT NULL, -- YYYY-MM
+                archive_file TEXT NOT NULL,
+                sales INTEGER NOT NULL DEFAULT 0,
+                sale_items INTEGER NOT NULL DEFAULT 0,
+                expenses INTEGER NOT NULL DEFAULT 0,
+                attendance INTEGER NOT NULL DEFAULT 0,
+                archived_at TEXT NOT NULL
+            )
+            """)
+
+            # Runs of the maintenance job (see maintenance.py)
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS maintenance_log (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                started_at TEXT NOT NULL,
+                trigger TEXT NOT NULL, -- 'shift_close', 'idle' or 'manual'
+                tasks TEXT NOT NULL, -- comma separated, e.g. 'optimize,incremental_vacuum'
+                freed_pages INTEGER NOT NULL DEFAULT 0,
+                check_result TEXT, -- quick_check output when it ran
+                duration_ms INTEGER NOT NULL
+            )
+            """)
+
+            # Staffing forecast inputs per business day (see forecast.py); MAX(day) is the last open day
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS forecast_days (
+                day TEXT PRIMARY KEY, -- YYYY-MM-DD, the shift day
+                weekday INTEGER NOT NULL, -- 0 = Sunday
+                refreshed_at TEXT NOT NULL
+            )
+            """)
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS forecast_counts (
+                day TEXT NOT NULL,
+                hour INTEGER NOT NULL, -- clock hour 0-23 within the business day
+                customers INTEGER NOT NULL DEFAULT 0,
+                barber_hours REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, hour)
+            )
+            """)
+            # Forecast refreshes; MAX(through_day) is the watermark, closed days included
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS forecast_log (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                refreshed_at TEXT NOT NULL,
+                start_day TEXT, -- first business day re-processed (NULL when there was no data)
+                through_day TEXT NOT NULL, -- last business day covered
+                days INTEGER NOT NULL DEFAULT 0 -- open days written
+            )
+            """)
+
+            # Append-only stock ledger: one row per change of products.quantity, written in the
+            # same transaction. Monthly snapshots hold each product's quantity at the start of
+            # `day`, so a point-in-time question reads one snapshot plus the movements after it.
+            c.execute("SELECT 1 FROM sqlite_master WHERE name = 'stock_movements'")
+            stock_ledger_exists = c.fetchone() is not None
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS stock_movements (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                product_id INTEGER NOT NULL, -- kept after the product is deleted
+                date TEXT NOT NULL,
+                delta INTEGER NOT NULL,
+                reason TEXT NOT NULL, -- see STOCK_REASONS
+                ref_id INTEGER,
+                unit_cost REAL -- purchase price (sale price if unknown) at the time of the movement
+            )
+            """)
+            # Products at or below their reorder level, kept by the trg_low_stock_* triggers
+            c.execute("SELECT 1 FROM sqlite_master WHERE name = 'low_stock'")
+            low_stock_exists = c.fetchone() is not None
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS low_stock (
+                product_id INTEGER PRIMARY KEY,
+                quantity INTEGER NOT NULL,
+                reorder_level INTEGER NOT NULL,
+                since TEXT NOT NULL -- when the product first dropped to its reorder level
+            )
+            """)
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS stock_snapshots (
+                day TEXT NOT NULL, -- YYYY-MM-01: covers movements dated before this day
+                product_id INTEGER NOT NULL,
+                quantity INTEGER NOT NULL,
+                unit_cost REAL,
+                PRIMARY KEY (day, product_id)
             )
             """)
 
@@ -175,13 +395,329 @@ class Database:
                 "ALTER TABLE expenses ADD COLUMN shift_id INTEGER",
                 "ALTER TABLE attendance ADD COLUMN manual INTEGER NOT NULL DEFAULT 0",
                 "ALTER TABLE attendance ADD COLUMN note TEXT",
+                "ALTER TABLE attendance ADD COLUMN shift_id INTEGER",
                 "ALTER TABLE products ADD COLUMN purchase_price REAL",
+                "ALTER TABLE products ADD COLUMN barcode TEXT",
+                "ALTER TABLE products ADD COLUMN reorder_level INTEGER",
+            ]:
+                try:
+                    c.execute(stmt)
+                except Exception:
+                    pass
+
+            # Link sale_items to products/services by id; old rows are matched by name once, when the columns are added
+            try:
+                c.execute("ALTER TABLE sale_items ADD COLUMN product_id INTEGER")
+                c.execute("ALTER TABLE sale_items ADD COLUMN service_id INTEGER")
+                c.execute("""
+                UPDATE sale_items SET product_id = (SELECT p.id FROM products p WHERE p.name = sale_items.item_name)
+                WHERE sale_id IN (SELECT id FROM sales WHERE type = 'product')
+                """)
+                c.execute("""
+                UPDATE sale_items SET service_id = (SELECT sv.id FROM services sv WHERE sv.name = sale_items.item_name)
+                WHERE sale_id IN (SELECT id FROM sales WHERE type = 'service')
+                """)
+            except Exception:
+                pass
+
+            # Per-shift running totals; shifts from before these columns existed are backfilled once
+            shift_totals_added = False
+            try:
+                c.execute("ALTER TABLE shifts ADD COLUMN sales_total REAL NOT NULL DEFAULT 0")
+                shift_totals_added = True
+            except Exception:
+                pass
+            for stmt in [
+                "ALTER TABLE shifts ADD COLUMN discount_total REAL NOT NULL DEFAULT 0",
+                "ALTER TABLE shifts ADD COLUMN material_total REAL NOT NULL DEFAULT 0",
+                "ALTER TABLE shifts ADD COLUMN invoice_count INTEGER NOT NULL DEFAULT 0",
+                "ALTER TABLE shifts ADD COLUMN expense_total REAL NOT NULL DEFAULT 0",
             ]:
                 try:
                     c.execute(stmt)
                 except Exception:
                     pass
 
+            # Databases created before ON DELETE actions existed get their tables rebuilt once
+            self._migrate_foreign_keys(conn)
+
+            # Indexes
+            c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_products_barcode ON products(barcode)")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_sales_date ON sales(date)")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_sales_employee ON sales(employee_id, date)")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_expenses_date ON expenses(date)")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_attendance_employee ON attendance(employee_id)")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_attendance_date ON attendance(date)")
+            # Open check-ins only: check_out finds the employee's open record without scanning history
+            c.execute("CREATE INDEX IF NOT EXISTS idx_attendance_open ON attendance(employee_id) WHERE check_out IS NULL")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_loans_employee ON loans(employee_id, date)")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_sale_items_sale ON sale_items(sale_id)")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_sale_items_product ON sale_items(product_id, sale_id)")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_sale_items_service ON sale_items(service_id, sale_id)")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_sales_shift ON sales(shift_id)")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_expenses_shift ON expenses(shift_id)")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_stock_movements_product ON stock_movements(product_id, date)")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_stock_movements_date ON stock_movements(date)")
+
+            # Stock on hand before the ledger existed becomes each product's opening movement
+            if not stock_ledger_exists:
+                self.record_opening_stock(c)
+
+            # Shift running totals, updated in the same transaction as each sale/expense.
+            # Only the active shift is adjusted so closed shift reports stay as printed;
+            # insert triggers created before that guard are replaced.
+            c.execute("""
+            SELECT name FROM sqlite_master
+            WHERE type = 'trigger' AND name IN ('trg_shift_sales_ai', 'trg_shift_expenses_ai') AND sql NOT LIKE '%active = 1%'
+            """)
+            for (trigger,) in c.fetchall():
+                c.execute(f"DROP TRIGGER {trigger}")
+            for stmt in [
+                """
+                CREATE TRIGGER IF NOT EXISTS trg_shift_sales_ai AFTER INSERT ON sales
+                WHEN new.shift_id IS NOT NULL BEGIN
+                    UPDATE shifts SET
+                        sales_total = sales_total + new.total,
+                        discount_total = discount_total + new.total * (new.discount_percent / 100.0),
+                        material_total = material_total + new.material_deduction,
+                        invoice_count = invoice_count + 1
+                    WHERE id = new.shift_id AND active = 1;
+                END
+                """,
+                """
+                CREATE TRIGGER IF NOT EXISTS trg_shift_sales_ad AFTER DELETE ON sales
+                WHEN old.shift_id IS NOT NULL BEGIN
+                    UPDATE shifts SET
+                        sales_total = sales_total - old.total,
+                        discount_total = discount_total - old.total * (old.discount_percent / 100.0),
+                        material_total = material_total - old.material_deduction,
+                        invoice_count = invoice_count - 1
+                    WHERE id = old.shift_id AND active = 1;
+                END
+                """,
+                """
+                CREATE TRIGGER IF NOT EXISTS trg_shift_expenses_ai AFTER INSERT ON expenses
+                WHEN new.shift_id IS NOT NULL BEGIN
+                    UPDATE shifts SET expense_total = expense_total + new.amount WHERE id = new.shift_id AND active = 1;
+                END
+                """,
+                """
+                CREATE TRIGGER IF NOT EXISTS trg_shift_expenses_ad AFTER DELETE ON expenses
+                WHEN old.shift_id IS NOT NULL BEGIN
+                    UPDATE shifts SET expense_total = expense_total - old.amount WHERE id = old.shift_id AND active = 1;
+                END
+                """,
+            ]:
+                c.execute(stmt)
+            if shift_totals_added:
+                self._recompute_shift_totals(c)
+
+            # Low-stock set: a product enters when quantity <= reorder_level and leaves when it is
+            # restocked above it, its level is cleared or it is deleted. `since` survives further sales.
+            for stmt in [
+                """
+                CREATE TRIGGER IF NOT EXISTS trg_low_stock_ai AFTER INSERT ON products
+                WHEN new.reorder_level IS NOT NULL AND new.quantity <= new.reorder_level BEGIN
+                    INSERT OR REPLACE INTO low_stock(product_id, quantity, reorder_level, since)
+                    VALUES (new.id, new.quantity, new.reorder_level, datetime('now', 'localtime'));
+                END
+                """,
+                """
+                CREATE TRIGGER IF NOT EXISTS trg_low_stock_au AFTER UPDATE OF quantity, reorder_level ON products BEGIN
+                    DELETE FROM low_stock
+                    WHERE product_id = new.id AND (new.reorder_level IS NULL OR new.quantity > new.reorder_level);
+                    INSERT INTO low_stock(product_id, quantity, reorder_level, since)
+                    SELECT new.id, new.quantity, new.reorder_level, datetime('now', 'localtime')
+                    WHERE new.reorder_level IS NOT NULL AND new.quantity <= new.reorder_level
+                    ON CONFLICT(product_id) DO UPDATE SET quantity = excluded.quantity, reorder_level = excluded.reorder_level;
+                END
+                """,
+                """
+                CREATE TRIGGER IF NOT EXISTS trg_low_stock_ad AFTER DELETE ON products BEGIN
+                    DELETE FROM low_stock WHERE product_id = old.id;
+                END
+                """,
+            ]:
+                c.execute(stmt)
+            if not low_stock_exists:
+                c.execute("""
+                INSERT OR REPLACE INTO low_stock(product_id, quantity, reorder_level, since)
+                SELECT id, quantity, reorder_level, datetime('now', 'localtime') FROM products
+                WHERE reorder_level IS NOT NULL AND quantity <= reorder_level
+                """)
+
+            # Full-text search index kept in sync by triggers. Triggers from before _sql_fold
+            # called a Python function (ar_norm) that other SQLite clients lack; they are replaced.
+            c.execute("SELECT 1 FROM sqlite_master WHERE name = 'search_index'")
+            search_index_exists = c.fetchone() is not None
+            c.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(title, body)
+            """)
+            c.execute("""
+            SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'trg_search_%' AND sql LIKE '%ar_norm(%'
+            """)
+            for (trigger,) in c.fetchall():
+                c.execute(f"DROP TRIGGER {trigger}")
+            for stmt in [
+                f"""
+                CREATE TRIGGER IF NOT EXISTS trg_search_products_ai AFTER INSERT ON products BEGIN
+                    INSERT INTO search_index(rowid, title, body) VALUES (new.id * 4, {_sql_fold('new.name')}, '');
+                    {_sql_refold('new.id * 4')}
+                END
+                """,
+                f"""
+                CREATE TRIGGER IF NOT EXISTS trg_search_products_au AFTER UPDATE OF name ON products BEGIN
+                    UPDATE search_index SET title = {_sql_fold('new.name')} WHERE rowid = new.id * 4;
+                    {_sql_refold('new.id * 4')}
+                END
+                """,
+                """
+                CREATE TRIGGER IF NOT EXISTS trg_search_products_ad AFTER DELETE ON products BEGIN
+                    DELETE FROM search_index WHERE rowid = old.id * 4;
+                END
+                """,
+                f"""
+                CREATE TRIGGER IF NOT EXISTS trg_search_expenses_ai AFTER INSERT ON expenses BEGIN
+                    INSERT INTO search_index(rowid, title, body)
+                    VALUES (new.id * 4 + 1, {_sql_fold('new.category')}, {_sql_fold('new.note')});
+                    {_sql_refold('new.id * 4 + 1')}
+                END
+                """,
+                """
+                CREATE TRIGGER IF NOT EXISTS trg_search_expenses_ad AFTER DELETE ON expenses BEGIN
+                    DELETE FROM search_index WHERE rowid = old.id * 4 + 1;
+                END
+                """,
+                f"""
+                CREATE TRIGGER IF NOT EXISTS trg_search_sales_ai AFTER INSERT ON sales BEGIN
+                    INSERT INTO search_index(rowid, title, body) VALUES (new.id * 4 + 2, {_sql_fold('new.customer_name')}, '');
+                    {_sql_refold('new.id * 4 + 2')}
+                END
+                """,
+                """
+                CREATE TRIGGER IF NOT EXISTS trg_search_sales_ad AFTER DELETE ON sales BEGIN
+                    DELETE FROM search_index WHERE rowid = old.id * 4 + 2;
+                END
+                """,
+                f"""
+                CREATE TRIGGER IF NOT EXISTS trg_search_sale_items_ai AFTER INSERT ON sale_items BEGIN
+                    UPDATE search_index SET body = body || ' ' || {_sql_fold('new.item_name')} WHERE rowid = new.sale_id * 4 + 2;
+                    {_sql_refold('new.sale_id * 4 + 2')}
+                END
+                """,
+            ]:
+                c.execute(stmt)
+            if not search_index_exists:
+                self._rebuild_search_index(c)
+
+            conn.commit()
+
+    def _migrate_foreign_keys(self, conn):
+        c = conn.cursor()
+        stale = []
+        for table, fks in FOREIGN_KEYS.items():
+            c.execute(f"PRAGMA foreign_key_list({table})")
+            current = {r[3]: (r[2], r[6]) for r in c.fetchall()}
+            if current != fks:
+                stale.append(table)
+        if not stale:
+            return
+        # Table rebuilds must run with enforcement off, outside any open transaction
+        conn.commit()
+        c.execute("PRAGMA foreign_keys = OFF")
+        try:
+            c.execute("BEGIN")
+            for table in stale:
+                self._rebuild_table_with_foreign_keys(c, table)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            c.execute("PRAGMA foreign_keys = ON")
+
+    def _rebuild_table_with_foreign_keys(self, c, table: str):
+        """Recreate `table` with the constraints from FOREIGN_KEYS, keeping every column and row."""
+        c.execute(f"PRAGMA table_info({table})")
+        cols = c.fetchall()  # cid, name, type, notnull, dflt_value, pk
+        defs = []
+        for _, name, ctype, notnull, dflt, pk in cols:
+            if pk:
+                defs.append(f"{name} INTEGER PRIMARY KEY AUTOINCREMENT")
+                continue
+            d = f"{name} {ctype}"
+            if notnull:
+                d += " NOT NULL"
+            if dflt is not None:
+                d += f" DEFAULT {dflt}"
+            defs.append(d)
+        for col, (parent, action) in FOREIGN_KEYS[table].items():
+            defs.append(f"FOREIGN KEY({col}) REFERENCES {parent}(id) ON DELETE {action}")
+        names = ", ".join(r[1] for r in cols)
+        c.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,))
+        row = c.fetchone()
+        c.execute(f"CREATE TABLE {table}__new ({', '.join(defs)})")
+        c.execute(f"INSERT INTO {table}__new({names}) SELECT {names} FROM {table}")
+        # Rows pointing at parents that were deleted earlier would fail the new SET NULL constraints
+        for col, (parent, action) in FOREIGN_KEYS[table].items():
+            if action == "SET NULL":
+                c.execute(f"""
+                UPDATE {table}__new SET {col} = NULL
+                WHERE {col} IS NOT NULL AND {col} NOT IN (SELECT id FROM {parent})
+                """)
+        c.execute(f"DROP TABLE {table}")
+        c.execute(f"ALTER TABLE {table}__new RENAME TO {table}")
+        if row:
+            c.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?", (row[0], table))
+
+    def _recompute_shift_totals(self, c, shift_id: Optional[int] = None):
+        where = "WHERE id = ?" if shift_id else ""
+        c.execute(f"""
+        UPDATE shifts SET
+            sales_total = COALESCE((SELECT SUM(total) FROM sales WHERE shift_id = shifts.id), 0),
+            discount_total = COALESCE((SELECT SUM(total * (discount_percent / 100.0)) FROM sales WHERE shift_id = shifts.id), 0),
+            material_total = COALESCE((SELECT SUM(material_deduction) FROM sales WHERE shift_id = shifts.id), 0),
+            invoice_count = (SELECT COUNT(*) FROM sales WHERE shift_id = shifts.id),
+            expense_total = COALESCE((SELECT SUM(amount) FROM expenses WHERE shift_id = shifts.id), 0)
+        {where}
+        """, (shift_id,) if shift_id else ())
+
+    def record_opening_stock(self, c, date: Optional[str] = None):
+        """Opening movement for every product with stock and no ledger rows yet, in the caller's transaction."""
+        c.execute("""
+        INSERT INTO stock_movements(product_id, date, delta, reason, unit_cost)
+        SELECT p.id, ?, p.quantity, 'opening', COALESCE(p.purchase_price, p.price)
+        FROM products p
+        WHERE p.quantity != 0 AND NOT EXISTS (SELECT 1 FROM stock_movements m WHERE m.product_id = p.id)
+        """, (date or datetime.now().strftime("%Y-%m-%d %H:%M:%S"),))
+
+    def _move_stock(self, c, product_id: int, delta: int, reason: str, ref_id: Optional[int], date: str):
+        """Apply delta to products.quantity and append the ledger row, in the caller's transaction."""
+        c.execute("UPDATE products SET quantity = quantity + ? WHERE id = ?", (delta, product_id))
+        c.execute("""
+        INSERT INTO stock_movements(product_id, date, delta, reason, ref_id, unit_cost)
+        SELECT id, ?, ?, ?, ?, COALESCE(purchase_price, price) FROM products WHERE id = ?
+        """, (date, delta, reason, ref_id, product_id))
+
+    def _rebuild_search_index(self, c):
+        # Normalized in Python here; only this connection needs the function
+        c.connection.create_function("ar_norm", 1, normalize_arabic, deterministic=True)
+        c.execute("DELETE FROM search_index")
+        c.execute("INSERT INTO search_index(rowid, title, body) SELECT id * 4, ar_norm(name), '' FROM products")
+        c.execute("""
+        INSERT INTO search_index(rowid, title, body)
+        SELECT id * 4 + 1, ar_norm(category), ar_norm(note) FROM expenses
+        """)
+        c.execute("""
+        INSERT INTO search_index(rowid, title, body)
+        SELECT s.id * 4 + 2, ar_norm(s.customer_name),
+               COALESCE((SELECT group_concat(ar_norm(si.item_name), ' ') FROM sale_items si WHERE si.sale_id = s.id), '')
+        FROM sales s
+        """)
+
+    def rebuild_search_index(self):
+        with self.connect() as conn:
+            self._rebuild_search_index(conn.cursor())
             conn.commit()
 
     # General helpers
@@ -197,6 +733,7 @@ class Database:
             c = conn.cursor()
             c.execute("INSERT OR IGNORE INTO employees(name) VALUES (?)", (name,))
             conn.commit()
+        self._emit("employees_changed", {})
 
     def list_employees(self) -> List[Tuple[int, str]]:
         with self.connect() as conn:
@@ -209,6 +746,7 @@ class Database:
             c = conn.cursor()
             c.execute("DELETE FROM employees WHERE name = ?", (name,))
             conn.commit()
+        self._emit("employees_changed", {})
 
     # Services
     def add_service(self, name: str, price: float):
@@ -236,20 +774,37 @@ class Database:
             conn.commit()
 
     # Products
-    def add_product(self, name: str, price: float, quantity: int, purchase_price: Optional[float] = None):
+    def add_product(self, name: str, price: float, quantity: int, purchase_price: Optional[float] = None,
+                    barcode: Optional[str] = None) -> bool:
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         with self.connect() as conn:
             c = conn.cursor()
             c.execute(
-                "INSERT OR IGNORE INTO products(name, price, quantity, purchase_price) VALUES (?, ?, ?, ?)",
-                (name, price, quantity, purchase_price)
+                "INSERT OR IGNORE INTO products(name, price, quantity, purchase_price, barcode) VALUES (?, ?, ?, ?, ?)",
+                (name, price, quantity, purchase_price, barcode or None)
             )
+            added = c.rowcount > 0
+            if added and quantity:
+                c.execute(
+                    "INSERT INTO stock_movements(product_id, date, delta, reason, unit_cost) VALUES (?, ?, ?, 'opening', ?)",
+                    (c.lastrowid, now, quantity, purchase_price if purchase_price is not None else price)
+                )
             conn.commit()
-
-    def update_product_qty(self, product_id: int, delta: int):
+        if added and quantity:
+            self._emit("stock_changed", {"date": now, "reason": "opening"})
+        # False when the name or barcode already exists
+        return added
+
+    def update_product_qty(self, product_id: int, delta: int, reason: str = "adjustment", ref_id: Optional[int] = None):
+        """Change the stock of a product; reason/ref_id say why (see STOCK_REASONS)."""
+        if reason not in STOCK_REASONS:
+            raise ValueError(f"سبب حركة غير معروف: {reason}")
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         with self.connect() as conn:
             c = conn.cursor()
-            c.execute("UPDATE products SET quantity = quantity + ? WHERE id = ?", (delta, product_id))
+            self._move_stock(c, product_id, delta, reason, ref_id, now)
             conn.commit()
+        self._emit("stock_changed", {"product_id": product_id, "date": now, "reason": reason, "delta": delta})
 
     def update_product_price(self, product_id: int, new_price: float):
         with self.connect() as conn:
@@ -257,37 +812,89 @@ class Database:
             c.execute("UPDATE products SET price = ? WHERE id = ?", (new_price, product_id))
             conn.commit()
 
-    def list_products(self) -> List[Tuple[int, str, float, int, Optional[float]]]:
+    def set_product_barcode(self, product_id: int, barcode: Optional[str]):
+        """Raises sqlite3.IntegrityError if the barcode already belongs to another product."""
+        with self.connect() as conn:
+            c = conn.cursor()
+            c.execute("UPDATE products SET barcode = ? WHERE id = ?", (barcode or None, product_id))
+            conn.commit()
+
+    def set_reorder_level(self, product_id: int, level: Optional[int]):
+        """Alert when the quantity drops to `level` or below; None turns the alert off."""
         with self.connect() as conn:
             c = conn.cursor()
-            c.execute("SELECT id, name, price, quantity, purchase_price FROM products ORDER BY name")
+            c.execute("UPDATE products SET reorder_level = ? WHERE id = ?", (level, product_id))
+            conn.commit()
+        self._emit("reorder_level_changed", {"product_id": product_id, "reorder_level": level})
+
+    def list_products(self) -> List[Tuple[int, str, float, int, Optional[float], Optional[str], Optional[int]]]:
+        with self.connect() as conn:
+            c = conn.cursor()
+            c.execute("SELECT id, name, price, quantity, purchase_price, barcode, reorder_level FROM products ORDER BY name")
             return c.fetchall()
 
+    def low_stock_count(self) -> int:
+        with self.connect() as conn:
+            c = conn.cursor()
+            c.execute("SELECT COUNT(*) FROM low_stock")
+            return c.fetchone()[0]
+
+    def list_low_stock(self) -> List[Dict[str, Any]]:
+        """Products at or below their reorder level, the furthest below first; reads only the low_stock set."""
+        with self.connect() as conn:
+            c = conn.cursor()
+            c.execute("""
+            SELECT l.product_id, p.name, l.quantity, l.reorder_level, l.since, COALESCE(p.purchase_price, p.price)
+            FROM low_stock l JOIN products p ON p.id = l.product_id
+            ORDER BY l.quantity - l.reorder_level, p.name
+            """)
+            return [{
+                "product_id": pid, "name": name, "quantity": qty, "reorder_level": level, "since": since,
+                "unit_cost": float(cost or 0),
+            } for pid, name, qty, level, since, cost in c.fetchall()]
+
     def get_product_by_name(self, name: str) -> Optional[Tuple[int, str, float, int, Optional[float]]]:
         with self.connect() as conn:
             c = conn.cursor()
             c.execute("SELECT id, name, price, quantity, purchase_price FROM products WHERE name = ?", (name,))
             return c.fetchone()
 
+    def get_product_by_barcode(self, barcode: str) -> Optional[Tuple[int, str, float, int, Optional[float]]]:
+        with self.connect() as conn:
+            c = conn.cursor()
+            c.execute("SELECT id, name, price, quantity, purchase_price FROM products WHERE barcode = ?", (barcode,))
+            return c.fetchone()
+
     def delete_product(self, product_id: int):
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         with self.connect() as conn:
             c = conn.cursor()
+            # Remaining stock leaves the ledger with the product, so later valuations do not count it
+            c.execute("""
+            INSERT INTO stock_movements(product_id, date, delta, reason, unit_cost)
+            SELECT id, ?, -quantity, 'removed', COALESCE(purchase_price, price) FROM products WHERE id = ? AND quantity != 0
+            """, (now, product_id))
             c.execute("DELETE FROM products WHERE id = ?", (product_id,))
             conn.commit()
+        self._emit("stock_changed", {"product_id": product_id, "date": now, "reason": "removed"})
 
     # Sales and items
-    def _normalize_date_for_shift(self, date: str, shift_id: Optional[int]) -> str:
-        """If a shift_id is provided, force the date's day to the shift's opened_at day, preserving time."""
+    def _normalize_date_for_shift(self, date: str, shift_id: Optional[int], opened_at: Optional[str] = None) -> str:
+        """If a shift_id is provided, force the date's day to the shift's opened_at day, preserving time.
+
+        Callers that already read the shift (_live_shift) pass opened_at to skip the lookup.
+        """
         if not shift_id:
             return date
-        with self.connect() as conn:
-            c = conn.cursor()
-            c.execute("SELECT opened_at FROM shifts WHERE id = ?", (shift_id,))
-            row = c.fetchone()
-            if not row or not row[0]:
-                return date
-            opened_at = row[0]  # "YYYY-MM-DD HH:MM:SS"
-            shift_day = opened_at[:10]
+        if not opened_at:
+            with self.connect() as conn:
+                c = conn.cursor()
+                c.execute("SELECT opened_at FROM shifts WHERE id = ?", (shift_id,))
+                row = c.fetchone()
+                if not row or not row[0]:
+                    return date
+                opened_at = row[0]  # "YYYY-MM-DD HH:MM:SS"
+        shift_day = opened_at[:10]
         # Preserve time component from provided date (if any)
         try:
             time_part = date.split(" ")[1]
@@ -295,12 +902,33 @@ class Database:
             time_part = "00:00:00"
         return f"{shift_day} {time_part}"
 
+    def _live_shift(self, conn, date: str, shift_id: Optional[int]) -> Tuple[str, Optional[int]]:
+        """(date, shift_id) for a sale or expense, checked inside its write transaction.
+
+        Takes the write lock first so the shift cannot be closed before the commit. A shift
+        closed in the meantime (a stale SessionContext, another counter) is replaced by the
+        active shift, or by none.
+        """
+        if not shift_id:
+            return date, shift_id
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        c = conn.cursor()
+        c.execute("SELECT id, opened_at FROM shifts WHERE id = ? AND active = 1", (shift_id,))
+        row = c.fetchone()
+        if row is None:
+            c.execute("SELECT id, opened_at FROM shifts WHERE active = 1 ORDER BY id DESC LIMIT 1")
+            row = c.fetchone()
+            if row is None:
+                return date, None
+        return self._normalize_date_for_shift(date, row[0], row[1]), row[0]
+
     def create_sale(self, date: str, employee_id: Optional[int], customer_name: Optional[str],
                     is_shop: int, total: float, discount_percent: int, sale_type: str,
                     buyer_type: str = "customer", material_deduction: float = 0.0,
                     shift_id: Optional[int] = None, cashier_name: Optional[str] = None) -> int:
-        date = self._normalize_date_for_shift(date, shift_id)
         with self.connect() as conn:
+            date, shift_id = self._live_shift(conn, date, shift_id)
             c = conn.cursor()
             c.execute("""
             INSERT INTO sales(date, employee_id, customer_name, is_shop, total, discount_percent, type, buyer_type, material_deduction, shift_id)
@@ -308,21 +936,126 @@ class Database:
             """, (date, employee_id, customer_name, is_shop, total, discount_percent, sale_type, buyer_type, material_deduction, shift_id))
             sale_id = c.lastrowid
             conn.commit()
-            return sale_id
-
-    def add_sale_item(self, sale_id: int, item_name: str, unit_price: float, quantity: int = 1):
+        self._emit("sale_created", {
+            "sale_id": sale_id, "shift_id": shift_id, "date": date, "employee_id": employee_id,
+            "total": total, "discount_percent": discount_percent, "material_deduction": material_deduction,
+            "type": sale_type, "buyer_type": buyer_type,
+        })
+        return sale_id
+
+    def add_sale_item(self, sale_id: int, item_name: str, unit_price: float, quantity: int = 1,
+                      product_id: Optional[int] = None, service_id: Optional[int] = None):
         with self.connect() as conn:
             c = conn.cursor()
             c.execute("""
-            INSERT INTO sale_items(sale_id, item_name, unit_price, quantity)
-            VALUES (?, ?, ?, ?)
-            """, (sale_id, item_name, unit_price, quantity))
+            INSERT INTO sale_items(sale_id, item_name, unit_price, quantity, product_id, service_id)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """, (sale_id, item_name, unit_price, quantity, product_id, service_id))
+            conn.commit()
+
+    def checkout(self, lines: List[Tuple[Optional[int], str, float, int]], buyer_type: str = "customer",
+                 date: Optional[str] = None, employee_id: Optional[int] = None, customer_name: Optional[str] = None,
+                 discount_percent: int = 0, material_deduction: float = 0.0,
+                 shift_id: Optional[int] = None) -> Dict[str, Any]:
+        """Sell product lines (product_id, name, unit price, quantity) in one transaction.
+
+        buyer_type 'customer' or 'employee' records a product sale with its items; 'shop'
+        records one "مشتريات للمحل" expense per line. Stock is taken with a conditional
+        decrement (quantity >= requested) instead of trusting the quantity the caller saw,
+        so two terminals or a stale grid cannot sell stock twice. If any line cannot be
+        served nothing is recorded; the result says which lines failed:
+
+            {"ok": bool, "sale_id": int | None, "expense_ids": [...],
+             "lines": [{"product_id", "name", "quantity", "ok", "available"}, ...]}
+
+        "available" is the stock left when a line failed (None if the product is gone).
+        """
+        if date is None:
+            date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        reason = {"customer": "sale", "employee": "employee", "shop": "shop_use"}[buyer_type]
+        total = sum(price * qty for _pid, _name, price, qty in lines)
+        results = []
+        sale_id = None
+        expense_ids = []
+        with self.connect() as conn:
+            date, shift_id = self._live_shift(conn, date, shift_id)
+            c = conn.cursor()
+            if buyer_type != "shop":
+                c.execute("""
+                INSERT INTO sales(date, employee_id, customer_name, is_shop, total, discount_percent, type, buyer_type, material_deduction, shift_id)
+                VALUES (?, ?, ?, 0, ?, ?, 'product', ?, ?, ?)
+                """, (date, employee_id, customer_name, total, discount_percent, buyer_type, material_deduction, shift_id))
+                sale_id = c.lastrowid
+            for pid, name, price, qty in lines:
+                if buyer_type == "shop":
+                    c.execute("""
+                    INSERT INTO expenses(date, category, amount, note, shift_id)
+                    VALUES (?, 'مشتريات للمحل', ?, ?, ?)
+                    """, (date, price * qty, name, shift_id))
+                    ref_id = c.lastrowid
+                    expense_ids.append(ref_id)
+                else:
+                    c.execute("""
+                    INSERT INTO sale_items(sale_id, item_name, unit_price, quantity, product_id, service_id)
+                    VALUES (?, ?, ?, ?, ?, NULL)
+                    """, (sale_id, name, price, qty, pid))
+                    ref_id = sale_id
+                line = {"product_id": pid, "name": name, "quantity": qty, "ok": True, "available": None}
+                if pid:
+                    # Only this product's row is touched; a concurrent checkout of the same product
+                    # either committed first (and the condition sees its decrement) or waits for us
+                    c.execute("UPDATE products SET quantity = quantity - ? WHERE id = ? AND quantity >= ?", (qty, pid, qty))
+                    if c.rowcount == 1:
+                        c.execute("""
+                        INSERT INTO stock_movements(product_id, date, delta, reason, ref_id, unit_cost)
+                        SELECT id, ?, ?, ?, ?, COALESCE(purchase_price, price) FROM products WHERE id = ?
+                        """, (now, -qty, reason, ref_id, pid))
+                    else:
+                        c.execute("SELECT quantity FROM products WHERE id = ?", (pid,))
+                        row = c.fetchone()
+                        line.update(ok=False, available=row[0] if row else None)
+                results.append(line)
+            ok = all(r["ok"] for r in results)
+            if not ok:
+                conn.rollback()
+                return {"ok": False, "sale_id": None, "expense_ids": [], "lines": results}
             conn.commit()
+        if sale_id is not None:
+            self._emit("sale_created", {
+                "sale_id": sale_id, "shift_id": shift_id, "date": date, "employee_id": employee_id,
+                "total": total, "discount_percent": discount_percent, "material_deduction": material_deduction,
+                "type": "product", "buyer_type": buyer_type,
+            })
+        for expense_id, (_pid, _name, price, qty) in zip(expense_ids, lines):
+            self._emit("expense_added", {"expense_id": expense_id, "shift_id": shift_id, "date": date,
+                                         "category": "مشتريات للمحل", "amount": price * qty})
+        for line in results:
+            if line["product_id"]:
+                self._emit("stock_changed", {"product_id": line["product_id"], "date": now, "reason": reason,
+                                             "delta": -line["quantity"]})
+        return {"ok": True, "sale_id": sale_id, "expense_ids": expense_ids, "lines": results}
+
+    def list_sale_items(self, sale_id: int) -> List[Tuple[int, int, str, float, int, Optional[int], Optional[int]]]:
+        with self.connect() as conn:
+            c = conn.cursor()
+            c.execute("""
+            SELECT id, sale_id, item_name, unit_price, quantity, product_id, service_id
+            FROM sale_items WHERE sale_id = ?
+            """, (sale_id,))
+            return c.fetchall()
 
-    def list_sale_items(self, sale_id: int) -> List[Tuple[int, int, str, float, int]]:
+    def list_product_sales(self, product_id: int, start_date: str, end_date: str) -> List[Tuple[str, str, float, int]]:
+        """Rows of (date, buyer_type, unit_price, quantity) for one product; an indexed join on product_id."""
         with self.connect() as conn:
             c = conn.cursor()
-            c.execute("SELECT id, sale_id, item_name, unit_price, quantity FROM sale_items WHERE sale_id = ?", (sale_id,))
+            c.execute("""
+            SELECT s.date, s.buyer_type, si.unit_price, si.quantity
+            FROM sale_items si
+            JOIN sales s ON s.id = si.sale_id
+            WHERE si.product_id = ? AND s.date BETWEEN ? AND ?
+            ORDER BY s.date ASC
+            """, (product_id, start_date, end_date))
             return c.fetchall()
 
     def list_sales_by_employee_on_date(self, employee_id: int, date_str: str) -> List[Dict[str, Any]]:
@@ -373,17 +1106,22 @@ class Database:
             ]
 
     # Expenses
-    def add_expense(self, category: str, amount: float, note: Optional[str] = None, date: Optional[str] = None, shift_id: Optional[int] = None):
+    def add_expense(self, category: str, amount: float, note: Optional[str] = None, date: Optional[str] = None,
+                    shift_id: Optional[int] = None):
         if date is None:
             date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        date = self._normalize_date_for_shift(date, shift_id)
         with self.connect() as conn:
+            date, shift_id = self._live_shift(conn, date, shift_id)
             c = conn.cursor()
             c.execute("""
             INSERT INTO expenses(date, category, amount, note, shift_id)
             VALUES (?, ?, ?, ?, ?)
             """, (date, category, amount, note, shift_id))
+            expense_id = c.lastrowid
             conn.commit()
+        self._emit("expense_added", {"expense_id": expense_id, "shift_id": shift_id, "date": date,
+                                     "category": category, "amount": amount})
+        return expense_id
 
     # Shift helpers
     def get_active_shift(self) -> Optional[Tuple[int, int, str, str, Optional[str], int]]:
@@ -412,7 +1150,8 @@ class Database:
             """, (next_num, cashier_name, now))
             sid = c.lastrowid
             conn.commit()
-            return sid
+        self._emit("shift_opened", {"shift_id": sid, "shift_number": next_num, "cashier_name": cashier_name, "opened_at": now})
+        return sid
 
     def close_shift(self, shift_id: int) -> None:
         closed = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -422,59 +1161,58 @@ class Database:
             UPDATE shifts SET closed_at = ?, active = 0 WHERE id = ?
             """, (closed, shift_id))
             conn.commit()
+        self._emit("shift_closed", {"shift_id": shift_id, "closed_at": closed})
+
+    def shift_totals(self, shift_id: int) -> Dict[str, Any]:
+        """Running totals of a shift; a single primary-key read."""
+        with self.connect() as conn:
+            c = conn.cursor()
+            c.execute("""
+            SELECT sales_total, discount_total, material_total, invoice_count, expense_total
+            FROM shifts WHERE id = ?
+            """, (shift_id,))
+            row = c.fetchone()
+        if not row:
+            return {}
+        sales_total, discount_total, material_total, invoice_count, expense_total = row
+        return {
+            "total_sales": float(sales_total or 0) - float(discount_total or 0),
+            "invoice_count": int(invoice_count or 0),
+            "customer_discounts": float(discount_total or 0),
+            "material_deductions": float(material_total or 0),
+            "total_expenses": float(expense_total or 0),
+        }
 
     def shift_summary(self, shift_id: int) -> Dict[str, Any]:
         with self.connect() as conn:
             c = conn.cursor()
             c.execute("SELECT shift_number, cashier_name, opened_at, closed_at FROM shifts WHERE id = ?", (shift_id,))
             sh = c.fetchone()
-            if not sh:
-                return {}
-            shift_number, cashier_name, opened_at, closed_at = sh
-            # Treat shift as the day of opened_at regardless of midnight crossover
-            shift_day = opened_at[:10]
-
-            # Sales totals (visible discount effect and counts)
-            c.execute("""
-            SELECT COALESCE(SUM(total), 0), COALESCE(SUM(total * (discount_percent/100.0)), 0),
-                   COALESCE(SUM(material_deduction), 0), COUNT(*)
-            FROM sales
-            WHERE substr(date,1,10) = ?
-            """, (shift_day,))
-            sum_total, sum_disc_amt, sum_mat_ded, inv_count = c.fetchone()
-            total_after_discount = float(sum_total or 0) - float(sum_disc_amt or 0)
-
-            # Expenses totals for the same day
-            c.execute("""
-            SELECT COALESCE(SUM(amount), 0)
-            FROM expenses
-            WHERE substr(date,1,10) = ?
-            """, (shift_day,))
-            exp_total = c.fetchone()[0] or 0
-
-            # Duration
-            try:
-                dt_open = datetime.strptime(opened_at, "%Y-%m-%d %H:%M:%S")
-                dt_close = datetime.strptime(closed_at or datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "%Y-%m-%d %H:%M:%S")
-                delta = dt_close - dt_open
-                hours = delta.seconds // 3600
-                minutes = (delta.seconds % 3600) // 60
-                duration = f"{hours:02d}:{minutes:02d}"
-            except Exception:
-                duration = ""
+        if not sh:
+            return {}
+        shift_number, cashier_name, opened_at, closed_at = sh
 
-            return {
-                "shift_number": shift_number,
-                "cashier_name": cashier_name,
-                "opened_at": opened_at,
-                "closed_at": closed_at,
-                "duration": duration,
-                "total_sales": float(total_after_discount or 0),
-                "invoice_count": int(inv_count or 0),
-                "customer_discounts": float(sum_disc_amt or 0),
-                "material_deductions": float(sum_mat_ded or 0),
-                "total_expenses": float(exp_total or 0),
-            }
+        # Duration
+        try:
+            dt_open = datetime.strptime(opened_at, "%Y-%m-%d %H:%M:%S")
+            dt_close = datetime.strptime(closed_at or datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "%Y-%m-%d %H:%M:%S")
+            delta = dt_close - dt_open
+            hours = delta.seconds // 3600
+            minutes = (delta.seconds % 3600) // 60
+            duration = f"{hours:02d}:{minutes:02d}"
+        except Exception:
+            duration = ""
+
+        summary = {
+            "shift_number": shift_number,
+            "cashier_name": cashier_name,
+            "opened_at": opened_at,
+            "closed_at": closed_at,
+            "duration": duration,
+        }
+        # Sales/expense totals are kept on the shift row by triggers (keyed by shift_id)
+        summary.update(self.shift_totals(shift_id))
+        return summary
 
     def list_expenses(self) -> List[Tuple[int, str, str, float, Optional[str]]]:
         with self.connect() as conn:
@@ -512,6 +1250,28 @@ class Database:
             conn.commit()
             return inv_id
 
+    def receive_delivery(self, supplier_id: int, lines: List[Tuple[int, int, float]], paid_amount: float = 0.0) -> int:
+        """Supplier invoice for delivered goods: lines are (product_id, quantity, unit_cost).
+
+        The invoice, the stock increases and their ledger rows are one transaction; the
+        delivered unit cost becomes the product's purchase price.
+        """
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        total = sum(qty * cost for _pid, qty, cost in lines)
+        with self.connect() as conn:
+            c = conn.cursor()
+            c.execute("""
+            INSERT INTO supplier_invoices(supplier_id, date, total_amount, paid_amount)
+            VALUES (?, ?, ?, ?)
+            """, (supplier_id, now, total, paid_amount))
+            inv_id = c.lastrowid
+            for pid, qty, cost in lines:
+                c.execute("UPDATE products SET purchase_price = ? WHERE id = ?", (cost, pid))
+                self._move_stock(c, pid, qty, "delivery", inv_id, now)
+            conn.commit()
+        self._emit("stock_changed", {"date": now, "reason": "delivery", "invoice_id": inv_id})
+        return inv_id
+
     def add_supplier_payment(self, supplier_id: int, amount: float, note: Optional[str] = None, date: Optional[str] = None) -> int:
         if date is None:
             date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -527,8 +1287,11 @@ class Database:
             INSERT INTO expenses(date, category, amount, note, shift_id)
             VALUES (?, ?, ?, ?, NULL)
             """, (date, "دفعات الموردين", amount, f"مورد: {self.get_supplier_name(supplier_id)}" if supplier_id else note))
+            expense_id = c.lastrowid
             conn.commit()
-            return pay_id
+        self._emit("expense_added", {"expense_id": expense_id, "shift_id": None, "date": date,
+                                     "category": "دفعات الموردين", "amount": amount})
+        return pay_id
 
     def get_supplier_name(self, supplier_id: int) -> Optional[str]:
         with self.connect() as conn:
@@ -568,44 +1331,39 @@ class Database:
             c = conn.cursor()
             c.execute("DELETE FROM expenses WHERE id = ?", (expense_id,))
             conn.commit()
+        self._emit("expenses_deleted", {"expense_id": expense_id})
 
     def delete_all_expenses(self):
         with self.connect() as conn:
             c = conn.cursor()
             c.execute("DELETE FROM expenses")
             conn.commit()
+        self._emit("expenses_deleted", {})
 
     # Attendance
-    def check_in(self, employee_id: int):
+    def check_in(self, employee_id: int) -> int:
         now_time = datetime.now().strftime("%H:%M:%S")
         # Attach to active shift start day if present
         sh = self.get_active_shift()
         if sh:
             shift_id = sh[0]
             opened_at = sh[3]  # "YYYY-MM-DD HH:MM:SS"
-            shift_day = opened_at[:10]
-            date_val = f"{shift_day}"
+            date_val = opened_at[:10]
         else:
             shift_id = None
             date_val = datetime.now().strftime("%Y-%m-%d")
         with self.connect() as conn:
             c = conn.cursor()
             c.execute("""
-            INSERT INTO attendance(employee_id, date, check_in, manual, note)
-            VALUES (?, ?, ?, 0, NULL)
-            """, (employee_id, date_val, now_time))
-            # Optionally store shift_id if column exists
-            try:
-                c.execute("ALTER TABLE attendance ADD COLUMN shift_id INTEGER")
-            except Exception:
-                pass
-            try:
-                c.execute("UPDATE attendance SET shift_id = ? WHERE id = (SELECT MAX(id) FROM attendance)")
-            except Exception:
-                pass
+            INSERT INTO attendance(employee_id, date, check_in, manual, note, shift_id)
+            VALUES (?, ?, ?, 0, NULL, ?)
+            """, (employee_id, date_val, now_time, shift_id))
             conn.commit()
+            record_id = c.lastrowid
+        self._emit("attendance_changed", {"record_id": record_id, "employee_id": employee_id, "date": date_val})
+        return record_id
 
-    def check_out(self, employee_id: int):
+    def check_out(self, employee_id: int) -> bool:
         # Count as same day as check-in even if after midnight:
         # We update the latest open record for this employee (no check_out yet)
         now_time = datetime.now().strftime("%H:%M:%S")
@@ -614,16 +1372,32 @@ class Database:
             c.execute("""
             UPDATE attendance
             SET check_out = ?
-            WHERE employee_id = ? AND check_out IS NULL
-            ORDER BY date DESC, id DESC
+            WHERE id = (
+                SELECT id FROM attendance
+                WHERE employee_id = ? AND check_out IS NULL
+                ORDER BY date DESC, id DESC
+                LIMIT 1
+            )
             """, (now_time, employee_id))
             conn.commit()
+            updated = c.rowcount > 0
+        if updated:
+            self._emit("attendance_changed", {"employee_id": employee_id})
+        return updated
 
     def delete_all_attendance(self):
         with self.connect() as conn:
             c = conn.cursor()
             c.execute("DELETE FROM attendance")
             conn.commit()
+        self._emit("attendance_changed", {})
+
+    def delete_attendance(self, record_id: int):
+        with self.connect() as conn:
+            c = conn.cursor()
+            c.execute("DELETE FROM attendance WHERE id = ?", (record_id,))
+            conn.commit()
+        self._emit("attendance_changed", {"record_id": record_id})
 
     # Manual attendance and editing
     def add_manual_attendance(self, employee_id: int, date: str, check_in: str, check_out: Optional[str] = None, note: Optional[str] = None):
@@ -634,6 +1408,7 @@ class Database:
             VALUES (?, ?, ?, ?, 1, ?)
             """, (employee_id, date, check_in, check_out, note))
             conn.commit()
+        self._emit("attendance_changed", {"employee_id": employee_id, "date": date})
 
     def edit_attendance(self, record_id: int, check_in: Optional[str] = None, check_out: Optional[str] = None, note: Optional[str] = None, manual: Optional[int] = None):
         with self.connect() as conn:
@@ -657,6 +1432,7 @@ class Database:
             params.append(record_id)
             c.execute(f"UPDATE attendance SET {', '.join(fields)} WHERE id = ?", params)
             conn.commit()
+        self._emit("attendance_changed", {"record_id": record_id})
 
     def add_loan(self, employee_id: int, amount: float, note: Optional[str] = None):
         now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -667,6 +1443,7 @@ class Database:
             VALUES (?, ?, ?, ?)
             """, (employee_id, now, amount, note))
             conn.commit()
+        self._emit("loan_added", {"employee_id": employee_id, "date": now, "amount": amount})
 
     def list_loans_by_employee_on_date(self, employee_id: int, date_str: str) -> List[Tuple[int, str, float, Optional[str]]]:
         with self.connect() as conn:
@@ -689,16 +1466,38 @@ class Database:
             """, (employee_id, str(year), f"{month:02d}"))
             return c.fetchall()
 
-    def list_attendance_for_month(self, year: int, month: int) -> List[Dict[str, Any]]:
+    def list_attendance(self, date_from: Optional[str] = None, date_to: Optional[str] = None,
+                        employee_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Attendance records with date_from <= date < date_to, newest first.
+
+        Worked time is computed in SQL: check_out - check_in in seconds, plus a day when the
+        check-out is after midnight; "hours" is that time as HH:MM ("" while still checked in).
+        """
+        where = []
+        params: List[Any] = []
+        if date_from:
+            where.append("a.date >= ?")
+            params.append(date_from)
+        if date_to:
+            where.append("a.date < ?")
+            params.append(date_to)
+        if employee_id is not None:
+            where.append("a.employee_id = ?")
+            params.append(employee_id)
         with self.connect() as conn:
             c = conn.cursor()
-            c.execute("""
-            SELECT a.id, a.date, e.name, a.check_in, a.check_out, a.employee_id, a.manual, a.note
-            FROM attendance a
-            JOIN employees e ON e.id = a.employee_id
-            WHERE substr(a.date,1,4) = ? AND substr(a.date,6,2) = ?
-            ORDER BY a.date DESC, a.id DESC
-            """, (str(year), f"{month:02d}"))
+            c.execute(f"""
+            SELECT id, date, employee, check_in, check_out, employee_id, manual, note,
+                   CASE WHEN secs IS NULL THEN '' ELSE printf('%02d:%02d', secs / 3600, secs % 3600 / 60) END
+            FROM (
+                SELECT a.id, a.date, e.name AS employee, a.check_in, a.check_out, a.employee_id, a.manual, a.note,
+                       (CAST(round((julianday(a.check_out) - julianday(a.check_in)) * 86400) AS INTEGER) + 86400) % 86400 AS secs
+                FROM attendance a
+                JOIN employees e ON e.id = a.employee_id
+                {"WHERE " + " AND ".join(where) if where else ""}
+            )
+            ORDER BY date DESC, id DESC
+            """, params)
             rows = c.fetchall()
             return [{
                 "id": r[0],
@@ -708,29 +1507,29 @@ class Database:
                 "check_out": r[4],
                 "employee_id": r[5],
                 "manual": int(r[6] or 0),
-                "note": r[7] or None
+                "note": r[7] or None,
+                "hours": r[8],
             } for r in rows]
 
+    def list_attendance_for_month(self, year: int, month: int) -> List[Dict[str, Any]]:
+        return self.list_attendance(*month_range(year, month))
+
     # Account clearing helpers
     def delete_sales_and_items_by_employee(self, employee_id: int):
         """Clear only employee deductions (sales where buyer_type='employee'), not service revenue."""
         with self.connect() as conn:
             c = conn.cursor()
-            # Find all sales ids for this employee where the employee is the buyer (deductions)
-            c.execute("SELECT id FROM sales WHERE employee_id = ? AND buyer_type = 'employee'", (employee_id,))
-            sale_ids = [row[0] for row in c.fetchall()]
-            if sale_ids:
-                # Delete sale_items tied to those sales
-                c.executemany("DELETE FROM sale_items WHERE sale_id = ?", [(sid,) for sid in sale_ids])
-                # Delete those sales
-                c.executemany("DELETE FROM sales WHERE id = ?", [(sid,) for sid in sale_ids])
+            # sale_items rows go with their sales (ON DELETE CASCADE)
+            c.execute("DELETE FROM sales WHERE employee_id = ? AND buyer_type = 'employee'", (employee_id,))
             conn.commit()
+        self._emit("sales_deleted", {"employee_id": employee_id})
 
     def delete_loans_by_employee(self, employee_id: int):
         with self.connect() as conn:
             c = conn.cursor()
             c.execute("DELETE FROM loans WHERE employee_id = ?", (employee_id,))
             conn.commit()
+        self._emit("loans_deleted", {"employee_id": employee_id})
 
     # Admin report helpers
     def sum_services_in_month(self, year: int, month: int) -> float:
@@ -814,6 +1613,47 @@ class Database:
             val = c.fetchone()[0]
             return float(val or 0)
 
+    def sum_expenses_by_category_in_month(self, year: int, month: int) -> Dict[str, float]:
+        """{category: total} for the month in one grouped query."""
+        start, end = month_range(year, month)
+        with self.connect() as conn:
+            c = conn.cursor()
+            c.execute("""
+            SELECT category, COALESCE(SUM(amount), 0)
+            FROM expenses
+            WHERE date >= ? AND date < ?
+            GROUP BY category
+            """, (start, end))
+            return {cat: float(total or 0) for cat, total in c.fetchall()}
+
+    def sum_services_net_by_employee_in_month(self, year: int, month: int) -> List[Tuple[int, str, float]]:
+        """(employee_id, name, total) of customer services after discount and material deduction.
+
+        Each sale counts as max(0, total after discount - material deduction), as in the reports tab.
+        """
+        start, end = month_range(year, month)
+        with self.connect() as conn:
+            c = conn.cursor()
+            c.execute("""
+            SELECT e.id, e.name,
+                   COALESCE(SUM(MAX(0, s.total * (1 - s.discount_percent/100.0) - s.material_deduction)), 0)
+            FROM sales s
+            JOIN employees e ON e.id = s.employee_id
+            WHERE s.type = 'service' AND s.buyer_type = 'customer' AND s.cleared = 0
+              AND s.date >= ? AND s.date < ?
+            GROUP BY e.id
+            ORDER BY e.name
+            """, (start, end))
+            return [(eid, name, float(total or 0)) for eid, name, total in c.fetchall()]
+
+    def get_last_shift_id(self) -> Optional[int]:
+        """The active shift, or the most recently opened one."""
+        with self.connect() as conn:
+            c = conn.cursor()
+            c.execute("SELECT id FROM shifts ORDER BY active DESC, id DESC LIMIT 1")
+            row = c.fetchone()
+            return row[0] if row else None
+
     def list_shop_purchases_in_month(self, year: int, month: int):
         """Return rows of (date, item_name, unit_price, qty) for shop buyer product sales."""
         with self.connect() as conn:
@@ -830,25 +1670,76 @@ class Database:
 
     def delete_shop_data_in_month(self, year: int, month: int):
         """Delete shop buyer product sales and 'مشتريات للمحل' expenses for the month."""
+        start, end = month_range(year, month)
         with self.connect() as conn:
             c = conn.cursor()
             # Delete expenses for shop purchases
             c.execute("""
             DELETE FROM expenses
-            WHERE category = 'مشتريات للمحل' AND substr(date,1,4) = ? AND substr(date,6,2) = ?
-            """, (str(year), f"{month:02d}"))
-
-            # Find sales ids for shop buyer product sales
+            WHERE category = 'مشتريات للمحل' AND date >= ? AND date < ?
+            """, (start, end))
+            # Delete shop buyer product sales; their sale_items cascade
             c.execute("""
-            SELECT id FROM sales
-            WHERE type = 'product' AND buyer_type = 'shop'
-              AND substr(date,1,4) = ? AND substr(date,6,2) = ?
-            """, (str(year), f"{month:02d}"))
-            sale_ids = [row[0] for row in c.fetchall()]
-            if sale_ids:
-                c.executemany("DELETE FROM sale_items WHERE sale_id = ?", [(sid,) for sid in sale_ids])
-                c.executemany("DELETE FROM sales WHERE id = ?", [(sid,) for sid in sale_ids])
+            DELETE FROM sales
+            WHERE type = 'product' AND buyer_type = 'shop' AND date >= ? AND date < ?
+            """, (start, end))
             conn.commit()
+        self._emit("sales_deleted", {"year": year, "month": month})
+        self._emit("expenses_deleted", {"year": year, "month": month})
+
+    # Search
+    def search(self, query: str, kinds: Optional[Tuple[str, ...]] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """Prefix search (Arabic-normalized) over products, customers, expense notes and receipts.
+
+        kinds: any of "product", "customer", "expense", "receipt" (default: all).
+        Returns dicts with "kind", "id", "title" and kind-specific fields, best matches first.
+        """
+        match = _fts_query(query)
+        if not match:
+            return []
+        kinds = kinds or ("product", "customer", "expense", "receipt")
+        results: List[Dict[str, Any]] = []
+        with self.connect() as conn:
+            c = conn.cursor()
+            if "product" in kinds:
+                c.execute("""
+                SELECT p.id, p.name, p.price, p.quantity
+                FROM search_index f JOIN products p ON p.id = f.rowid / 4
+                WHERE search_index MATCH ? AND f.rowid % 4 = 0
+                ORDER BY f.rank LIMIT ?
+                """, (match, limit))
+                results += [{"kind": "product", "id": r[0], "title": r[1], "price": r[2], "quantity": r[3]}
+                            for r in c.fetchall()]
+            if "customer" in kinds:
+                c.execute("""
+                SELECT s.customer_name, COUNT(*), MAX(s.date), MAX(s.id)
+                FROM search_index f JOIN sales s ON s.id = f.rowid / 4
+                WHERE search_index MATCH ? AND f.rowid % 4 = 2
+                  AND s.customer_name IS NOT NULL AND s.customer_name != 'غير محدد'
+                GROUP BY s.customer_name
+                ORDER BY MAX(s.date) DESC LIMIT ?
+                """, ("title : (" + match + ")", limit))
+                results += [{"kind": "customer", "id": r[3], "title": r[0], "visits": r[1], "last_visit": r[2]}
+                            for r in c.fetchall()]
+            if "expense" in kinds:
+                c.execute("""
+                SELECT e.id, e.date, e.category, e.amount, e.note
+                FROM search_index f JOIN expenses e ON e.id = f.rowid / 4
+                WHERE search_index MATCH ? AND f.rowid % 4 = 1
+                ORDER BY f.rank LIMIT ?
+                """, (match, limit))
+                results += [{"kind": "expense", "id": r[0], "title": r[4] or r[2], "date": r[1], "category": r[2],
+                             "amount": r[3]} for r in c.fetchall()]
+            if "receipt" in kinds:
+                c.execute("""
+                SELECT s.id, s.date, s.customer_name, s.total, s.discount_percent, s.type
+                FROM search_index f JOIN sales s ON s.id = f.rowid / 4
+                WHERE search_index MATCH ? AND f.rowid % 4 = 2
+                ORDER BY s.date DESC LIMIT ?
+                """, (match, limit))
+                results += [{"kind": "receipt", "id": r[0], "title": r[2] or "", "date": r[1],
+                             "total": float(r[3]) * (1 - (r[4] or 0) / 100.0), "type": r[5]} for r in c.fetchall()]
+        return results
 
     # Dashboard summaries
     def inventory_total_value(self) -> float:
@@ -862,6 +1753,106 @@ class Database:
             val = c.fetchone()[0]
             return float(val or 0)
 
+    # Stock ledger queries: snapshot + movements after it
+    def _stock_at(self, c, end: str, product_id: Optional[int] = None) -> List[Tuple[int, int, Optional[float]]]:
+        """(product_id, quantity, unit_cost) from movements dated before `end`, non-zero quantities only.
+
+        Starts from the latest snapshot taken on or before `end`; unit_cost is the one of the
+        last movement (or the snapshot's when the product did not move since).
+        """
+        c.execute("SELECT MAX(day) FROM stock_snapshots WHERE day <= ?", (end,))
+        snap = c.fetchone()[0] or ""
+        where, params = "", [snap, snap, end]
+        if product_id is not None:
+            where = " AND product_id = ?"
+            params = [snap, product_id, snap, end, product_id]
+        # Bare unit_cost with MAX(seq) takes the value from the newest row of each product
+        c.execute(f"""
+        SELECT product_id, SUM(quantity), unit_cost, MAX(seq) FROM (
+            SELECT product_id, quantity, unit_cost, 0 AS seq FROM stock_snapshots WHERE day = ?{where}
+            UNION ALL
+            SELECT product_id, delta, unit_cost, id FROM stock_movements WHERE date >= ? AND date < ?{where}
+        )
+        GROUP BY product_id
+        HAVING SUM(quantity) != 0
+        """, params)
+        return [(pid, int(qty), cost) for pid, qty, cost, _seq in c.fetchall()]
+
+    def stock_at(self, day: str) -> List[Dict[str, Any]]:
+        """Stock per product at the end of `day` (YYYY-MM-DD); deleted products keep their id only."""
+        end = (datetime.strptime(day[:10], "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+        with self.connect() as conn:
+            c = conn.cursor()
+            rows = self._stock_at(c, end)
+            names = dict(c.execute("SELECT id, name FROM products").fetchall())
+        out = [{
+            "product_id": pid,
+            "name": names.get(pid, f"#{pid}"),
+            "quantity": qty,
+            "unit_cost": float(cost or 0),
+            "value": qty * float(cost or 0),
+        } for pid, qty, cost in rows]
+        return sorted(out, key=lambda r: r["name"])
+
+    def inventory_value_at(self, day: str) -> float:
+        """Inventory value at the end of `day`, at the cost recorded with each product's last movement."""
+        return float(sum(r["value"] for r in self.stock_at(day)))
+
+    def product_movements(self, product_id: int, date_from: Optional[str] = None,
+                          date_to: Optional[str] = None) -> Tuple[int, List[Dict[str, Any]]]:
+        """(quantity before date_from, movements in [date_from, date_to) with the running balance)."""
+        date_from = date_from or ""
+        with self.connect() as conn:
+            c = conn.cursor()
+            opening = sum(qty for _pid, qty, _cost in self._stock_at(c, date_from, product_id)) if date_from else 0
+            sql = "SELECT id, date, delta, reason, ref_id, unit_cost FROM stock_movements WHERE product_id = ? AND date >= ?"
+            params: List[Any] = [product_id, date_from]
+            if date_to:
+                sql += " AND date < ?"
+                params.append(date_to)
+            c.execute(sql + " ORDER BY id", params)
+            rows = c.fetchall()
+        out, balance = [], opening
+        for mid, date, delta, reason, ref_id, cost in rows:
+            balance += delta
+            out.append({"id": mid, "date": date, "delta": delta, "reason": reason, "ref_id": ref_id,
+                        "unit_cost": cost, "balance": balance})
+        return opening, out
+
+    def take_stock_snapshots(self, today: Optional[str] = None) -> int:
+        """Snapshot the first day of every month since the last snapshot, up to the current month.
+
+        Each snapshot is built from the previous one plus that month's movements, so the
+        ledger is never replayed from the start. Returns the number of snapshots written.
+        """
+        today = (today or datetime.now().strftime("%Y-%m-%d"))[:10]
+        current = today[:7] + "-01"
+        with self.connect() as conn:
+            c = conn.cursor()
+            c.execute("SELECT MAX(day) FROM stock_snapshots")
+            last = c.fetchone()[0]
+            if last is None:
+                c.execute("SELECT MIN(date) FROM stock_movements")
+                first = c.fetchone()[0]
+                if first is None:
+                    return 0
+                last = first[:7] + "-01"
+            days = []
+            year, month = int(last[:4]), int(last[5:7])
+            while True:
+                year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+                day = f"{year:04d}-{month:02d}-01"
+                if day > current:
+                    break
+                days.append(day)
+            for day in days:
+                c.executemany(
+                    "INSERT OR REPLACE INTO stock_snapshots(day, product_id, quantity, unit_cost) VALUES (?, ?, ?, ?)",
+                    [(day, pid, qty, cost) for pid, qty, cost in self._stock_at(c, day)]
+                )
+            conn.commit()
+        return len(days)
+
     def total_supplier_pending_balance(self) -> float:
         """Total remaining balances across all suppliers (sum of per-supplier remaining)."""
         total_remaining = 0.0
@@ -0,0 +1,168 @@
+"""
+Raw data export (CSV or JSONL) for the accountant.
+
+Rows are streamed from the cursor with fetchmany() and written as they arrive,
+so memory stays constant however long the date range is. Sales are exported
+one row per item (sales joined to sale_items; a sale without items gives one
+row with empty item columns).
+
+With per_month=True the range is split into calendar months and each month is
+written to its own file by a pool of worker processes. Workers given a
+historical(db) (see archive.py) read through the archive views too.
+"""
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from mina_al_arabi.db import Database, month_range
+from mina_al_arabi.archive import ArchiveDatabase, historical
+
+
+FETCH_SIZE = 1000
+FILE_FORMATS = ("csv", "jsonl")
+
+# kind -> (columns, SELECT with [start, end) date parameters)
+EXPORTS: Dict[str, Tuple[List[str], str]] = {
+    "sales": (
+        ["sale_id", "date", "type", "buyer_type", "employee", "customer_name", "total", "discount_percent",
+         "material_deduction", "shift_id", "item_name", "unit_price", "quantity", "product_id", "service_id"],
+        """
+        SELECT s.id, s.date, s.type, s.buyer_type, e.name, s.customer_name, s.total, s.discount_percent,
+               s.material_deduction, s.shift_id, si.item_name, si.unit_price, si.quantity, si.product_id, si.service_id
+        FROM sales s
+        LEFT JOIN employees e ON e.id = s.employee_id
+        LEFT JOIN sale_items si ON si.sale_id = s.id
+        WHERE s.date >= ? AND s.date < ?
+        ORDER BY s.date, s.id, si.id
+        """,
+    ),
+    "expenses": (
+        ["id", "date", "category", "amount", "note", "shift_id"],
+        """
+        SELECT id, date, category, amount, note, shift_id
+        FROM expenses
+        WHERE date >= ? AND date < ?
+        ORDER BY date, id
+        """,
+    ),
+    "attendance": (
+        ["id", "date", "employee", "check_in", "check_out", "manual", "note", "shift_id"],
+        """
+        SELECT a.id, a.date, e.name, a.check_in, a.check_out, a.manual, a.note, a.shift_id
+        FROM attendance a
+        LEFT JOIN employees e ON e.id = a.employee_id
+        WHERE a.date >= ? AND a.date < ?
+        ORDER BY a.date, a.id
+        """,
+    ),
+}
+
+
+def iter_rows(db: Database, kind: str, start: str, end: str) -> Iterator[tuple]:
+    """Yield rows of `kind` with start <= date < end, FETCH_SIZE at a time."""
+    _columns, sql = EXPORTS[kind]
+    with db.connect() as conn:
+        cur = conn.execute(sql, (start, end))
+        while True:
+            rows = cur.fetchmany(FETCH_SIZE)
+            if not rows:
+                return
+            yield from rows
+
+
+def write_rows(path: str, columns: List[str], rows: Iterator[tuple], file_format: str = "csv") -> int:
+    count = 0
+    if file_format == "jsonl":
+        with open(path, "w", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False))
+                f.write("\n")
+                count += 1
+        return count
+    # utf-8-sig so Excel shows the Arabic text correctly
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def export(db: Database, kind: str, start: str, end: str, path: str, file_format: str = "csv") -> int:
+    """Write one file; returns the number of rows written."""
+    if kind not in EXPORTS:
+        raise ValueError(f"نوع تصدير غير معروف: {kind}")
+    columns, _sql = EXPORTS[kind]
+    return write_rows(path, columns, iter_rows(db, kind, start, end), file_format)
+
+
+def months_between(start: str, end: str) -> List[Tuple[str, str, str]]:
+    """Split [start, end) into (label YYYY-MM, month start, month end) pieces clipped to the range."""
+    d = datetime.strptime(start[:10], "%Y-%m-%d").date().replace(day=1)
+    out = []
+    while d.isoformat() < end:
+        m_start, m_end = month_range(d.year, d.month)
+        out.append((d.strftime("%Y-%m"), max(m_start, start), min(m_end, end)))
+        d = datetime.strptime(m_end, "%Y-%m-%d").date()
+    return out
+
+
+def first_date(db: Database, kind: str) -> Optional[str]:
+    # Every export kind is named after its table
+    with db.connect() as conn:
+        return conn.execute(f"SELECT MIN(date) FROM {kind}").fetchone()[0]
+
+
+def _export_month(db_path: str, archived: bool, kind: str, start: str, end: str, path: str,
+                  file_format: str) -> Tuple[str, int]:
+    # Runs in a worker process; each worker opens its own connection
+    db = Database(db_path)
+    return path, export(historical(db) if archived else db, kind, start, end, path, file_format)
+
+
+def export_per_month(db: Database, kind: str, start: str, end: str, out_dir: str, file_format: str = "csv",
+                     workers: Optional[int] = None) -> Dict[str, int]:
+    """One file per month (<kind>_YYYY-MM.<ext>) written in parallel; returns {path: rows}."""
+    if kind not in EXPORTS:
+        raise ValueError(f"نوع تصدير غير معروف: {kind}")
+    os.makedirs(out_dir, exist_ok=True)
+    first = first_date(db, kind)
+    if first is None:
+        return {}
+    start = max(start, first[:10])
+    jobs = [
+        (db.path, isinstance(db, ArchiveDatabase), kind, m_start, m_end,
+         os.path.join(out_dir, f"{kind}_{label}.{file_format}"), file_format)
+        for label, m_start, m_end in months_between(start, end)
+    ]
+    if not jobs:
+        return {}
+    workers = workers or min(len(jobs), os.cpu_count() or 1)
+    if workers <= 1:
+        return dict(_export_month(*job) for job in jobs)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_export_month, *job) for job in jobs]
+        return dict(f.result() for f in futures)
+
+
+def date_range(date_from: Optional[str], date_to: Optional[str]) -> Tuple[str, str]:
+    """[start, end) from inclusive YYYY-MM-DD bounds; defaults to everything up to today."""
+    start = date_from or "0000-01-01"
+    last = datetime.strptime(date_to, "%Y-%m-%d").date() if date_to else date.today()
+    return start, (last + timedelta(days=1)).isoformat()
+
+
+def timed_export(db: Database, kind: str, date_from: Optional[str], date_to: Optional[str], out: str,
+                 file_format: str = "csv", per_month: bool = False, workers: Optional[int] = None) -> dict:
+    start, end = date_range(date_from, date_to)
+    t = time.perf_counter()
+    if per_month:
+        files = export_per_month(db, kind, start, end, out, file_format, workers)
+    else:
+        files = {out: export(db, kind, start, end, out, file_format)}
+    return {"files": files, "rows": sum(files.values()), "seconds": round(time.perf_counter() - t, 3)}
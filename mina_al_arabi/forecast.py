@@ -0,0 +1,244 @@
+"""
+Staffing forecast: expected customers per hour for each weekday and the number
+of barbers to schedule.
+
+Inputs are kept per business day (the shift day, as sales and attendance are
+stamped) in two tables:
+
+    forecast_days    one row per day the shop was open (a shift was opened, a
+                     service was sold or a barber checked in)
+    forecast_counts  per (day, clock hour): customers served (customer service
+                     invoices) and barber hours present (attendance, pro rata
+                     for partial hours; check-outs after midnight fold back
+                     onto the business day)
+
+Each refresh is recorded in forecast_log with the last business day it covered.
+refresh() only processes days after that watermark, closed days included, and
+re-does the last REFRESH_OVERLAP_DAYS to pick up late attendance edits; the app
+runs it once a day (main.py, or server.py in server mode), so days the shop
+was closed do not keep it due. forecast() then
+takes the last WINDOW_WEEKS weeks as a (days x 24) matrix and computes per
+weekday the mean and the PEAK_PERCENTILE of customers per hour. Barbers are
+recommended for the peak value so customers do not wait at busy hours, and
+nobody is recommended where the peak is zero, which is where idle hours are
+cut.
+"""
+import math
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from mina_al_arabi.db import Database
+from mina_al_arabi.archive import historical
+from mina_al_arabi.reporting import make_report
+
+
+WINDOW_WEEKS = 8
+REFRESH_OVERLAP_DAYS = 2
+PEAK_PERCENTILE = 75
+SERVICE_MINUTES = 30  # average chair time per customer
+TARGET_UTILIZATION = 0.8  # share of a barber's hour spent serving at the recommended staffing
+
+WEEKDAYS = ["الأحد", "الاثنين", "الثلاثاء", "الأربعاء", "الخميس", "الجمعة", "السبت"]
+
+
+def _weekday(day: str) -> Optional[int]:
+    """0 = Sunday, as strftime('%w'); None for a malformed (manually typed) date."""
+    try:
+        return date.fromisoformat(day).isoweekday() % 7
+    except (TypeError, ValueError):
+        return None
+
+
+def watermark(db: Database) -> Optional[str]:
+    """Last business day a refresh covered, whether or not the shop was open."""
+    with db.connect() as conn:
+        c = conn.cursor()
+        # Databases refreshed before forecast_log existed only have forecast_days
+        c.execute("SELECT COALESCE((SELECT MAX(through_day) FROM forecast_log), (SELECT MAX(day) FROM forecast_days))")
+        return c.fetchone()[0]
+
+
+def is_due(db: Database, today: Optional[date] = None) -> bool:
+    today = today or date.today()
+    last = watermark(db)
+    return last is None or last < (today - timedelta(days=1)).isoformat()
+
+
+# Inputs
+def _first_day(c) -> Optional[str]:
+    c.execute("""
+    SELECT MIN(d) FROM (
+        SELECT MIN(substr(date, 1, 10)) AS d FROM sales
+        UNION ALL SELECT MIN(date) FROM attendance
+        UNION ALL SELECT MIN(substr(opened_at, 1, 10)) FROM shifts
+    )
+    """)
+    return c.fetchone()[0]
+
+
+def _customer_counts(c, start: str, end: str) -> List[Tuple[str, int, int]]:
+    c.execute("""
+    SELECT substr(date, 1, 10), CAST(substr(date, 12, 2) AS INTEGER), COUNT(*)
+    FROM sales
+    WHERE date >= ? AND date < ? AND type = 'service' AND buyer_type = 'customer'
+    GROUP BY 1, 2
+    """, (start, end))
+    return c.fetchall()
+
+
+def _open_days(c, start: str, end: str) -> List[str]:
+    c.execute("""
+    SELECT substr(opened_at, 1, 10) FROM shifts WHERE opened_at >= ? AND opened_at < ?
+    UNION
+    SELECT substr(date, 1, 10) FROM sales
+    WHERE date >= ? AND date < ? AND type = 'service' AND buyer_type = 'customer'
+    UNION
+    SELECT date FROM attendance WHERE date >= ? AND date < ?
+    """, (start, end, start, end, start, end))
+    return sorted(row[0] for row in c.fetchall())
+
+
+def _barber_hours(c, start: str, end: str) -> Dict[Tuple[str, int], float]:
+    """{(day, hour): barber hours} from completed attendance records."""
+    c.execute("""
+    SELECT date,
+           CAST(round((julianday(check_in) - julianday('00:00:00')) * 86400) AS INTEGER),
+           CAST(round((julianday(check_out) - julianday('00:00:00')) * 86400) AS INTEGER)
+    FROM attendance
+    WHERE date >= ? AND date < ? AND check_in IS NOT NULL AND check_out IS NOT NULL
+    """, (start, end))
+    rows = [r for r in c.fetchall() if r[1] is not None and r[2] is not None]
+    if not rows:
+        return {}
+    days = sorted({r[0] for r in rows})
+    day_index = {d: i for i, d in enumerate(days)}
+    idx = np.array([day_index[r[0]] for r in rows])
+    t_in = np.array([r[1] for r in rows], dtype=np.float64)
+    t_out = np.array([r[2] for r in rows], dtype=np.float64)
+    t_out = np.where(t_out < t_in, t_out + 86400, t_out)  # checked out after midnight
+    # Seconds of each record inside each of 48 hour slots (today and after midnight)
+    slot_start = np.arange(48, dtype=np.float64) * 3600
+    covered = np.clip(np.minimum(t_out[:, None], slot_start + 3600) - np.maximum(t_in[:, None], slot_start), 0, 3600)
+    per_day = np.zeros((len(days), 48))
+    np.add.at(per_day, idx, covered / 3600.0)
+    per_day = per_day[:, :24] + per_day[:, 24:]
+    return {(days[d], int(h)): float(per_day[d, h]) for d, h in zip(*np.nonzero(per_day))}
+
+
+def refresh(db: Database, today: Optional[date] = None) -> int:
+    """Bring the forecast tables up to yesterday; returns the number of days (re)processed."""
+    today = today or date.today()
+    end = today.isoformat()
+    through = (today - timedelta(days=1)).isoformat()
+    last = watermark(db)
+    if last is not None and last >= through:
+        return 0
+    hdb = historical(db)
+    days: List[Tuple[str, int]] = []
+    cells: Dict[Tuple[str, int], List[float]] = {}
+    with hdb.connect() as conn:
+        c = conn.cursor()
+        c.execute("SELECT 1 FROM forecast_days LIMIT 1")
+        if last and c.fetchone():
+            start = (date.fromisoformat(last) - timedelta(days=REFRESH_OVERLAP_DAYS - 1)).isoformat()
+        else:
+            start = _first_day(c)  # the whole history until an open day is recorded; None without data
+        if start:
+            days = [(d, _weekday(d)) for d in _open_days(c, start, end)]
+            days = [(d, w) for d, w in days if w is not None]
+            customers = _customer_counts(c, start, end)
+            barbers = _barber_hours(c, start, end)
+            for day, hour, n in customers:
+                if hour is not None and 0 <= hour < 24:
+                    cells[(day, hour)] = [n, 0.0]
+            for key, hours in barbers.items():
+                cells.setdefault(key, [0, 0.0])[1] = round(hours, 4)
+
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    with db.connect() as conn:
+        c = conn.cursor()
+        if start:
+            c.execute("DELETE FROM forecast_counts WHERE day >= ? AND day < ?", (start, end))
+            c.execute("DELETE FROM forecast_days WHERE day >= ? AND day < ?", (start, end))
+            c.executemany("INSERT INTO forecast_days(day, weekday, refreshed_at) VALUES (?, ?, ?)",
+                          [(d, w, now) for d, w in days])
+            c.executemany("INSERT INTO forecast_counts(day, hour, customers, barber_hours) VALUES (?, ?, ?, ?)",
+                          [(d, h, n, b) for (d, h), (n, b) in sorted(cells.items()) if d < end])
+        c.execute("INSERT INTO forecast_log(refreshed_at, start_day, through_day, days) VALUES (?, ?, ?, ?)",
+                  (now, start, through, len(days)))
+        conn.commit()
+    return len(days)
+
+
+# Forecast
+def recommended_barbers(customers_per_hour: float) -> int:
+    if customers_per_hour <= 0:
+        return 0
+    return max(1, math.ceil(customers_per_hour * SERVICE_MINUTES / 60.0 / TARGET_UTILIZATION - 1e-9))
+
+
+def forecast(db: Database, weeks: int = WINDOW_WEEKS) -> List[Dict[str, Any]]:
+    """One dict per (weekday, hour) with activity in the window, Sunday first."""
+    with db.connect() as conn:
+        c = conn.cursor()
+        c.execute("SELECT MAX(day) FROM forecast_days")
+        last = c.fetchone()[0]
+        if not last:
+            return []
+        start = (date.fromisoformat(last) - timedelta(days=weeks * 7 - 1)).isoformat()
+        c.execute("SELECT day, weekday FROM forecast_days WHERE day >= ? ORDER BY day", (start,))
+        days = c.fetchall()
+        c.execute("SELECT day, hour, customers, barber_hours FROM forecast_counts WHERE day >= ?", (start,))
+        counts = c.fetchall()
+
+    day_index = {d: i for i, (d, _w) in enumerate(days)}
+    counts = [r for r in counts if r[0] in day_index]
+    out = []
+    weekday = np.array([w for _d, w in days])
+    customers = np.zeros((len(days), 24))
+    barbers = np.zeros((len(days), 24))
+    if counts:
+        idx = np.array([day_index[r[0]] for r in counts])
+        hours = np.array([r[1] for r in counts])
+        customers[idx, hours] = [r[2] for r in counts]
+        barbers[idx, hours] = [r[3] for r in counts]
+    for w in range(7):
+        sel = weekday == w
+        if not sel.any():
+            continue
+        mean = customers[sel].mean(axis=0)
+        peak = np.percentile(customers[sel], PEAK_PERCENTILE, axis=0)
+        staffed = barbers[sel].mean(axis=0)
+        for h in np.nonzero((mean > 0) | (staffed > 0))[0]:
+            out.append(_slot(w, int(h), float(mean[h]), float(peak[h]), float(staffed[h]), int(sel.sum())))
+    return out
+
+
+def _slot(weekday: int, hour: int, mean: float, peak: float, staffed: float, days: int) -> Dict[str, Any]:
+    rec = recommended_barbers(peak)
+    return {
+        "weekday": weekday,
+        "hour": hour,
+        "days": days,
+        "customers": mean,
+        "peak": peak,
+        "staffed": staffed,
+        "recommended": rec,
+        # Positive: barber hours per week above the recommendation; negative: short at this hour
+        "difference": staffed - rec,
+    }
+
+
+def forecast_report(slots: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Report dict (see reporting.py) for forecast() slots."""
+    rows = [[WEEKDAYS[s["weekday"]], f"{s['hour']:02d}:00", round(s["customers"], 1), round(s["peak"], 1),
+             round(s["staffed"], 1), s["recommended"]] for s in slots]
+    totals = {
+        "idle_barber_hours": round(sum(max(0.0, s["difference"]) for s in slots), 1),
+        "short_barber_hours": round(sum(max(0.0, -s["difference"]) for s in slots), 1),
+    }
+    columns = ["اليوم", "الساعة", "متوسط العملاء", f"العملاء (نسبة {PEAK_PERCENTILE}%)", "الحلاقون الحاليون",
+               "الحلاقون المقترحون"]
+    return make_report("توقعات التوظيف", columns, rows, totals)
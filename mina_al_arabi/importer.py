@@ -0,0 +1,324 @@
+"""
+Bulk import of products, services, employees and historical sales (CSV or JSONL).
+
+Records are validated in a single streaming pass; valid ones are inserted with
+executemany() in large transactions, invalid ones are written to an error file
+(JSONL: line number, message, original record) and skipped.
+
+While an import runs, the search index triggers and the non-unique indexes of the
+target tables are dropped; ensure_schema() recreates them at the end and the
+search index is rebuilt once, instead of being maintained row by row.
+
+Sales use the export layout (export.py): one row per item, rows of the same sale
+share a sale_id and must be consecutive. Employees are matched by name, items are
+linked to products/services by name.
+"""
+import csv
+import json
+import os
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from mina_al_arabi.db import Database
+
+
+IMPORT_KINDS = ("products", "services", "employees", "sales")
+BATCH_SIZE = 5000  # rows per executemany/commit
+
+# Tables whose triggers and non-unique indexes are suspended during an import
+AFFECTED_TABLES = {
+    "products": ("products",),
+    "services": ("services",),
+    "employees": ("employees",),
+    "sales": ("sales", "sale_items"),
+}
+
+
+class RecordError(ValueError):
+    pass
+
+
+# Reading and validation
+def read_records(path: str, file_format: Optional[str] = None) -> Iterator[Tuple[int, Any]]:
+    """Yield (line number, record dict); a JSONL line that does not parse yields (line, RecordError)."""
+    file_format = file_format or ("jsonl" if path.lower().endswith((".jsonl", ".json")) else "csv")
+    if file_format == "jsonl":
+        with open(path, "r", encoding="utf-8-sig") as f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    rec = json.loads(line)
+                    if not isinstance(rec, dict):
+                        raise ValueError("not an object")
+                    yield line_no, rec
+                except ValueError as e:
+                    yield line_no, RecordError(f"سطر JSON غير صالح: {e}")
+        return
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.DictReader(f)
+        for rec in reader:
+            yield reader.line_num, rec
+
+
+def _text(rec: Dict[str, Any], key: str, required: bool = True) -> Optional[str]:
+    val = rec.get(key)
+    val = "" if val is None else str(val).strip()
+    if not val:
+        if required:
+            raise RecordError(f"الحقل {key} مطلوب")
+        return None
+    return val
+
+
+def _number(rec: Dict[str, Any], key: str, required: bool = True, integer: bool = False,
+            default: Optional[float] = None) -> Optional[float]:
+    val = rec.get(key)
+    if val is None or str(val).strip() == "":
+        if required:
+            raise RecordError(f"الحقل {key} مطلوب")
+        return default
+    try:
+        num = float(str(val).strip())
+    except ValueError:
+        raise RecordError(f"قيمة غير صالحة في {key}: {val}")
+    if num < 0:
+        raise RecordError(f"قيمة سالبة في {key}: {val}")
+    if integer:
+        if num != int(num):
+            raise RecordError(f"يجب أن يكون {key} عدداً صحيحاً: {val}")
+        return int(num)
+    return num
+
+
+def _date(rec: Dict[str, Any], key: str = "date") -> str:
+    val = _text(rec, key)
+    # "YYYY-MM-DD" or "YYYY-MM-DD HH:MM:SS", as stored by the app
+    if len(val) == 10:
+        val += " 00:00:00"
+    try:
+        time.strptime(val, "%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        raise RecordError(f"تاريخ غير صالح: {val}")
+    return val
+
+
+class Importer:
+    def __init__(self, db: Database, kind: str, error_path: Optional[str] = None, batch_size: int = BATCH_SIZE):
+        if kind not in IMPORT_KINDS:
+            raise ValueError(f"نوع استيراد غير معروف: {kind}")
+        self.db = db
+        self.kind = kind
+        self.error_path = error_path
+        self.batch_size = batch_size
+        self.read = 0
+        self.imported = 0
+        self.errors = 0
+        self._error_file = None
+
+    # Error file
+    def _error(self, line_no: int, message: str, record: Any = None):
+        self.errors += 1
+        if self.error_path is None:
+            return
+        if self._error_file is None:
+            self._error_file = open(self.error_path, "w", encoding="utf-8")
+        self._error_file.write(json.dumps({"line": line_no, "error": message, "record": record}, ensure_ascii=False))
+        self._error_file.write("\n")
+
+    # Deferred maintenance
+    def _suspend_maintenance(self, c):
+        tables = AFFECTED_TABLES[self.kind]
+        marks = ",".join("?" * len(tables))
+        c.execute(f"""
+        SELECT type, name FROM sqlite_master
+        WHERE tbl_name IN ({marks}) AND (
+            (type = 'trigger' AND name LIKE 'trg_search_%') OR
+            (type = 'index' AND name LIKE 'idx_%' AND sql NOT LIKE 'CREATE UNIQUE%')
+        )
+        """, tables)
+        for obj_type, name in c.fetchall():
+            c.execute(f"DROP {obj_type.upper()} IF EXISTS {name}")
+
+    def _restore_maintenance(self):
+        # ensure_schema recreates the dropped triggers and indexes (all IF NOT EXISTS)
+        self.db.ensure_schema()
+        if self.kind in ("products", "sales"):
+            self.db.rebuild_search_index()
+
+    # Kinds
+    def _existing_names(self, c, table: str) -> set:
+        c.execute(f"SELECT name FROM {table}")
+        return {row[0] for row in c.fetchall()}
+
+    def _rows_simple(self, c, records) -> Iterator[tuple]:
+        """Validated parameter tuples for products/services/employees."""
+        seen = self._existing_names(c, self.kind)
+        barcodes = set()
+        if self.kind == "products":
+            c.execute("SELECT barcode FROM products WHERE barcode IS NOT NULL")
+            barcodes = {row[0] for row in c.fetchall()}
+        for line_no, rec in records:
+            self.read += 1
+            if isinstance(rec, RecordError):
+                self._error(line_no, str(rec))
+                continue
+            try:
+                name = _text(rec, "name")
+                if name in seen:
+                    raise RecordError(f"موجود بالفعل: {name}")
+                if self.kind == "employees":
+                    row = (name,)
+                elif self.kind == "services":
+                    row = (name, _number(rec, "price"))
+                else:
+                    barcode = _text(rec, "barcode", required=False)
+                    if barcode and barcode in barcodes:
+                        raise RecordError(f"الباركود مستخدم بالفعل: {barcode}")
+                    row = (name, _number(rec, "price"), _number(rec, "quantity", required=False, integer=True, default=0),
+                           _number(rec, "purchase_price", required=False), barcode)
+                    if barcode:
+                        barcodes.add(barcode)
+            except RecordError as e:
+                self._error(line_no, str(e), rec)
+                continue
+            seen.add(name)
+            yield row
+
+    def _import_simple(self, c, conn, records):
+        sql = {
+            "employees": "INSERT INTO employees(name) VALUES (?)",
+            "services": "INSERT INTO services(name, price) VALUES (?, ?)",
+            "products": "INSERT INTO products(name, price, quantity, purchase_price, barcode) VALUES (?, ?, ?, ?, ?)",
+        }[self.kind]
+        batch = []
+        for row in self._rows_simple(c, records):
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                self._insert_simple(c, conn, sql, batch)
+                batch = []
+        if batch:
+            self._insert_simple(c, conn, sql, batch)
+
+    def _insert_simple(self, c, conn, sql, batch):
+        c.executemany(sql, batch)
+        if self.kind == "products":
+            # Imported quantities enter the stock ledger in the same transaction
+            self.db.record_opening_stock(c)
+        conn.commit()
+        self.imported += len(batch)
+
+    def _sale_groups(self, records) -> Iterator[Tuple[List[Tuple[int, Any]], Optional[RecordError]]]:
+        """Group consecutive rows by sale_id (a row without sale_id is a sale on its own)."""
+        group, key = [], None
+        for line_no, rec in records:
+            self.read += 1
+            if isinstance(rec, RecordError):
+                self._error(line_no, str(rec))
+                continue
+            rec_key = str(rec.get("sale_id") or "").strip() or None
+            if group and (rec_key is None or rec_key != key):
+                yield group
+                group = []
+            group.append((line_no, rec))
+            key = rec_key
+        if group:
+            yield group
+
+    def _import_sales(self, c, conn, records):
+        employees = {name: eid for eid, name in c.execute("SELECT id, name FROM employees").fetchall()}
+        products = {name: pid for pid, name in c.execute("SELECT id, name FROM products").fetchall()}
+        services = {name: sid for sid, name in c.execute("SELECT id, name FROM services").fetchall()}
+        next_id = (c.execute("SELECT COALESCE(MAX(id), 0) FROM sales").fetchone()[0] or 0) + 1
+
+        sales_sql = """
+        INSERT INTO sales(id, date, employee_id, customer_name, is_shop, total, discount_percent, type, buyer_type, material_deduction)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """
+        items_sql = """
+        INSERT INTO sale_items(sale_id, item_name, unit_price, quantity, product_id, service_id)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """
+        sales, items = [], []
+        for group in self._sale_groups(records):
+            head = group[0][1]
+            try:
+                sale_type = _text(head, "type", required=False) or "service"
+                if sale_type not in ("service", "product"):
+                    raise RecordError(f"نوع غير معروف: {sale_type}")
+                buyer_type = _text(head, "buyer_type", required=False) or "customer"
+                if buyer_type not in ("customer", "employee", "shop"):
+                    raise RecordError(f"نوع المشتري غير معروف: {buyer_type}")
+                employee = _text(head, "employee", required=False)
+                if employee and employee not in employees:
+                    raise RecordError(f"الموظف غير موجود: {employee}")
+                lines = []
+                for _line_no, rec in group:
+                    name = _text(rec, "item_name", required=False)
+                    if name is None:
+                        continue
+                    price = _number(rec, "unit_price")
+                    qty = _number(rec, "quantity", required=False, integer=True, default=1)
+                    lines.append((name, price, qty))
+                total = _number(head, "total", required=False)
+                if total is None:
+                    total = sum(price * qty for _n, price, qty in lines)
+                sale = (next_id, _date(head), employees.get(employee), _text(head, "customer_name", required=False),
+                        1 if buyer_type == "shop" else 0, total,
+                        _number(head, "discount_percent", required=False, integer=True, default=0),
+                        sale_type, buyer_type, _number(head, "material_deduction", required=False, default=0.0))
+            except RecordError as e:
+                for line_no, rec in group:
+                    self._error(line_no, str(e), rec)
+                continue
+            sales.append(sale)
+            for name, price, qty in lines:
+                if sale_type == "product":
+                    items.append((next_id, name, price, qty, products.get(name), None))
+                else:
+                    items.append((next_id, name, price, qty, None, services.get(name)))
+            next_id += 1
+            self.imported += len(group)
+            if len(sales) + len(items) >= self.batch_size:
+                c.executemany(sales_sql, sales)
+                c.executemany(items_sql, items)
+                conn.commit()
+                sales, items = [], []
+        if sales:
+            c.executemany(sales_sql, sales)
+            c.executemany(items_sql, items)
+            conn.commit()
+
+    def run(self, path: str, file_format: Optional[str] = None) -> Dict[str, Any]:
+        start = time.perf_counter()
+        records = read_records(path, file_format)
+        try:
+            with self.db.connect() as conn:
+                c = conn.cursor()
+                self._suspend_maintenance(c)
+                conn.commit()
+                if self.kind == "sales":
+                    self._import_sales(c, conn, records)
+                else:
+                    self._import_simple(c, conn, records)
+        finally:
+            self._restore_maintenance()
+            if self._error_file is not None:
+                self._error_file.close()
+        seconds = time.perf_counter() - start
+        return {
+            "read": self.read,
+            "imported": self.imported,
+            "errors": self.errors,
+            "seconds": round(seconds, 3),
+            "rows_per_sec": int(self.read / seconds) if seconds > 0 else 0,
+            "error_file": self.error_path if self.errors and self.error_path else None,
+        }
+
+
+def import_file(db: Database, kind: str, path: str, file_format: Optional[str] = None,
+                error_path: Optional[str] = None, batch_size: int = BATCH_SIZE) -> Dict[str, Any]:
+    """Import one file; errors go to <path>.errors.jsonl unless error_path is given."""
+    if error_path is None:
+        error_path = os.path.splitext(path)[0] + ".errors.jsonl"
+    return Importer(db, kind, error_path, batch_size).run(path, file_format)
@@ -1,9 +1,11 @@
 import sys
+import time
 from PySide6.QtWidgets import QApplication, QMainWindow, QTabWidget
 from PySide6.QtGui import QFont
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QObject, QEvent, QTimer
 
-from mina_al_arabi.db import Database
+from mina_al_arabi.server import RemoteDatabase, open_database
+from mina_al_arabi.session import SessionContext
 
 # Hint imports for PyInstaller static analysis to ensure bundling of dashboards.
 # Wrapped in try/except to avoid crashing if any module is missing during source runs.
@@ -14,10 +16,34 @@ try:
     import mina_al_arabi.dashboards.admin_report as _dash_admin
     import mina_al_arabi.dashboards.shift as _dash_shift
     import mina_al_arabi.dashboards.attendance as _dash_attendance
+    import mina_al_arabi.dashboards.analytics as _dash_analytics
 except Exception:
     pass
 
 
+IDLE_SECONDS = 5 * 60  # no keyboard/mouse input for this long counts as idle
+IDLE_CHECK_MS = 60_000
+EVENTS_POLL_MS = 1000  # server mode: how often other counters' writes reach the dashboards
+
+
+class IdleWatcher(QObject):
+    """Application-wide event filter remembering the time of the last user input."""
+
+    INPUT_EVENTS = (QEvent.KeyPress, QEvent.MouseButtonPress, QEvent.MouseMove, QEvent.Wheel)
+
+    def __init__(self):
+        super().__init__()
+        self.last_input = time.monotonic()
+
+    def eventFilter(self, obj, event):
+        if event.type() in self.INPUT_EVENTS:
+            self.last_input = time.monotonic()
+        return False
+
+    def idle_seconds(self) -> float:
+        return time.monotonic() - self.last_input
+
+
 def apply_theme():
     try:
         QApplication.instance().setFont(QFont("Cairo", 12))
@@ -42,11 +68,20 @@ def main():
     app.setLayoutDirection(Qt.RightToLeft)
     apply_theme()
 
-    db = Database()
-    db.ensure_schema()
+    # data/server.txt: use the database server (server.py) instead of the local file
+    db = open_database()
+    remote = isinstance(db, RemoteDatabase)
+    try:
+        db.ensure_schema()
+    except ConnectionError as e:
+        from PySide6.QtWidgets import QMessageBox
+        QMessageBox.critical(None, "خطأ", f"تعذر الاتصال بخادم البيانات {db.host}:{db.port}\n{e}")
+        sys.exit(1)
+    # Active shift etc. shared by the dashboards' write paths
+    session = SessionContext(db)
 
     window = QMainWindow()
-    window.setWindowTitle("مدير صالون مينا العربي")
+    window.setWindowTitle("مدير صالون مينا العربي" + (f" - متصل بالخادم {db.host}" if remote else ""))
     window.resize(1280, 850)
     window.setLayoutDirection(Qt.RightToLeft)
 
@@ -75,19 +110,19 @@ def main():
     # Shift (أول تبويب)
     def _shift_first_factory():
         from mina_al_arabi.dashboards.shift import ShiftDashboard
-        return ShiftDashboard(db)
+        return ShiftDashboard(db, session)
     shift_tab = add_tab_or_placeholder(_shift_first_factory, "الشفتات")
 
     # Cashier
     def _cashier_factory():
         from mina_al_arabi.dashboards.cashier import CashierDashboard
-        return CashierDashboard(db)
+        return CashierDashboard(db, session)
     cashier_tab = add_tab_or_placeholder(_cashier_factory, "الكاشير")
 
     # Sales
     def _sales_factory():
         from mina_al_arabi.dashboards.sales import SalesDashboard
-        return SalesDashboard(db)
+        return SalesDashboard(db, session)
     sales_tab = add_tab_or_placeholder(_sales_factory, "المبيعات")
 
     # Inventory
@@ -106,7 +141,7 @@ def main():
     # Expenses
     def _expenses_factory():
         from mina_al_arabi.dashboards.expenses import ExpensesDashboard
-        return ExpensesDashboard(db)
+        return ExpensesDashboard(db, session)
     expenses_tab = add_tab_or_placeholder(_expenses_factory, "المصاريف")
 
     # Attendance
@@ -133,6 +168,12 @@ def main():
         return AdminReportDashboard(db)
     admin_tab = add_tab_or_placeholder(_admin_factory, "إدارة")
 
+    # Analytics
+    def _analytics_factory():
+        from mina_al_arabi.dashboards.analytics import AnalyticsDashboard
+        return AnalyticsDashboard(db)
+    analytics_tab = add_tab_or_placeholder(_analytics_factory, "التحليلات")
+
     # Management menu
     from PySide6.QtWidgets import QMenuBar, QMenu, QInputDialog, QMessageBox
     menubar = QMenuBar(window)
@@ -233,6 +274,29 @@ def main():
     act_backup = manage_menu.addAction("نسخ احتياطي للبيانات")
     act_backup.triggered.connect(backup_action)
 
+    # Archive old months (keeps the live database small; reports still include them)
+    def archive_action():
+        from mina_al_arabi.archive import HORIZON_MONTHS, archivable_months, archive_old_months
+        if remote:
+            # The archive files are written next to the database, on the server
+            QMessageBox.information(window, "أرشفة", "الأرشفة تتم على جهاز الخادم:\npython -m mina_al_arabi.cli archive")
+            return
+        try:
+            months = archivable_months(db, HORIZON_MONTHS)
+            if not months:
+                QMessageBox.information(window, "أرشفة", "لا توجد أشهر قديمة للأرشفة.")
+                return
+            confirm = QMessageBox.question(window, "أرشفة", f"سيتم نقل بيانات {len(months)} شهر ({months[0]} إلى {months[-1]}) إلى ملفات الأرشيف. متابعة؟")
+            if confirm != QMessageBox.Yes:
+                return
+            done = archive_old_months(db, HORIZON_MONTHS)
+            QMessageBox.information(window, "تم", f"تمت أرشفة {len(done)} شهر.")
+        except Exception as e:
+            QMessageBox.critical(window, "خطأ", f"تعذرت الأرشفة:\n{e}")
+
+    act_archive = manage_menu.addAction("أرشفة الأشهر القديمة")
+    act_archive.triggered.connect(archive_action)
+
     # Update Program (Refresh)
     def refresh_action():
         try:
@@ -249,6 +313,83 @@ def main():
     act_refresh = manage_menu.addAction("تحديث البرنامج")
     act_refresh.triggered.connect(refresh_action)
 
+    # Search (products, customers, expenses, receipts)
+    def search_action():
+        query, ok = QInputDialog.getText(window, "بحث", "ابحث عن منتج أو عميل أو مصروف أو فاتورة:")
+        if not (ok and query.strip()):
+            return
+        try:
+            results = db.search(query.strip(), limit=10)
+        except Exception as e:
+            QMessageBox.critical(window, "خطأ", f"تعذر البحث:\n{e}")
+            return
+        if not results:
+            QMessageBox.information(window, "بحث", "لا توجد نتائج.")
+            return
+        lines = []
+        for r in results:
+            if r["kind"] == "product":
+                lines.append(f"منتج: {r['title']} - {int(round(r['price']))} ج.م (المتوفر: {r['quantity']})")
+            elif r["kind"] == "customer":
+                lines.append(f"عميل: {r['title']} - {r['visits']} زيارة (آخرها {r['last_visit']})")
+            elif r["kind"] == "expense":
+                lines.append(f"مصروف: {r['title']} - {int(round(r['amount']))} ج.م ({r['date']})")
+            else:
+                lines.append(f"فاتورة #{r['id']}: {r['title']} - {int(round(r['total']))} ج.م ({r['date']})")
+        QMessageBox.information(window, "نتائج البحث", "\n".join(lines))
+
+    act_search = manage_menu.addAction("بحث")
+    act_search.triggered.connect(search_action)
+
+    # Database maintenance (statistics, free pages, quick check): after a shift is closed and when idle
+    from mina_al_arabi import maintenance
+
+    def run_maintenance(trigger):
+        try:
+            maintenance.run_maintenance(db, trigger)
+        except Exception as e:
+            print(f"[Maintenance] {trigger} failed: {e}")
+
+    idle_watcher = IdleWatcher()
+    app.installEventFilter(idle_watcher)
+
+    # Staffing forecast inputs: refreshed once a day, at the first idle moment or shift close after midnight
+    from mina_al_arabi import forecast
+
+    def refresh_forecast():
+        try:
+            if forecast.is_due(db):
+                forecast.refresh(db)
+        except Exception as e:
+            print(f"[Forecast] refresh failed: {e}")
+
+    def idle_tick():
+        if remote:
+            return  # the server does its own housekeeping
+        try:
+            if idle_watcher.idle_seconds() >= IDLE_SECONDS:
+                refresh_forecast()
+                if maintenance.is_due(db):
+                    run_maintenance("idle")
+        except Exception:
+            pass
+
+    idle_timer = QTimer(window)
+    idle_timer.timeout.connect(idle_tick)
+    idle_timer.start(IDLE_CHECK_MS)
+
+    def on_db_event(event, payload):
+        if event == "shift_closed" and not remote:
+            QTimer.singleShot(0, lambda: run_maintenance("shift_close"))
+            QTimer.singleShot(0, refresh_forecast)
+
+    db.subscribe(on_db_event)
+
+    if remote:
+        events_timer = QTimer(window)
+        events_timer.timeout.connect(db.dispatch_events)
+        events_timer.start(EVENTS_POLL_MS)
+
     window.show()
     sys.exit(app.exec())
 
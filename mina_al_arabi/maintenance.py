@@ -0,0 +1,165 @@
+"""
+Database housekeeping within a time budget.
+
+run_maintenance() performs, in order and while budget remains:
+
+1. Planner statistics: ANALYZE (sampled with analysis_limit) when there are no
+   statistics yet or they are older than ANALYZE_EVERY_DAYS, otherwise
+   PRAGMA optimize.
+2. Incremental vacuum: frees the pages left behind by bulk deletes
+   (delete_all_*, delete_shop_data_in_month, archiving) in small steps. A
+   database created before auto_vacuum was enabled needs a one-time full
+   VACUUM, which rewrites the whole file and cannot stop at the budget, so it
+   only runs when asked for (vacuum=True, `cli maintenance --vacuum`), never
+   from the app's idle or shift-close runs.
+3. PRAGMA quick_check, at most once every CHECK_EVERY_HOURS. It is interrupted
+   when the budget runs out and tried again on a later run.
+4. Stock snapshots: the first-of-month snapshot of the stock ledger for each
+   month since the last one (Database.take_stock_snapshots). Usually nothing to
+   do, and cheap when there is, so it does not depend on the budget.
+
+Every run is recorded in the maintenance_log table. The app triggers it when a
+shift is closed and when the UI has been idle (main.py, or server.py when the
+counters share a server); the CLI has a `maintenance` command.
+"""
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from mina_al_arabi.db import Database
+
+
+BUDGET_SECONDS = 2.0
+ANALYZE_EVERY_DAYS = 7
+CHECK_EVERY_HOURS = 24
+MIN_INTERVAL_MINUTES = 60  # idle runs are skipped if the last run is more recent
+ANALYSIS_LIMIT = 1000  # rows sampled per index by ANALYZE
+VACUUM_STEP_PAGES = 256
+
+
+def _last_run(c, task: Optional[str] = None) -> Optional[str]:
+    if task:
+        c.execute("SELECT MAX(started_at) FROM maintenance_log WHERE ',' || tasks || ',' LIKE ?", (f"%,{task},%",))
+    else:
+        c.execute("SELECT MAX(started_at) FROM maintenance_log")
+    return c.fetchone()[0]
+
+
+def _older_than(stamp: Optional[str], delta: timedelta) -> bool:
+    if not stamp:
+        return True
+    try:
+        return datetime.now() - datetime.strptime(stamp, "%Y-%m-%d %H:%M:%S") >= delta
+    except ValueError:
+        return True
+
+
+def is_due(db: Database, minutes: int = MIN_INTERVAL_MINUTES) -> bool:
+    with db.connect() as conn:
+        return _older_than(_last_run(conn.cursor()), timedelta(minutes=minutes))
+
+
+def run_maintenance(db: Database, trigger: str = "manual", budget: float = BUDGET_SECONDS,
+                    force_check: bool = False, vacuum: bool = False) -> Dict[str, Any]:
+    """Run what fits in `budget` seconds; returns the logged row as a dict.
+
+    vacuum=True also converts a legacy database to incremental auto_vacuum,
+    however long the full VACUUM takes.
+    """
+    started = time.perf_counter()
+    started_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    tasks = []
+    freed = 0
+    check_result = None
+
+    def remaining() -> float:
+        return budget - (time.perf_counter() - started)
+
+    with db.connect() as conn:
+        c = conn.cursor()
+
+        # 1. Planner statistics
+        c.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'sqlite_stat1'")
+        has_stats = c.fetchone()[0] > 0
+        if not has_stats or _older_than(_last_run(c, "analyze"), timedelta(days=ANALYZE_EVERY_DAYS)):
+            c.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+            c.execute("ANALYZE")
+            conn.commit()
+            tasks.append("analyze")
+        else:
+            c.execute("PRAGMA optimize")
+            tasks.append("optimize")
+
+        # 2. Free pages
+        c.execute("PRAGMA auto_vacuum")
+        mode = c.fetchone()[0]
+        c.execute("PRAGMA freelist_count")
+        free_pages = c.fetchone()[0]
+        if mode != 2 and vacuum:
+            # One-time switch to incremental mode; VACUUM rewrites the file and drops the free pages
+            c.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            c.execute("VACUUM")
+            freed = free_pages
+            tasks.append("vacuum")
+        elif mode == 2 and free_pages > 0:
+            # Steps share one transaction so each does not pay for its own sync
+            c.execute("BEGIN")
+            while free_pages > 0 and remaining() > 0:
+                c.execute(f"PRAGMA incremental_vacuum({VACUUM_STEP_PAGES})")
+                c.fetchall()
+                c.execute("PRAGMA freelist_count")
+                left = c.fetchone()[0]
+                freed += free_pages - left
+                free_pages = left
+            conn.commit()
+            if freed:
+                tasks.append("incremental_vacuum")
+
+        # 3. Integrity
+        if remaining() > 0 and (force_check or _older_than(_last_run(c, "quick_check"), timedelta(hours=CHECK_EVERY_HOURS))):
+            # The progress handler aborts the check once the budget is spent. A RemoteDatabase
+            # connection has none; the server runs its own maintenance with the budget.
+            set_handler = getattr(conn, "set_progress_handler", None)
+            if set_handler:
+                set_handler(lambda: remaining() <= 0, 10000)
+            try:
+                c.execute("PRAGMA quick_check")
+                check_result = "\n".join(row[0] for row in c.fetchall())
+                tasks.append("quick_check")
+            except sqlite3.OperationalError as e:
+                if "interrupted" not in str(e):
+                    raise
+            finally:
+                if set_handler:
+                    set_handler(None, 0)
+
+        # 4. Stock snapshots
+        if db.take_stock_snapshots():
+            tasks.append("stock_snapshot")
+
+        duration_ms = int((time.perf_counter() - started) * 1000)
+        c.execute("""
+        INSERT INTO maintenance_log(started_at, trigger, tasks, freed_pages, check_result, duration_ms)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """, (started_at, trigger, ",".join(tasks), freed, check_result, duration_ms))
+        conn.commit()
+
+    return {
+        "started_at": started_at,
+        "trigger": trigger,
+        "tasks": tasks,
+        "freed_pages": freed,
+        "check_result": check_result,
+        "duration_ms": duration_ms,
+    }
+
+
+def list_runs(db: Database, limit: int = 20):
+    with db.connect() as conn:
+        c = conn.cursor()
+        c.execute("""
+        SELECT started_at, trigger, tasks, freed_pages, check_result, duration_ms
+        FROM maintenance_log ORDER BY id DESC LIMIT ?
+        """, (limit,))
+        return c.fetchall()
@@ -0,0 +1,123 @@
+"""
+Monthly payroll: hours worked, service commission base, product sales, loans and
+net balance for every employee at once.
+
+payroll_rows() runs a single grouped query: attendance, sales and loans are each
+aggregated per employee in SQL and joined onto the employees table, so the cost
+does not grow with the number of employees the way the per-employee reports tab
+does. Amounts follow the reports tab: each sale counts as
+max(0, total after discount - material deduction), sales recorded for the
+employee's own purchases (buyer_type 'employee') are excluded, and only loans
+and sales that have not been cleared are counted. The arithmetic stays in the
+SQL aggregates; the per-employee sums need no NumPy arrays.
+
+PayrollCache keeps computed months and drops a month when a write event
+(sale, attendance, loan, employee) touches it (reporting.MonthCache).
+"""
+import csv
+import os
+from typing import Any, Dict, List
+
+from mina_al_arabi.db import Database, DATA_DIR, month_range
+from mina_al_arabi.reporting import TOTAL_LABELS, MonthCache, make_report
+
+
+PAYROLL_DIR = os.path.join(DATA_DIR, "payroll")
+
+PAYROLL_COLUMNS = ["الموظف", "أيام الحضور", "ساعات العمل", "الخدمات (أساس العمولة)", "المبيعات", "السلف", "الصافي"]
+PAYROLL_TOTALS = ("services", "products", "loans", "net")
+
+# Events that can change a month's payroll
+PAYROLL_EVENTS = ("sale_created", "sales_deleted", "attendance_changed", "loan_added", "loans_deleted",
+                  "employees_changed")
+
+
+def payroll_rows(db: Database, year: int, month: int) -> List[Dict[str, Any]]:
+    """One dict per employee (ordered by name) for the month."""
+    start, end = month_range(year, month)
+    with db.connect() as conn:
+        c = conn.cursor()
+        c.execute("""
+        SELECT e.id, e.name,
+               COALESCE(a.days, 0), COALESCE(a.secs, 0),
+               COALESCE(s.services, 0), COALESCE(s.products, 0),
+               COALESCE(l.loans, 0)
+        FROM employees e
+        LEFT JOIN (
+            SELECT employee_id, COUNT(DISTINCT date) AS days,
+                   SUM((CAST(round((julianday(check_out) - julianday(check_in)) * 86400) AS INTEGER) + 86400) % 86400) AS secs
+            FROM attendance
+            WHERE date >= ? AND date < ?
+            GROUP BY employee_id
+        ) a ON a.employee_id = e.id
+        LEFT JOIN (
+            SELECT employee_id,
+                   SUM(CASE WHEN type = 'service' THEN MAX(0, total * (1 - discount_percent / 100.0) - material_deduction) ELSE 0 END) AS services,
+                   SUM(CASE WHEN type != 'service' THEN MAX(0, total * (1 - discount_percent / 100.0) - material_deduction) ELSE 0 END) AS products
+            FROM sales
+            WHERE date >= ? AND date < ? AND cleared = 0 AND buyer_type != 'employee'
+            GROUP BY employee_id
+        ) s ON s.employee_id = e.id
+        LEFT JOIN (
+            SELECT employee_id, SUM(amount) AS loans
+            FROM loans
+            WHERE date >= ? AND date < ? AND cleared = 0
+            GROUP BY employee_id
+        ) l ON l.employee_id = e.id
+        ORDER BY e.name
+        """, (start, end, start, end, start, end))
+        rows = c.fetchall()
+    return [{
+        "employee_id": eid,
+        "employee": name,
+        "days": int(days),
+        "seconds": int(secs),
+        "hours": round(secs / 3600.0, 2),
+        "services": float(services),
+        "products": float(products),
+        "loans": float(loans),
+        "net": float(services) + float(products) - float(loans),
+    } for eid, name, days, secs, services, products, loans in rows]
+
+
+def format_hours(seconds: int) -> str:
+    """HH:MM, as in the attendance tab."""
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}"
+
+
+def payroll_report(rows: List[Dict[str, Any]], year: int, month: int) -> Dict[str, Any]:
+    """Report dict (see reporting.py) for rows from payroll_rows()."""
+    table = [[r["employee"], r["days"], format_hours(r["seconds"]), round(r["services"], 2), round(r["products"], 2),
+              round(r["loans"], 2), round(r["net"], 2)] for r in rows]
+    totals = {"hours": format_hours(sum(r["seconds"] for r in rows))}
+    totals.update({key: round(sum(r[key] for r in rows), 2) for key in PAYROLL_TOTALS})
+    return make_report(f"كشف الرواتب {month:02d}/{year}", PAYROLL_COLUMNS, table, totals)
+
+
+def write_payroll_csv(report: Dict[str, Any], path: str) -> str:
+    """Write the payroll sheet (UTF-8 with BOM so Excel shows the Arabic names)."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(report["columns"])
+        writer.writerows(report["rows"])
+        writer.writerow([])
+        for key, value in report["totals"].items():
+            writer.writerow([TOTAL_LABELS.get(key, key), value])
+    return path
+
+
+def default_payroll_path(year: int, month: int) -> str:
+    return os.path.join(PAYROLL_DIR, f"payroll_{year:04d}_{month:02d}.csv")
+
+
+class PayrollCache(MonthCache):
+    """payroll_rows() per month (see reporting.MonthCache)."""
+
+    EVENTS = PAYROLL_EVENTS
+
+    def compute(self, db: Database, year: int, month: int) -> List[Dict[str, Any]]:
+        return payroll_rows(db, year, month)
+
+    def report(self, year: int, month: int) -> Dict[str, Any]:
+        return payroll_report(self.rows(year, month), year, month)
@@ -1,4 +1,5 @@
 import os
+from typing import Union
 try:
     import win32print
 except Exception:
@@ -37,9 +38,10 @@ def _selected_printer_name() -> str:
     return name
 
 
-def print_receipt(text: str) -> None:
+def print_receipt(text: Union[str, bytes]) -> None:
     """
     Print the given text directly to a Windows thermal printer without showing a dialog.
+    Bytes (e.g. ESC/POS output of mina_al_arabi.receipt) are sent unchanged; text is encoded to cp1256.
     It will try the saved printer name (data/printer.txt), then XP-58IIH/Xprinter, then the system default.
     """
     if not win32print:
@@ -54,8 +56,11 @@ def print_receipt(text: str) -> None:
     try:
         hJob = win32print.StartDocPrinter(hPrinter, 1, ("فاتورة", None, "RAW"))
         win32print.StartPagePrinter(hPrinter)
-        # cp1256 for Arabic stability on many thermal printers
-        data = text.encode("cp1256", errors="replace")
+        if isinstance(text, bytes):
+            data = text
+        else:
+            # cp1256 for Arabic stability on many thermal printers
+            data = text.encode("cp1256", errors="replace")
         win32print.WritePrinter(hPrinter, data)
         win32print.EndPagePrinter(hPrinter)
         win32print.EndDocPrinter(hPrinter)
@@ -0,0 +1,136 @@
+"""
+Product profitability: units sold, revenue after discount, cost and margin per
+product, by month.
+
+product_rows() is one grouped query over sale_items joined to their sales (for
+the month and the invoice discount) and to products (for purchase_price).
+Revenue follows the admin report: customer product invoices only, each item at
+unit price x quantity less the invoice's visible discount. Cost is quantity x
+the unit cost the stock ledger recorded with the sale (stock_movements, reason
+'sale'), so later deliveries do not restate past months. Sales from before the
+ledger have no movement row and fall back to the product's current purchase
+price. Cost is left unknown (None) for products without a purchase price (the
+ledger then holds the sale price) and for legacy items whose product was
+deleted, rather than guessed, so a missing cost never looks like a margin.
+
+ProfitabilityCache (a reporting.MonthCache) drops a month when a sale in it is
+created or deleted, and every month when a delivery changes purchase prices or
+a product is deleted (both only matter to the legacy fallback).
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+from mina_al_arabi.db import Database, month_range
+from mina_al_arabi.reporting import MonthCache, make_report
+
+
+PROFIT_COLUMNS = ["المنتج", "الكمية المباعة", "الإيرادات بعد الخصم", "التكلفة", "الهامش", "الهامش %"]
+
+
+def product_rows(db: Database, year: int, month: int) -> List[Dict[str, Any]]:
+    """One dict per product sold in the month, lowest margin first (unknown cost last)."""
+    start, end = month_range(year, month)
+    with db.connect() as conn:
+        c = conn.cursor()
+        c.execute("""
+        SELECT product_id, name, SUM(quantity), SUM(revenue), SUM(cost),
+               SUM(CASE WHEN cost IS NULL THEN 1 ELSE 0 END)
+        FROM (
+            SELECT si.product_id, COALESCE(p.name, si.item_name) AS name, si.item_name, si.quantity,
+                   si.unit_price * si.quantity * (1 - s.discount_percent / 100.0) AS revenue,
+                   CASE WHEN p.id IS NOT NULL AND p.purchase_price IS NULL THEN NULL
+                        -- Average ledger cost of this product in the sale, in case it is on several lines
+                        ELSE si.quantity * COALESCE(
+                            (SELECT SUM(-m.delta * m.unit_cost) / SUM(-m.delta) FROM stock_movements m
+                             WHERE m.product_id = si.product_id AND m.reason = 'sale' AND m.ref_id = s.id),
+                            p.purchase_price)
+                   END AS cost
+            FROM sale_items si
+            JOIN sales s ON s.id = si.sale_id
+            LEFT JOIN products p ON p.id = si.product_id
+            WHERE s.date >= ? AND s.date < ? AND s.type = 'product' AND s.buyer_type = 'customer'
+        )
+        GROUP BY product_id, CASE WHEN product_id IS NULL THEN item_name END
+        """, (start, end))
+        rows = c.fetchall()
+    return _sorted([_row(pid, name, units, revenue, None if unknown else cost)
+                    for pid, name, units, revenue, cost, unknown in rows])
+
+
+def _row(product_id: Optional[int], name: str, units: int, revenue: float, cost: Optional[float]) -> Dict[str, Any]:
+    revenue = float(revenue or 0)
+    margin = None if cost is None else revenue - float(cost)
+    return {
+        "product_id": product_id,
+        "product": name,
+        "units": int(units or 0),
+        "revenue": revenue,
+        "cost": None if cost is None else float(cost),
+        "margin": margin,
+        "margin_percent": margin / revenue * 100.0 if margin is not None and revenue else None,
+    }
+
+
+def _sorted(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return sorted(rows, key=lambda r: (r["margin"] is None, r["margin"] or 0, r["product"]))
+
+
+def merge_months(months: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Sum product_rows() results of several months per product."""
+    merged: Dict[Tuple[Optional[int], str], List[Any]] = {}
+    for rows in months:
+        for r in rows:
+            key = (r["product_id"], r["product"] if r["product_id"] is None else "")
+            acc = merged.setdefault(key, [r["product"], 0, 0.0, 0.0])
+            acc[1] += r["units"]
+            acc[2] += r["revenue"]
+            acc[3] = None if acc[3] is None or r["cost"] is None else acc[3] + r["cost"]
+    return _sorted([_row(pid, name, units, revenue, cost)
+                    for (pid, _n), (name, units, revenue, cost) in merged.items()])
+
+
+def _amount(value: Optional[float]):
+    return None if value is None else round(value, 2)
+
+
+def profitability_report(rows: List[Dict[str, Any]], period: str) -> Dict[str, Any]:
+    """Report dict (see reporting.py) for product_rows() / merge_months() rows."""
+    table = [[r["product"], r["units"], _amount(r["revenue"]), _amount(r["cost"]), _amount(r["margin"]),
+              None if r["margin_percent"] is None else round(r["margin_percent"], 1)] for r in rows]
+    # Revenue counts every product; cost and margin only those with a known cost (see unknown_cost)
+    known = [r for r in rows if r["cost"] is not None]
+    totals = {
+        "units": sum(r["units"] for r in rows),
+        "revenue": round(sum(r["revenue"] for r in rows), 2),
+        "cost": round(sum(r["cost"] for r in known), 2),
+        "margin": round(sum(r["margin"] for r in known), 2),
+        "loss_products": sum(1 for r in known if r["margin"] < 0),
+        "unknown_cost": len(rows) - len(known),
+    }
+    return make_report(f"ربحية المنتجات {period}", PROFIT_COLUMNS, table, totals)
+
+
+class ProfitabilityCache(MonthCache):
+    """product_rows() per month (see reporting.MonthCache); a year is the sum of its months."""
+
+    EVENTS = ("sale_created", "sales_deleted", "stock_changed")
+
+    def compute(self, db: Database, year: int, month: int) -> List[Dict[str, Any]]:
+        return product_rows(db, year, month)
+
+    def year_rows(self, year: int) -> List[Dict[str, Any]]:
+        return merge_months([self.rows(year, m) for m in range(1, 13)])
+
+    def report(self, year: int, month: Optional[int] = None) -> Dict[str, Any]:
+        if month is None:
+            return profitability_report(self.year_rows(year), str(year))
+        return profitability_report(self.rows(year, month), f"{month:02d}/{year}")
+
+    def on_db_event(self, event: str, payload: Dict[str, Any]) -> None:
+        if event == "stock_changed":
+            if payload.get("reason") in ("delivery", "removed"):
+                # New purchase prices, or a deleted product's cost becoming unknown, change every month
+                self.invalidate()
+                return
+            if payload.get("reason") != "sale":
+                return
+        super().on_db_event(event, payload)
@@ -0,0 +1,160 @@
+"""
+ESC/POS receipt rendering for the 58mm thermal printers (XP-58 and compatibles).
+
+A ReceiptTemplate is compiled once: the static header (printer init, code page,
+shop title) and footer (thanks line, feed and cut) are encoded to bytes a single
+time and reused for every receipt. Only the variable lines (date, buyer, items,
+totals) are encoded per print, and repeated strings such as service names are
+served from an encoding cache.
+"""
+import time
+from functools import lru_cache
+from typing import Tuple, Sequence, Optional
+
+
+ENCODING = "cp1256"
+LINE_WIDTH = 32  # characters per line on 58mm paper with Font A
+CURRENCY = "ج.م"
+SHOP_TITLE = "صالون مينا العربي"
+
+# ESC/POS commands
+ESC = b"\x1b"
+GS = b"\x1d"
+INIT = ESC + b"@"
+CODEPAGE_CP1256 = ESC + b"t" + bytes([50])  # WPC1256 Arabic on XP-58 firmware
+ALIGN_LEFT = ESC + b"a" + bytes([0])
+ALIGN_CENTER = ESC + b"a" + bytes([1])
+ALIGN_RIGHT = ESC + b"a" + bytes([2])
+BOLD_ON = ESC + b"E" + bytes([1])
+BOLD_OFF = ESC + b"E" + bytes([0])
+FEED_AND_CUT = b"\n\n\n" + GS + b"V" + bytes([66, 0])  # feed, then partial cut
+NL = b"\n"
+
+
+def format_amount(amount: float) -> str:
+    return f"{int(round(amount))}"
+
+
+@lru_cache(maxsize=2048)
+def encode(text: str) -> bytes:
+    """Encode a line for the printer; cached because most strings repeat across receipts."""
+    return text.encode(ENCODING, errors="replace")
+
+
+def columns(right: str, left: str, width: int = LINE_WIDTH) -> str:
+    """Lay out a right-to-left row: `right` flush to the right edge, `left` flush to the left edge."""
+    room = width - len(left) - 1
+    if room < 1:
+        return left[:width]
+    if len(right) > room:
+        right = right[:room]
+    return left + " " * (width - len(left) - len(right)) + right
+
+
+class ReceiptTemplate:
+    """Compiled receipt layout: pre-encoded header/footer plus the per-receipt body."""
+
+    def __init__(self, title: str = SHOP_TITLE, footer_lines: Sequence[str] = ("شكراً لزيارتكم",),
+                 width: int = LINE_WIDTH):
+        self.title = title
+        self.footer_lines = list(footer_lines)
+        self.width = width
+        self.separator = "-" * width
+        self._compile()
+
+    def _compile(self):
+        self._header = b"".join([
+            INIT, CODEPAGE_CP1256,
+            ALIGN_CENTER, BOLD_ON, encode(self.title), NL, BOLD_OFF,
+            ALIGN_RIGHT,
+        ])
+        self._separator = encode(self.separator) + NL
+        footer = [self._separator, ALIGN_CENTER]
+        for line in self.footer_lines:
+            footer += [encode(line), NL]
+        footer.append(FEED_AND_CUT)
+        self._footer = b"".join(footer)
+
+    def _item_line(self, name: str, price: float, qty: int) -> str:
+        return columns(f"{name} x{qty}", f"{format_amount(price)} {CURRENCY}", self.width)
+
+    def _total_line(self, label: str, value: str) -> str:
+        return columns(label, value, self.width)
+
+    def render(self, fields: Sequence[Tuple[str, str]], items: Sequence[Tuple[str, float, int]],
+               totals: Sequence[Tuple[str, str]]) -> bytes:
+        """Return the ESC/POS byte stream ready for a RAW spooler job.
+
+        fields: (label, value) lines under the title, e.g. ("التاريخ", "...").
+        items: (name, unit_price, qty).
+        totals: (label, value) lines; the last one is printed in bold.
+        """
+        out = [self._header]
+        for label, value in fields:
+            out += [encode(f"{label}: {value}"), NL]
+        out.append(self._separator)
+        for name, price, qty in items:
+            out += [encode(self._item_line(name, price, qty)), NL]
+        out.append(self._separator)
+        last = len(totals) - 1
+        for i, (label, value) in enumerate(totals):
+            line = encode(self._total_line(label, value))
+            if i == last:
+                out += [BOLD_ON, line, NL, BOLD_OFF]
+            else:
+                out += [line, NL]
+        out.append(self._footer)
+        return b"".join(out)
+
+    def render_text(self, fields: Sequence[Tuple[str, str]], items: Sequence[Tuple[str, float, int]],
+                    totals: Sequence[Tuple[str, str]]) -> str:
+        """Plain-text version of the same layout (saved to the receipts folder)."""
+        lines = [self.title]
+        lines += [f"{label}: {value}" for label, value in fields]
+        lines.append(self.separator)
+        lines += [self._item_line(name, price, qty) for name, price, qty in items]
+        lines.append(self.separator)
+        lines += [self._total_line(label, value) for label, value in totals]
+        return "\n".join(lines)
+
+
+_default_template: Optional[ReceiptTemplate] = None
+
+
+def get_template() -> ReceiptTemplate:
+    """Shared compiled template; raster (bitmap) mode when enabled in data/receipt_mode.txt."""
+    global _default_template
+    if _default_template is None:
+        from mina_al_arabi.receipt_raster import raster_mode_enabled, RasterReceiptTemplate
+        if raster_mode_enabled():
+            _default_template = RasterReceiptTemplate()
+        else:
+            _default_template = ReceiptTemplate()
+    return _default_template
+
+
+def amount_value(amount: float) -> str:
+    return f"{format_amount(amount)} {CURRENCY}"
+
+
+def benchmark(n: int = 2000) -> dict:
+    """Render a typical service receipt n times; returns timings in microseconds."""
+    template = get_template()
+    fields = [("التاريخ", "2024-01-01 05:30 PM"), ("المشتري", "غير محدد"), ("الموظف", "مينا")]
+    items = [("قص شعر", 100.0, 1), ("ذقن", 50.0, 1), ("سشوار", 40.0, 1), ("ماسك", 80.0, 2)]
+    totals = [("الإجمالي قبل الخصم", amount_value(350)), ("الخصم", "10%"), ("الإجمالي بعد الخصم", amount_value(315))]
+    template.render(fields, items, totals)  # warm the caches
+    start = time.perf_counter()
+    for _ in range(n):
+        data = template.render(fields, items, totals)
+    elapsed = time.perf_counter() - start
+    return {
+        "receipts": n,
+        "bytes_per_receipt": len(data),
+        "total_ms": round(elapsed * 1000, 2),
+        "per_receipt_us": round(elapsed / n * 1_000_000, 2),
+    }
+
+
+if __name__ == "__main__":
+    print(benchmark())
@@ -0,0 +1,240 @@
+"""
+Raster (bitmap) receipts for thermal printers without a working cp1256 code page.
+
+Arabic text is shaped (arabic_reshaper), put in visual order (python-bidi) and
+drawn with a TrueType font into 1-bit images that are sent with ESC/POS `GS v 0`.
+Word bitmaps are cached per (font, size, word), so the shop title, service names
+and the currency are drawn once and then only pasted.
+
+Optional dependencies: pip install pillow arabic-reshaper python-bidi
+Enable by writing "raster" into data/receipt_mode.txt.
+"""
+import os
+import time
+from functools import lru_cache
+from typing import Dict, Optional, Sequence, Tuple
+
+from mina_al_arabi.receipt import (
+    ReceiptTemplate, SHOP_TITLE, LINE_WIDTH, INIT, ALIGN_LEFT, FEED_AND_CUT, GS,
+    amount_value, format_amount, CURRENCY,
+)
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+    import arabic_reshaper
+    from bidi.algorithm import get_display
+except Exception:
+    Image = None
+
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+RECEIPT_MODE_CFG_PATH = os.path.join(DATA_DIR, "receipt_mode.txt")
+
+WIDTH_DOTS = 384  # printable width of 58mm paper at 203 dpi
+BAND_HEIGHT = 128  # rows per GS v 0 command; keeps each command within printer buffer limits
+FONT_SIZE = 22
+TITLE_SIZE = 30
+LINE_GAP = 4
+WORD_GAP = 6
+
+_WIN_FONTS = os.path.join(os.environ.get("WINDIR", "C:\\Windows"), "Fonts")
+FONT_CANDIDATES = [
+    os.path.join(_WIN_FONTS, "tahoma.ttf"),
+    os.path.join(_WIN_FONTS, "arial.ttf"),
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+]
+BOLD_FONT_CANDIDATES = [
+    os.path.join(_WIN_FONTS, "tahomabd.ttf"),
+    os.path.join(_WIN_FONTS, "arialbd.ttf"),
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+]
+
+
+def raster_available() -> bool:
+    return Image is not None and _first_existing(FONT_CANDIDATES) is not None
+
+
+def raster_mode_enabled() -> bool:
+    try:
+        if os.path.exists(RECEIPT_MODE_CFG_PATH):
+            with open(RECEIPT_MODE_CFG_PATH, "r", encoding="utf-8") as f:
+                if f.read().strip().lower() == "raster":
+                    return raster_available()
+    except Exception:
+        pass
+    return False
+
+
+def _first_existing(paths: Sequence[str]) -> Optional[str]:
+    for p in paths:
+        if os.path.exists(p):
+            return p
+    return None
+
+
+@lru_cache(maxsize=4096)
+def visual_words(text: str) -> Tuple[str, ...]:
+    """Shape Arabic letters and reorder the line for display; returns words left to right."""
+    return tuple(w for w in get_display(arabic_reshaper.reshape(text)).split(" ") if w)
+
+
+class GlyphCache:
+    """1-bit word bitmaps keyed by (font path, size, word)."""
+
+    def __init__(self):
+        self._fonts: Dict[Tuple[str, int], "ImageFont.FreeTypeFont"] = {}
+        self._words: Dict[Tuple[str, int, str], "Image.Image"] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def font(self, path: str, size: int):
+        key = (path, size)
+        f = self._fonts.get(key)
+        if f is None:
+            f = ImageFont.truetype(path, size, layout_engine=ImageFont.Layout.BASIC)
+            self._fonts[key] = f
+        return f
+
+    def line_height(self, path: str, size: int) -> int:
+        ascent, descent = self.font(path, size).getmetrics()
+        return ascent + descent
+
+    def word(self, path: str, size: int, word: str):
+        key = (path, size, word)
+        img = self._words.get(key)
+        if img is not None:
+            self.hits += 1
+            return img
+        self.misses += 1
+        font = self.font(path, size)
+        width = max(1, int(font.getlength(word)) + 1)
+        img = Image.new("1", (width, self.line_height(path, size)), 0)
+        # White-on-black so that set bits are printed dots
+        ImageDraw.Draw(img).text((0, 0), word, font=font, fill=1)
+        self._words[key] = img
+        return img
+
+    def __len__(self):
+        return len(self._words)
+
+
+def raster_bytes(img) -> bytes:
+    """Encode a 1-bit image as ESC/POS `GS v 0` raster bands."""
+    width_bytes = (img.width + 7) // 8
+    out = []
+    for top in range(0, img.height, BAND_HEIGHT):
+        band = img.crop((0, top, img.width, min(top + BAND_HEIGHT, img.height)))
+        h = band.height
+        out.append(GS + b"v0" + bytes([0, width_bytes & 0xFF, width_bytes >> 8, h & 0xFF, h >> 8]))
+        out.append(band.tobytes())
+    return b"".join(out)
+
+
+class RasterReceiptTemplate(ReceiptTemplate):
+    """Same layout as ReceiptTemplate, printed as bitmaps instead of cp1256 text."""
+
+    def __init__(self, title: str = SHOP_TITLE, footer_lines: Sequence[str] = ("شكراً لزيارتكم",),
+                 width: int = LINE_WIDTH, font_path: Optional[str] = None, bold_font_path: Optional[str] = None,
+                 cache: Optional[GlyphCache] = None):
+        if Image is None:
+            raise RuntimeError("الطباعة الرسومية تتطلب: pip install pillow arabic-reshaper python-bidi")
+        self.font_path = font_path or _first_existing(FONT_CANDIDATES)
+        if not self.font_path:
+            raise RuntimeError("لم يتم العثور على خط عربي للطباعة الرسومية.")
+        self.bold_font_path = bold_font_path or _first_existing(BOLD_FONT_CANDIDATES) or self.font_path
+        self.cache = cache or GlyphCache()
+        super().__init__(title, footer_lines, width)
+
+    # Row builders (each returns a WIDTH_DOTS wide 1-bit image)
+    def _place(self, words: Sequence[str], font_path: str, size: int, row, x_right: int):
+        """Paste visual words ending at x_right; returns the left edge used."""
+        imgs = [self.cache.word(font_path, size, w) for w in words]
+        total = sum(i.width for i in imgs) + WORD_GAP * (len(imgs) - 1)
+        x = max(0, x_right - total)
+        left = x
+        for i in imgs:
+            if x + i.width > WIDTH_DOTS:
+                break
+            row.paste(i, (x, 0))
+            x += i.width + WORD_GAP
+        return left
+
+    def _text_row(self, text: str, size: int = FONT_SIZE, bold: bool = False, center: bool = False):
+        path = self.bold_font_path if bold else self.font_path
+        row = Image.new("1", (WIDTH_DOTS, self.cache.line_height(path, size) + LINE_GAP), 0)
+        words = visual_words(text)
+        if center:
+            total = sum(self.cache.word(path, size, w).width for w in words) + WORD_GAP * (len(words) - 1)
+            self._place(words, path, size, row, min(WIDTH_DOTS, (WIDTH_DOTS + total) // 2))
+        else:
+            self._place(words, path, size, row, WIDTH_DOTS)
+        return row
+
+    def _columns_row(self, right: str, left: str, bold: bool = False):
+        path = self.bold_font_path if bold else self.font_path
+        row = Image.new("1", (WIDTH_DOTS, self.cache.line_height(path, FONT_SIZE) + LINE_GAP), 0)
+        left_words = visual_words(left)
+        left_width = sum(self.cache.word(path, FONT_SIZE, w).width for w in left_words) + WORD_GAP * (len(left_words) - 1)
+        self._place(left_words, path, FONT_SIZE, row, left_width)
+        self._place(visual_words(right), path, FONT_SIZE, row, WIDTH_DOTS)
+        return row
+
+    def _rule_row(self):
+        row = Image.new("1", (WIDTH_DOTS, 9), 0)
+        ImageDraw.Draw(row).line((0, 4, WIDTH_DOTS - 1, 4), fill=1, width=2)
+        return row
+
+    @staticmethod
+    def _stack(rows) -> "Image.Image":
+        img = Image.new("1", (WIDTH_DOTS, sum(r.height for r in rows)), 0)
+        y = 0
+        for r in rows:
+            img.paste(r, (0, y))
+            y += r.height
+        return img
+
+    def _compile(self):
+        self._rule = self._rule_row()
+        self._header = INIT + ALIGN_LEFT + raster_bytes(self._text_row(self.title, TITLE_SIZE, bold=True, center=True))
+        footer_rows = [self._rule] + [self._text_row(line, center=True) for line in self.footer_lines]
+        self._footer = raster_bytes(self._stack(footer_rows)) + FEED_AND_CUT
+
+    def render(self, fields: Sequence[Tuple[str, str]], items: Sequence[Tuple[str, float, int]],
+               totals: Sequence[Tuple[str, str]]) -> bytes:
+        rows = [self._text_row(f"{label}: {value}") for label, value in fields]
+        rows.append(self._rule)
+        for name, price, qty in items:
+            rows.append(self._columns_row(f"{name} x{qty}", f"{format_amount(price)} {CURRENCY}"))
+        rows.append(self._rule)
+        last = len(totals) - 1
+        for i, (label, value) in enumerate(totals):
+            rows.append(self._columns_row(label, value, bold=(i == last)))
+        return self._header + raster_bytes(self._stack(rows)) + self._footer
+
+
+def benchmark(n: int = 200) -> dict:
+    """Render a typical service receipt n times with a warm glyph cache; timings in milliseconds."""
+    template = RasterReceiptTemplate()
+    fields = [("التاريخ", "2024-01-01 05:30 PM"), ("المشتري", "غير محدد"), ("الموظف", "مينا")]
+    items = [("قص شعر", 100.0, 1), ("ذقن", 50.0, 1), ("سشوار", 40.0, 1), ("ماسك", 80.0, 2)]
+    totals = [("الإجمالي قبل الخصم", amount_value(350)), ("الخصم", "10%"), ("الإجمالي بعد الخصم", amount_value(315))]
+    start = time.perf_counter()
+    template.render(fields, items, totals)
+    cold = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(n):
+        data = template.render(fields, items, totals)
+    elapsed = time.perf_counter() - start
+    return {
+        "receipts": n,
+        "bytes_per_receipt": len(data),
+        "cold_ms": round(cold * 1000, 2),
+        "per_receipt_ms": round(elapsed / n * 1000, 3),
+        "cached_words": len(template.cache),
+        "cache_hits": template.cache.hits,
+        "cache_misses": template.cache.misses,
+    }
+
+
+if __name__ == "__main__":
+    print(benchmark())
@@ -0,0 +1,108 @@
+"""
+Reorder suggestions for products at or below their reorder level.
+
+The candidates are the low_stock set (kept by triggers on products, see db.py),
+so nothing here scans the whole catalogue. For each of them:
+
+    daily sales   units sold over the last VELOCITY_DAYS days (sale_items of
+                  customer and employee sales), per day
+    suggested     enough to cover COVER_DAYS of those sales on top of the
+                  reorder level, and at least enough to lift the product
+                  above its level
+    supplier      the supplier of the product's last delivery (stock ledger);
+                  products never received through the inventory tab have none
+
+Suggestions are grouped by supplier so each group is one purchase order.
+"""
+import math
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from mina_al_arabi.db import Database
+from mina_al_arabi.reporting import make_report
+
+
+VELOCITY_DAYS = 28
+COVER_DAYS = 14
+NO_SUPPLIER = "بدون مورد"
+
+
+def sales_velocity(c, since: str) -> Dict[int, float]:
+    """{product_id: units sold per day since `since`} for the low-stock products."""
+    days = max(1, (datetime.now() - datetime.strptime(since[:10], "%Y-%m-%d")).days)
+    c.execute("""
+    SELECT si.product_id, SUM(si.quantity)
+    FROM sale_items si JOIN sales s ON s.id = si.sale_id
+    WHERE si.product_id IN (SELECT product_id FROM low_stock) AND s.date >= ?
+    GROUP BY si.product_id
+    """, (since,))
+    return {pid: float(qty) / days for pid, qty in c.fetchall()}
+
+
+def last_suppliers(c) -> Dict[int, tuple]:
+    """{product_id: (supplier_id, supplier name)} from the last delivery of each low-stock product."""
+    # Bare columns with MAX(m.id) come from the newest delivery row of each product
+    c.execute("""
+    SELECT m.product_id, inv.supplier_id, sup.name, MAX(m.id)
+    FROM stock_movements m
+    JOIN supplier_invoices inv ON inv.id = m.ref_id
+    JOIN suppliers sup ON sup.id = inv.supplier_id
+    WHERE m.reason = 'delivery' AND m.product_id IN (SELECT product_id FROM low_stock)
+    GROUP BY m.product_id
+    """)
+    return {pid: (sid, name) for pid, sid, name, _mid in c.fetchall()}
+
+
+def suggested_quantity(quantity: int, reorder_level: int, daily_sales: float) -> int:
+    target = reorder_level + math.ceil(daily_sales * COVER_DAYS - 1e-9)
+    return max(reorder_level - quantity + 1, target - quantity)
+
+
+def reorder_suggestions(db: Database, days: int = VELOCITY_DAYS) -> List[Dict[str, Any]]:
+    """One dict per low-stock product, ordered by supplier and then by days of stock left."""
+    low = db.list_low_stock()
+    if not low:
+        return []
+    since = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+    with db.connect() as conn:
+        c = conn.cursor()
+        velocity = sales_velocity(c, since)
+        suppliers = last_suppliers(c)
+    out = []
+    for p in low:
+        daily = velocity.get(p["product_id"], 0.0)
+        sid, supplier = suppliers.get(p["product_id"], (None, NO_SUPPLIER))
+        qty = suggested_quantity(p["quantity"], p["reorder_level"], daily)
+        out.append({
+            "supplier_id": sid,
+            "supplier": supplier,
+            "product_id": p["product_id"],
+            "product": p["name"],
+            "quantity": p["quantity"],
+            "reorder_level": p["reorder_level"],
+            "daily_sales": daily,
+            # None when nothing sold recently
+            "days_left": max(0, p["quantity"]) / daily if daily else None,
+            "suggested": qty,
+            "cost": qty * p["unit_cost"],
+        })
+    out.sort(key=lambda r: (r["supplier_id"] is None, r["supplier"], r["days_left"] is None, r["days_left"] or 0))
+    return out
+
+
+def reorder_report(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Report dict (see reporting.py) for reorder_suggestions() rows."""
+    table = [[r["supplier"], r["product"], r["quantity"], r["reorder_level"], round(r["daily_sales"], 2),
+              None if r["days_left"] is None else round(r["days_left"], 1), r["suggested"], round(r["cost"], 2)]
+             for r in rows]
+    totals = {"low_stock": len(rows), "reorder_cost": round(sum(r["cost"] for r in rows), 2)}
+    columns = ["المورد", "المنتج", "المتوفر", "حد الطلب", "المبيعات اليومية", "يكفي (أيام)", "الكمية المقترحة",
+               "التكلفة التقديرية"]
+    return make_report("اقتراحات إعادة الطلب", columns, table, totals)
+
+
+def group_by_supplier(rows: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    out: Dict[str, List[Dict[str, Any]]] = {}
+    for r in rows:
+        out.setdefault(r["supplier"], []).append(r)
+    return out
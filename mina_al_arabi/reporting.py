@@ -0,0 +1,330 @@
+"""
+Report builders shared by the dashboards and the command line (cli.py).
+
+Only the standard library and db.py are imported here so reports can be produced
+without loading Qt. Each builder returns a plain dict:
+
+    {"title": str, "columns": [...], "rows": [[...], ...], "totals": {key: value}}
+
+and format_report() renders it as text, CSV or JSON. make_report() builds that
+dict; MonthCache keeps per-month results of the payroll and profitability
+reports between write events.
+"""
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from mina_al_arabi.db import Database, STOCK_REASONS
+from mina_al_arabi.archive import historical
+
+
+FORMATS = ("text", "csv", "json")
+
+SPECIAL_EXPENSE_CATEGORIES = ("مشتريات للمحل", "يوميات العمالة", "دفعات الموردين")
+
+# Arabic labels for the totals keys, used by the text and CSV output
+TOTAL_LABELS = {
+    "net_services": "إجمالي الخدمات (صافي)",
+    "net_sales": "إجمالي المبيعات (صافي)",
+    "total_revenue": "إجمالي الإيرادات (الصافي)",
+    "general_expenses": "مصاريف عامة",
+    "shop_purchases": "مشتريات المحل",
+    "daily_wages": "يوميات العمالة",
+    "supplier_payments": "دفعات الموردين",
+    "total_expenses": "إجمالي المصاريف",
+    "material_deductions": "إجمالي خصومات المواد (مخفي)",
+    "net_profit": "صافي الربح",
+    "inventory_value": "قيمة المخزون",
+    "supplier_pending": "أرصدة الموردين المعلقة",
+    "shift_number": "شفت رقم",
+    "cashier_name": "الكاشير",
+    "opened_at": "البدء",
+    "closed_at": "الانتهاء",
+    "duration": "مدة الشفت",
+    "total_sales": "إجمالي المبيعات بعد الخصم",
+    "invoice_count": "عدد الفواتير",
+    "customer_discounts": "خصومات العملاء",
+    "total_services": "إجمالي الخدمات",
+    "total_products": "إجمالي المبيعات",
+    "total_deductions": "الخصومات",
+    "balance": "الرصيد",
+    "remaining": "الرصيد المتبقي",
+    "quantity": "عدد القطع",
+    "rows": "عدد الصفوف",
+    "months": "عدد الأشهر",
+    "read": "الصفوف المقروءة",
+    "imported": "الصفوف المستوردة",
+    "errors": "الأخطاء",
+    "rows_per_sec": "صف/ثانية",
+    "milliseconds": "الزمن (مللي ثانية)",
+    "hours": "ساعات العمل",
+    "services": "الخدمات (أساس العمولة)",
+    "products": "المبيعات",
+    "loans": "السلف",
+    "net": "الصافي",
+    "invoices": "عدد الفواتير",
+    "revenue": "الإيرادات",
+    "idle_barber_hours": "ساعات حلاقين زائدة في الأسبوع",
+    "short_barber_hours": "ساعات نقص الحلاقين في الأسبوع",
+    "opening_quantity": "الرصيد أول المدة",
+    "stock_in": "الوارد",
+    "stock_out": "المنصرف",
+    "closing_quantity": "الرصيد آخر المدة",
+    "low_stock": "منتجات تحت حد الطلب",
+    "reorder_cost": "التكلفة التقديرية لإعادة الطلب",
+    "units": "الكمية المباعة",
+    "cost": "التكلفة",
+    "margin": "الهامش",
+    "loss_products": "منتجات بهامش سالب",
+    "unknown_cost": "منتجات بدون سعر تكلفة",
+}
+
+
+def format_amount(amount: float) -> str:
+    return str(int(round(amount)))
+
+
+def make_report(title: str, columns: List[str], rows: List[List[Any]], totals: Dict[str, Any]) -> Dict[str, Any]:
+    return {"title": title, "columns": columns, "rows": rows, "totals": totals}
+
+
+# Builders
+def admin_monthly_report(db: Database, year: int, month: int) -> Dict[str, Any]:
+    """Monthly revenue, expenses and net profit (the admin tab)."""
+    net_services = db.sum_services_net_in_month(year, month)
+    net_sales = db.sum_products_net_in_month(year, month)
+    total_revenue = net_services + net_sales
+
+    by_category = db.sum_expenses_by_category_in_month(year, month)
+    shop_exp = by_category.get("مشتريات للمحل", 0.0)
+    daily_exp = by_category.get("يوميات العمالة", 0.0)
+    supp_pay = by_category.get("دفعات الموردين", 0.0)
+    gen_exp = sum(v for k, v in by_category.items() if k not in SPECIAL_EXPENSE_CATEGORIES)
+    total_expenses = gen_exp + shop_exp + daily_exp + supp_pay
+
+    rows = [[name, round(total, 2)] for _eid, name, total in db.sum_services_net_by_employee_in_month(year, month)
+            if total > 0]
+    totals = {
+        "net_services": net_services,
+        "net_sales": net_sales,
+        "total_revenue": total_revenue,
+        "general_expenses": gen_exp,
+        "shop_purchases": shop_exp,
+        "daily_wages": daily_exp,
+        "supplier_payments": supp_pay,
+        "total_expenses": total_expenses,
+        "material_deductions": db.sum_material_deductions_in_month(year, month),
+        "net_profit": total_revenue - total_expenses,
+        "inventory_value": db.inventory_total_value(),
+        "supplier_pending": db.total_supplier_pending_balance(),
+    }
+    return make_report(f"التقرير الإداري الشهري {month:02d}/{year}", ["الموظف", "إجمالي خدمات الشهر (صافي)"], rows, totals)
+
+
+def shift_z_report(db: Database, shift_id: Optional[int] = None) -> Dict[str, Any]:
+    """Shift closing (Z) report; defaults to the active or most recent shift."""
+    if shift_id is None:
+        shift_id = db.get_last_shift_id()
+    summary = db.shift_summary(shift_id) if shift_id else {}
+    if not summary:
+        raise ValueError("لا يوجد شفت")
+    return make_report(f"تقرير الشفت رقم {summary.get('shift_number', '')}", [], [], summary)
+
+
+def employee_statement(db: Database, employee_id: int, year: int, month: int, day: Optional[int] = None) -> Dict[str, Any]:
+    """Employee account for a day or a month: sales after discounts and loans (the reports tab)."""
+    if day:
+        date_str = f"{year}-{month:02d}-{day:02d}"
+        sales = db.list_sales_by_employee_on_date(employee_id, date_str)
+        loans = db.list_loans_by_employee_on_date(employee_id, date_str)
+        period = date_str
+    else:
+        sales = db.list_sales_by_employee_in_month(employee_id, year, month)
+        loans = db.list_loans_by_employee_in_month(employee_id, year, month)
+        period = f"{month:02d}/{year}"
+
+    rows = []
+    total_services = 0.0
+    total_products = 0.0
+    total_deductions = 0.0
+    for s in sales:
+        desc = "فاتورة خدمات" if s["type"] == "service" else "فاتورة مبيعات"
+        effective_total = float(s["total"]) * (1 - int(s.get("discount_percent") or 0) / 100.0)
+        effective_total -= float(s.get("material_deduction") or 0.0)
+        if effective_total < 0:
+            effective_total = 0.0
+        if s.get("buyer_type") == "employee":
+            # Tracking only; not part of the balance
+            desc = "فاتورة مبيعات (للموظف)"
+        elif s["type"] == "service":
+            total_services += effective_total
+        else:
+            total_products += effective_total
+        rows.append([desc, s["date"], round(effective_total, 2)])
+    for _lid, date, amount, _note in loans:
+        rows.append(["خصم (سلفة)", date, float(amount)])
+        total_deductions += amount
+
+    totals = {
+        "total_services": total_services,
+        "total_products": total_products,
+        "total_deductions": total_deductions,
+        "balance": total_services + total_products - total_deductions,
+    }
+    return make_report(f"كشف حساب الموظف {period}", ["الوصف", "الوقت", "القيمة (ج.م)"], rows, totals)
+
+
+def supplier_balances(db: Database) -> Dict[str, Any]:
+    rows = []
+    remaining = 0.0
+    for sid, name, _phone, _notes in db.list_suppliers():
+        s = db.supplier_summary(sid)
+        rows.append([name, s["total_invoices"], s["total_invoice_paid"], s["total_payments"], s["remaining"]])
+        remaining += s["remaining"]
+    columns = ["المورد", "إجمالي الفواتير", "المدفوع مع الفواتير", "الدفعات", "الرصيد المتبقي"]
+    return make_report("أرصدة الموردين", columns, rows, {"remaining": remaining})
+
+
+def inventory_value(db: Database, day: Optional[str] = None) -> Dict[str, Any]:
+    """Stock valued at purchase price (sale price when the purchase price is unknown).
+
+    With `day`, the stock at the end of that day from the stock ledger, valued at the
+    cost recorded with each product's last movement.
+    """
+    rows = []
+    quantity = 0
+    if day:
+        stock = db.stock_at(day)
+        for r in stock:
+            rows.append([r["name"], r["quantity"], r["unit_cost"], round(r["value"], 2)])
+            quantity += r["quantity"]
+        totals = {"quantity": quantity, "inventory_value": sum(r["value"] for r in stock)}
+        return make_report(f"قيمة المخزون في {day}", ["المنتج", "الكمية", "سعر التكلفة", "القيمة"], rows, totals)
+    for _pid, name, price, qty, purchase_price, _barcode, _reorder_level in db.list_products():
+        unit_cost = purchase_price if purchase_price is not None else price
+        rows.append([name, qty, unit_cost, round(qty * unit_cost, 2)])
+        quantity += qty
+    totals = {"quantity": quantity, "inventory_value": db.inventory_total_value()}
+    return make_report("قيمة المخزون", ["المنتج", "الكمية", "سعر التكلفة", "القيمة"], rows, totals)
+
+
+def stock_movements(db: Database, product_id: int, name: str, date_from: Optional[str] = None,
+                    date_to: Optional[str] = None) -> Dict[str, Any]:
+    """Stock ledger of one product between date_from and date_to (inclusive, YYYY-MM-DD)."""
+    end = None
+    if date_to:
+        end = (datetime.strptime(date_to, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+    opening, moves = db.product_movements(product_id, date_from, end)
+    rows = [[m["date"], STOCK_REASONS.get(m["reason"], m["reason"]), m["ref_id"], m["delta"], m["balance"]]
+            for m in moves]
+    totals = {
+        "opening_quantity": opening,
+        "stock_in": sum(m["delta"] for m in moves if m["delta"] > 0),
+        "stock_out": -sum(m["delta"] for m in moves if m["delta"] < 0),
+        "closing_quantity": moves[-1]["balance"] if moves else opening,
+    }
+    return make_report(f"حركة المخزون: {name}", ["التاريخ", "السبب", "المرجع", "الكمية", "الرصيد"], rows, totals)
+
+
+# Output
+def _cell(value: Any) -> str:
+    if isinstance(value, float):
+        return format_amount(value)
+    return "" if value is None else str(value)
+
+
+def format_text(report: Dict[str, Any]) -> str:
+    lines = [report["title"], "-" * 32]
+    if report["columns"]:
+        lines.append(" | ".join(report["columns"]))
+        lines += [" | ".join(_cell(v) for v in row) for row in report["rows"]]
+        lines.append("-" * 32)
+    for key, value in report["totals"].items():
+        lines.append(f"{TOTAL_LABELS.get(key, key)}: {_cell(value)}")
+    return "\n".join(lines)
+
+
+def format_csv(report: Dict[str, Any]) -> str:
+    out = io.StringIO()
+    writer = csv.writer(out)
+    if report["columns"]:
+        writer.writerow(report["columns"])
+        writer.writerows(report["rows"])
+        writer.writerow([])
+    for key, value in report["totals"].items():
+        writer.writerow([TOTAL_LABELS.get(key, key), value])
+    return out.getvalue()
+
+
+def format_json(report: Dict[str, Any]) -> str:
+    data = dict(report)
+    data["rows"] = [dict(zip(report["columns"], row)) for row in report["rows"]]
+    data["generated_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return json.dumps(data, ensure_ascii=False, indent=2)
+
+
+def format_report(report: Dict[str, Any], fmt: str = "text") -> str:
+    if fmt == "csv":
+        return format_csv(report)
+    if fmt == "json":
+        return format_json(report)
+    return format_text(report)
+
+
+# Caches
+def event_month(payload: Dict[str, Any]) -> Optional[Tuple[int, int]]:
+    """(year, month) a write event touched, from its year/month or date; None when it may be any month."""
+    month = payload.get("month")
+    if payload.get("year") and month:
+        return int(payload["year"]), int(month)
+    if isinstance(month, str) and len(month) >= 7:
+        return int(month[:4]), int(month[5:7])
+    date = payload.get("date") or ""
+    if len(date) >= 7:
+        return int(date[:4]), int(date[5:7])
+    return None
+
+
+class MonthCache:
+    """Results of compute(db, year, month) per month, read through the archive views (archive.historical).
+
+    A month is dropped when an event in EVENTS touches it, and every month when
+    the event does not say which (edits and deletes without a date). Call
+    close() when the owner goes away so the database stops calling back.
+    """
+
+    EVENTS: Tuple[str, ...] = ()
+
+    def __init__(self, db: Database):
+        self.db = db
+        self._months: Dict[Tuple[int, int], Any] = {}
+        db.subscribe(self.on_db_event)
+
+    def compute(self, db: Database, year: int, month: int) -> Any:
+        raise NotImplementedError
+
+    def rows(self, year: int, month: int) -> Any:
+        key = (year, month)
+        if key not in self._months:
+            self._months[key] = self.compute(historical(self.db), year, month)
+        return self._months[key]
+
+    def invalidate(self, year: Optional[int] = None, month: Optional[int] = None) -> None:
+        if year is None:
+            self._months.clear()
+        else:
+            self._months.pop((year, month), None)
+
+    def on_db_event(self, event: str, payload: Dict[str, Any]) -> None:
+        if event not in self.EVENTS:
+            return
+        touched = event_month(payload)
+        if touched is None:
+            self.invalidate()
+        else:
+            self.invalidate(*touched)
+
+    def close(self) -> None:
+        self.db.unsubscribe(self.on_db_event)
@@ -0,0 +1,766 @@
+"""
+Database server for running several counters on one database:
+
+    python -m mina_al_arabi.server [--host H] [--port P] [--token T] [--db PATH]
+
+An SQLite file shared over a network drive is not safe with two PCs writing to
+it, so on busy days one PC runs this server, which alone opens data/mina.db,
+and every counter (that PC included) reaches it over TCP through
+RemoteDatabase: a Database whose public methods are calls to the server, so
+the dashboards take it in place of Database unchanged. main.py uses it when
+data/server.txt names a server (host:port on the first line, the token, if
+any, on the second).
+
+Protocol: one JSON object per line in each direction.
+
+    request   {"id": n, "method": name, "args": [...], "kwargs": {...}, "historical": bool}
+    response  {"id": n, "result": value, "events": [[event, payload], ...]}
+              {"id": n, "error": [exception type, message]}
+    event     {"event": name, "payload": {...}}     pushed after another client's write
+
+Tuples and dicts with non-string keys are tagged (see _encode) so results come
+back exactly as Database returns them, and sqlite3.IntegrityError, ValueError
+etc. are raised again on the client under their own type.
+
+On the server:
+
+    reads   run on the client's handler thread, on a connection kept per
+            thread instead of one opened per call
+    writes  (WRITE_METHODS) go to one writer thread, which runs everything
+            queued in one transaction, each call in its own savepoint, and
+            commits once. A failing call is rolled back to its savepoint
+            alone; if the batch cannot start or commit, its calls are retried
+            one transaction each. Events are sent only after their commit.
+    sql     RemoteDatabase.connect() returns a RemoteConnection whose cursors
+            run their statements on a connection the server keeps for it, so
+            the modules that query through db.connect() (payroll, analytics,
+            profitability, forecast, reorder, maintenance) work unchanged.
+            Those statements bypass the writer thread and rely on SQLite's
+            own locking.
+
+The server also runs the housekeeping main.py does for a local database
+(forecast refresh and maintenance, after a shift is closed and when no
+counter has sent anything for IDLE_SECONDS). It binds to 127.0.0.1 unless
+--host is given; on a LAN, start it with --token, which clients must send
+before anything else.
+"""
+import argparse
+import itertools
+import json
+import os
+import queue
+import socket
+import socketserver
+import sqlite3
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from mina_al_arabi.db import Database, DATA_DIR, DB_PATH
+from mina_al_arabi.archive import historical
+
+
+DEFAULT_PORT = 8765
+CONFIG_PATH = os.path.join(DATA_DIR, "server.txt")
+BATCH_MAX = 200  # writes committed together at most
+WRITER_BUSY_TIMEOUT_MS = 30_000  # the writer waits this long for a lock held through db.connect()
+CONNECT_TIMEOUT_S = 5
+CALL_TIMEOUT_S = 120
+IDLE_SECONDS = 5 * 60
+IDLE_CHECK_S = 60
+
+# Database methods run by the writer thread; every other public method is a read
+WRITE_METHODS = frozenset({
+    "add_employee", "add_expense", "add_loan", "add_manual_attendance", "add_product", "add_sale_item",
+    "add_service", "add_supplier", "add_supplier_invoice", "add_supplier_payment", "check_in", "check_out",
+    "checkout", "close_shift", "create_sale", "delete_all_attendance", "delete_all_expenses", "delete_attendance",
+    "delete_employee_by_name", "delete_expense_by_id", "delete_loans_by_employee", "delete_product",
+    "delete_sales_and_items_by_employee", "delete_service_by_name", "delete_shop_data_in_month",
+    "edit_attendance", "open_shift", "rebuild_search_index", "receive_delivery", "set_product_barcode",
+    "set_reorder_level", "take_stock_snapshots", "update_product_price", "update_product_qty",
+    "update_service_price",
+})
+# Not called remotely: per process (events, connections, the caller's cursor) or done by the server itself (schema)
+LOCAL_METHODS = frozenset({"connect", "subscribe", "unsubscribe", "notify", "record_opening_stock", "ensure_schema"})
+
+ERROR_TYPES = {
+    "IntegrityError": sqlite3.IntegrityError,
+    "OperationalError": sqlite3.OperationalError,
+    "DatabaseError": sqlite3.DatabaseError,
+    "ValueError": ValueError,
+    "KeyError": KeyError,
+    "TypeError": TypeError,
+    "PermissionError": PermissionError,
+}
+
+
+class RemoteError(Exception):
+    """An error on the server without a local equivalent in ERROR_TYPES, or a broken connection."""
+
+
+def remote_methods() -> List[str]:
+    return sorted(name for name in dir(Database)
+                  if not name.startswith("_") and name not in LOCAL_METHODS and callable(getattr(Database, name)))
+
+
+# Wire format
+def _encode(value: Any) -> Any:
+    if isinstance(value, tuple):
+        return {"__tuple__": [_encode(v) for v in value]}
+    if isinstance(value, list):
+        return [_encode(v) for v in value]
+    if isinstance(value, dict):
+        if all(isinstance(k, str) for k in value):
+            return {k: _encode(v) for k, v in value.items()}
+        return {"__dict__": [[_encode(k), _encode(v)] for k, v in value.items()]}
+    return value
+
+
+def _decode(value: Any) -> Any:
+    if isinstance(value, list):
+        return [_decode(v) for v in value]
+    if isinstance(value, dict):
+        if len(value) == 1 and "__tuple__" in value:
+            return tuple(_decode(v) for v in value["__tuple__"])
+        if len(value) == 1 and "__dict__" in value:
+            return {_decode(k): _decode(v) for k, v in value["__dict__"]}
+        return {k: _decode(v) for k, v in value.items()}
+    return value
+
+
+def _dumps(message: Dict[str, Any]) -> bytes:
+    return json.dumps(message, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+def _error(e: BaseException) -> List[str]:
+    return [type(e).__name__, str(e)]
+
+
+# Server
+class _ServerDatabase(Database):
+    """Database whose events are collected per thread for the server to send after the commit."""
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._local = threading.local()
+
+    def _emit(self, event: str, payload: Dict[str, Any]) -> None:
+        events = getattr(self._local, "events", None)
+        if events is not None:
+            events.append([event, payload])
+
+    def run(self, method: str, args: list, kwargs: dict) -> Tuple[Any, list]:
+        self._local.events = []
+        try:
+            return getattr(self, method)(*args, **kwargs), self._local.events
+        finally:
+            self._local.events = None
+
+
+class _PooledDatabase(_ServerDatabase):
+    """Reads: one connection per handler thread, reused by every call of that client."""
+
+    def connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = super().connect()
+        return conn
+
+    def release(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class _BatchConnection:
+    """The writer's connection as Database methods see it: the batch commits, rollback() undoes the current call."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def commit(self) -> None:
+        pass
+
+    def rollback(self) -> None:
+        self._conn.execute("ROLLBACK TO call")
+
+    def close(self) -> None:
+        pass
+
+
+class _BatchDatabase(_ServerDatabase):
+    def __init__(self, path: str):
+        super().__init__(path)
+        # Transactions and savepoints are issued by the writer, not by the sqlite3 module
+        self.conn = super().connect()
+        self.conn.isolation_level = None
+        self.conn.execute(f"PRAGMA busy_timeout = {WRITER_BUSY_TIMEOUT_MS}")
+
+    def connect(self):
+        return _BatchConnection(self.conn)
+
+
+class _Call:
+    def __init__(self, method: Optional[str], args: list, kwargs: dict, job: Optional[Callable[[], Any]] = None):
+        self.method = method
+        self.args = args
+        self.kwargs = kwargs
+        self.job = job
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.events: list = []
+        self.done = threading.Event()
+
+
+class _Writer(threading.Thread):
+    """Runs every write, in arrival order, committing whatever has queued up as one transaction."""
+
+    def __init__(self, path: str):
+        super().__init__(name="mina-writer", daemon=True)
+        self.path = path
+        self.db: Optional[_BatchDatabase] = None
+        self.queue: "queue.Queue[Optional[_Call]]" = queue.Queue()
+        self.batches = 0
+        self.calls = 0
+
+    def submit(self, call: _Call) -> _Call:
+        self.queue.put(call)
+        call.done.wait()
+        return call
+
+    def stop(self) -> None:
+        self.queue.put(None)
+
+    def run(self) -> None:
+        # sqlite3 connections belong to the thread that opened them
+        self.db = _BatchDatabase(self.path)
+        while True:
+            items = [self.queue.get()]
+            while items[-1] is not None and len(items) < BATCH_MAX:
+                try:
+                    items.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = items[-1] is None
+            calls = [item for item in items if item is not None]
+            # Jobs (housekeeping) run alone, between batches
+            batch: List[_Call] = []
+            for call in calls:
+                if call.job is None:
+                    batch.append(call)
+                    continue
+                self._run_batch(batch)
+                batch = []
+                try:
+                    call.result = call.job()
+                except Exception as e:
+                    call.error = e
+                call.done.set()
+            self._run_batch(batch)
+            if stop:
+                self.db.conn.close()
+                return
+
+    def _run_batch(self, batch: List[_Call]) -> None:
+        if not batch:
+            return
+        conn = self.db.conn
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for call in batch:
+                conn.execute("SAVEPOINT call")
+                try:
+                    call.result, call.events = self.db.run(call.method, call.args, call.kwargs)
+                    call.error = None
+                except Exception as e:
+                    if not conn.in_transaction:
+                        raise  # SQLite rolled back the whole transaction (disk full, I/O error)
+                    conn.execute("ROLLBACK TO call")
+                    call.result, call.events, call.error = None, [], e
+                conn.execute("RELEASE call")
+            conn.execute("COMMIT")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            if len(batch) > 1:
+                for call in batch:
+                    self._run_batch([call])
+                return
+            batch[0].result, batch[0].events, batch[0].error = None, [], e
+        self.batches += 1
+        self.calls += len(batch)
+        for call in batch:
+            call.done.set()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """One thread per connected client."""
+
+    def setup(self) -> None:
+        super().setup()
+        self.send_lock = threading.Lock()
+        self.sessions: Dict[int, sqlite3.Connection] = {}
+        self.session_ids = itertools.count(1)
+        self.authorized = not self.server.token
+
+    def handle(self) -> None:
+        self.server.clients.add(self)
+        try:
+            for line in self.rfile:
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    return
+                self.server.touch()
+                response = self.server.dispatch(self, request)
+                response["id"] = request.get("id")
+                self.send(response)
+        except OSError:
+            pass
+        finally:
+            self.server.clients.discard(self)
+            for conn in self.sessions.values():
+                conn.close()
+            self.server.reader.release()
+
+    def send(self, message: Dict[str, Any]) -> None:
+        data = _dumps(message)
+        with self.send_lock:
+            self.wfile.write(data)
+
+
+class DatabaseServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, path: str = DB_PATH, host: str = "127.0.0.1", port: int = DEFAULT_PORT,
+                 token: Optional[str] = None):
+        Database(path).ensure_schema()
+        self.path = path
+        self.token = token or None
+        self.reader = _PooledDatabase(path)
+        self.writer = _Writer(path)
+        self.clients = set()
+        self.last_request = time.monotonic()
+        self._housekeeping_stop = threading.Event()
+        super().__init__((host, port), _Handler)
+
+    def start(self) -> threading.Thread:
+        """Serve on background threads (writer, housekeeping, accept loop); returns the accept loop thread."""
+        self.writer.start()
+        threading.Thread(target=self._housekeeping, name="mina-housekeeping", daemon=True).start()
+        thread = threading.Thread(target=self.serve_forever, name="mina-server", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+        for client in list(self.clients):
+            try:
+                client.connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self._housekeeping_stop.set()
+        self.writer.stop()
+        self.writer.join()
+
+    def touch(self) -> None:
+        self.last_request = time.monotonic()
+
+    def dispatch(self, client: _Handler, request: Dict[str, Any]) -> Dict[str, Any]:
+        method = request.get("method") or ""
+        args = _decode(request.get("args") or [])
+        kwargs = _decode(request.get("kwargs") or {})
+        try:
+            if method == "hello":
+                if self.token and (args[:1] != [self.token]):
+                    raise PermissionError("رمز الاتصال بالخادم غير صحيح")
+                client.authorized = True
+                return {"result": None}
+            if not client.authorized:
+                raise PermissionError("يجب إرسال رمز الاتصال أولاً")
+            if method.startswith("sql."):
+                return {"result": _encode(self._sql(client, method[4:], args))}
+            if method == "publish":
+                self.broadcast([args], exclude=client)
+                return {"result": None}
+            if method.startswith("_") or method in LOCAL_METHODS or not callable(getattr(Database, method, None)):
+                raise ValueError(f"طريقة غير معروفة: {method}")
+            if method in WRITE_METHODS and not request.get("historical"):
+                call = self.writer.submit(_Call(method, args, kwargs))
+                if call.error is not None:
+                    raise call.error
+                result, events = call.result, call.events
+            elif request.get("historical"):
+                # Reports over the archives (archive.historical); read-only, so no events
+                result, events = getattr(historical(Database(self.path)), method)(*args, **kwargs), []
+            else:
+                result, events = self.reader.run(method, args, kwargs)
+        except Exception as e:
+            return {"error": _error(e)}
+        if events:
+            self.broadcast(events, exclude=client)
+            self._on_events(events)
+        return {"result": _encode(result), "events": _encode(events)}
+
+    def _sql(self, client: _Handler, op: str, args: list) -> Any:
+        if op == "open":
+            hist = bool(args and args[0])
+            sid = next(client.session_ids)
+            client.sessions[sid] = (historical(Database(self.path)) if hist else Database(self.path)).connect()
+            return sid
+        conn = client.sessions.get(args[0])
+        if conn is None:
+            raise ValueError("جلسة غير موجودة")
+        if op == "execute":
+            sql, params, many = args[1], args[2], args[3]
+            cur = conn.cursor()
+            if many:
+                cur.executemany(sql, params)
+            else:
+                cur.execute(sql, params)
+            rows = cur.fetchall() if cur.description else []
+            names = [d[0] for d in cur.description] if cur.description else None
+            return {"rows": rows, "rowcount": cur.rowcount, "lastrowid": cur.lastrowid, "columns": names}
+        if op == "commit":
+            conn.commit()
+        elif op == "rollback":
+            conn.rollback()
+        elif op == "close":
+            client.sessions.pop(args[0]).close()
+        else:
+            raise ValueError(f"عملية غير معروفة: {op}")
+        return None
+
+    def broadcast(self, events: list, exclude: Optional[_Handler] = None) -> None:
+        for client in list(self.clients):
+            if client is exclude or not client.authorized:
+                continue
+            try:
+                for event, payload in events:
+                    client.send({"event": event, "payload": _encode(payload)})
+            except OSError:
+                pass
+
+    # Housekeeping (main.py does the same for a local database)
+    def _on_events(self, events: list) -> None:
+        if any(event == "shift_closed" for event, _payload in events):
+            threading.Thread(target=self.housekeeping, args=("shift_close",), daemon=True).start()
+
+    def housekeeping(self, trigger: str) -> None:
+        from mina_al_arabi import forecast, maintenance
+
+        def job():
+            db = Database(self.path)
+            if forecast.is_due(db):
+                forecast.refresh(db)
+            if trigger != "idle" or maintenance.is_due(db):
+                maintenance.run_maintenance(db, trigger)
+
+        call = self.writer.submit(_Call(None, [], {}, job=job))
+        if call.error is not None:
+            print(f"[Server] {trigger} housekeeping failed: {call.error}", file=sys.stderr)
+
+    def _housekeeping(self) -> None:
+        while not self._housekeeping_stop.wait(IDLE_CHECK_S):
+            if time.monotonic() - self.last_request >= IDLE_SECONDS:
+                self.housekeeping("idle")
+                self.touch()  # at most once per idle period
+
+
+# Client
+class _Client:
+    """One connection to the server; calls are serialised, pushed events are queued for dispatch_events()."""
+
+    def __init__(self, host: str, port: int, token: Optional[str] = None):
+        self.address = (host, port)
+        self.token = token
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.events: "queue.Queue[Tuple[str, Dict[str, Any]]]" = queue.Queue()
+        self.responses: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+        self.sock: Optional[socket.socket] = None
+
+    def _connect(self) -> None:
+        sock = socket.create_connection(self.address, timeout=CONNECT_TIMEOUT_S)
+        sock.settimeout(None)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock = sock
+        self.responses = queue.Queue()
+        threading.Thread(target=self._read, args=(sock, self.responses), name="mina-client", daemon=True).start()
+        if self.token:
+            self._send_and_wait({"method": "hello", "args": [self.token]})
+
+    def _read(self, sock: socket.socket, responses: "queue.Queue") -> None:
+        try:
+            with sock.makefile("rb") as rfile:
+                for line in rfile:
+                    message = json.loads(line)
+                    if "event" in message:
+                        self.events.put((message["event"], _decode(message.get("payload") or {})))
+                    else:
+                        responses.put(message)
+        except (OSError, ValueError):
+            pass
+        responses.put({"error": ["ConnectionError", "انقطع الاتصال بالخادم"]})
+
+    def _send_and_wait(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        request["id"] = next(self.ids)
+        try:
+            self.sock.sendall(_dumps(request))
+            response = self.responses.get(timeout=CALL_TIMEOUT_S)
+        except (OSError, queue.Empty) as e:
+            self.close()
+            raise ConnectionError(f"تعذر الاتصال بالخادم: {e}") from e
+        if "error" in response:
+            kind, message = response["error"]
+            if kind == "ConnectionError":
+                self.close()
+                raise ConnectionError(message)
+            raise ERROR_TYPES.get(kind, RemoteError)(message)
+        return response
+
+    def call(self, method: str, args=(), kwargs=None, historical: bool = False) -> Tuple[Any, list]:
+        with self.lock:
+            if self.sock is None:
+                self._connect()
+            request = {"method": method, "args": _encode(list(args)), "kwargs": _encode(kwargs or {})}
+            if historical:
+                request["historical"] = True
+            response = self._send_and_wait(request)
+        return _decode(response.get("result")), _decode(response.get("events") or [])
+
+    def close(self) -> None:
+        sock, self.sock = self.sock, None
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+
+
+def _remote_method(name: str):
+    def method(self, *args, **kwargs):
+        result, events = self._client.call(name, args, kwargs, self._historical)
+        # Our own writes: listeners run now, on this thread, as with a local Database
+        for event, payload in events:
+            self._emit(event, payload)
+        return result
+    method.__name__ = name
+    method.__doc__ = getattr(Database, name).__doc__
+    return method
+
+
+class RemoteDatabase(Database):
+    """Database whose methods run on a DatabaseServer (see module docstring)."""
+
+    def __init__(self, host: str, port: int = DEFAULT_PORT, token: Optional[str] = None,
+                 _client: Optional[_Client] = None, _historical: bool = False):
+        super().__init__(f"remote://{host}:{port}")
+        self.host = host
+        self.port = port
+        self._client = _client or _Client(host, port, token)
+        self._historical = _historical
+
+    def ensure_schema(self):
+        # The server creates and migrates the schema when it starts
+        self._client.call("list_employees")
+
+    def connect(self):
+        return RemoteConnection(self._client, self._historical)
+
+    def historical_view(self) -> "RemoteDatabase":
+        """For archive.historical(): the server attaches its own archives."""
+        if self._historical:
+            return self
+        return RemoteDatabase(self.host, self.port, _client=self._client, _historical=True)
+
+    def notify(self, event: str, payload: Dict[str, Any]) -> None:
+        # Writes made with plain SQL over connect() (archive.py) are also announced to the other counters
+        super().notify(event, payload)
+        try:
+            self._client.call("publish", [event, payload])
+        except Exception:
+            pass
+
+    def dispatch_events(self) -> int:
+        """Call the listeners for writes made by other counters; main.py does this on a timer."""
+        n = 0
+        while True:
+            try:
+                event, payload = self._client.events.get_nowait()
+            except queue.Empty:
+                return n
+            self._emit(event, payload)
+            n += 1
+
+    def close(self) -> None:
+        self._client.close()
+
+
+for _name in remote_methods():
+    setattr(RemoteDatabase, _name, _remote_method(_name))
+
+
+class RemoteCursor:
+    """The sqlite3.Cursor subset used with db.connect(); each statement runs on the server, results come back whole."""
+
+    def __init__(self, conn: "RemoteConnection"):
+        self.connection = conn
+        self.description = None
+        self.rowcount = -1
+        self.lastrowid = None
+        self._rows: list = []
+        self._pos = 0
+
+    def _run(self, sql: str, params, many: bool) -> "RemoteCursor":
+        result = self.connection._call("execute", sql, list(params), many)
+        self._rows, self._pos = result["rows"], 0
+        self.rowcount, self.lastrowid = result["rowcount"], result["lastrowid"]
+        columns = result["columns"]
+        self.description = None if columns is None else tuple((name,) + (None,) * 6 for name in columns)
+        return self
+
+    def execute(self, sql: str, params=()) -> "RemoteCursor":
+        return self._run(sql, params, False)
+
+    def executemany(self, sql: str, seq) -> "RemoteCursor":
+        return self._run(sql, [tuple(p) for p in seq], True)
+
+    def fetchone(self):
+        if self._pos >= len(self._rows):
+            return None
+        self._pos += 1
+        return self._rows[self._pos - 1]
+
+    def fetchmany(self, size: int = 1):
+        rows = self._rows[self._pos:self._pos + size]
+        self._pos += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._rows[self._pos:]
+        self._pos = len(self._rows)
+        return rows
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    def close(self) -> None:
+        self._rows = []
+
+
+class RemoteConnection:
+    """What RemoteDatabase.connect() returns: a connection kept for it on the server, opened on first use."""
+
+    def __init__(self, client: _Client, historical: bool = False):
+        self._client = client
+        self._historical = historical
+        self._sid: Optional[int] = None
+
+    def _call(self, op: str, *args) -> Any:
+        if self._sid is None:
+            self._sid, _events = self._client.call("sql.open", [self._historical])
+        return self._client.call("sql." + op, [self._sid] + list(args))[0]
+
+    def cursor(self) -> RemoteCursor:
+        return RemoteCursor(self)
+
+    def execute(self, sql: str, params=()) -> RemoteCursor:
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql: str, seq) -> RemoteCursor:
+        return self.cursor().executemany(sql, seq)
+
+    def commit(self) -> None:
+        if self._sid is not None:
+            self._call("commit")
+
+    def rollback(self) -> None:
+        if self._sid is not None:
+            self._call("rollback")
+
+    def close(self) -> None:
+        if self._sid is not None:
+            sid, self._sid = self._sid, None
+            try:
+                self._client.call("sql.close", [sid])
+            except Exception:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # As sqlite3: commit on success, roll back on error. Then give the server its connection back.
+        try:
+            if exc_type is None:
+                self.commit()
+            else:
+                self.rollback()
+        finally:
+            self.close()
+        return False
+
+
+def load_config(path: str = CONFIG_PATH) -> Optional[Tuple[str, int, Optional[str]]]:
+    """(host, port, token) from data/server.txt, or None to use the local database file."""
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        lines = [line.strip() for line in f if line.strip() and not line.strip().startswith("#")]
+    if not lines:
+        return None
+    host, _, port = lines[0].partition(":")
+    return host, int(port or DEFAULT_PORT), (lines[1] if len(lines) > 1 else None)
+
+
+def open_database() -> Database:
+    """RemoteDatabase when data/server.txt names a server, otherwise the local Database."""
+    config = load_config()
+    if config is None:
+        return Database()
+    host, port, token = config
+    return RemoteDatabase(host, port, token)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m mina_al_arabi.server", description="خادم قاعدة بيانات صالون مينا العربي")
+    parser.add_argument("--host", default="127.0.0.1", help="0.0.0.0 لقبول أجهزة الشبكة المحلية")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--token", help="رمز يجب أن ترسله الأجهزة قبل أي طلب")
+    parser.add_argument("--db", default=DB_PATH, help="مسار قاعدة البيانات")
+    args = parser.parse_args(argv)
+    if args.host not in ("127.0.0.1", "localhost") and not args.token:
+        print("تحذير: الخادم متاح على الشبكة بدون --token", file=sys.stderr)
+    server = DatabaseServer(args.db, args.host, args.port, args.token)
+    print(f"الخادم يعمل على {args.host}:{server.server_address[1]} ({args.db})")
+    thread = server.start()
+    try:
+        while thread.is_alive():
+            thread.join(1)
+    except KeyboardInterrupt:
+        pass
+    server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
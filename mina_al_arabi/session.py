@@ -0,0 +1,63 @@
+"""
+In-memory session state shared by the dashboards.
+
+SessionContext keeps the active shift so the checkout and expense paths do not
+query the shifts table on every write. The cached value is replaced by the
+database's shift_opened / shift_closed events, and re-read after MAX_AGE seconds
+so a shift opened or closed by another process is picked up. Until then a write
+may name a shift that is already closed: Database moves it to the active shift
+inside the write transaction, and the cache is dropped when a sale or expense
+comes back on a different shift. "No active shift" is never cached, since a
+write without a shift would not reach a shift another counter just opened.
+"""
+import time
+from typing import Optional, Tuple, Dict, Any
+
+from mina_al_arabi.db import Database
+
+
+MAX_AGE = 30.0  # seconds before the cached shift is re-read from the database
+
+ShiftRow = Tuple[int, int, str, str, Optional[str], int]
+
+
+class SessionContext:
+    def __init__(self, db: Database, max_age: float = MAX_AGE):
+        self.db = db
+        self.max_age = max_age
+        self._shift: Optional[ShiftRow] = None
+        self._loaded_at: Optional[float] = None
+        db.subscribe(self._on_db_event)
+
+    def invalidate(self) -> None:
+        self._loaded_at = None
+
+    def active_shift(self) -> Optional[ShiftRow]:
+        """(id, shift_number, cashier_name, opened_at, closed_at, active) or None."""
+        if self._shift is None or self._loaded_at is None or time.monotonic() - self._loaded_at > self.max_age:
+            self._shift = self.db.get_active_shift()
+            self._loaded_at = time.monotonic()
+        return self._shift
+
+    @property
+    def shift_id(self) -> Optional[int]:
+        sh = self.active_shift()
+        return sh[0] if sh else None
+
+    def shift_args(self) -> Dict[str, Any]:
+        """Keyword arguments linking a sale or expense to the active shift (create_sale / checkout / add_expense)."""
+        return {"shift_id": self.shift_id}
+
+    def _on_db_event(self, event: str, payload: Dict[str, Any]) -> None:
+        if event == "shift_opened":
+            self._shift = (payload["shift_id"], payload["shift_number"], payload["cashier_name"],
+                           payload["opened_at"], None, 1)
+            self._loaded_at = time.monotonic()
+        elif event == "shift_closed":
+            if self._shift and self._shift[0] == payload.get("shift_id"):
+                self._shift = None
+                self._loaded_at = time.monotonic()
+            else:
+                self.invalidate()
+        elif event in ("sale_created", "expense_added") and self._shift and payload.get("shift_id") != self._shift[0]:
+            self.invalidate()